@@ -0,0 +1,458 @@
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import re
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from http import HTTPStatus
+from operator import itemgetter
+from urllib.parse import parse_qsl, urlsplit
+
+from utils import database as dao
+from utils.conexao import usar_banco
+from utils.inquilinos import usar_usuario
+from utils.modelos import Tarefa
+
+logger = logging.getLogger('agenda.api')
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8502
+
+# As chamadas ao SQLite bloqueiam: rodam em um pool limitado, fora do event loop
+MAXIMO_THREADS = 4
+
+# Conexões keep-alive sem requisições por TEMPO_OCIOSO_S segundos são fechadas
+TEMPO_OCIOSO_S = 15
+MAXIMO_CABECALHO = 16 * 1024
+MAXIMO_CORPO = 1024 * 1024
+
+# Operações por requisição em POST /lote
+MAXIMO_LOTE = 100
+
+# Corpos JSON já serializados das últimas leituras (ver processar)
+MAXIMO_RESPOSTAS = 256
+
+# Campos de Tarefa devolvidos (horario_minutos e criada_em são derivados)
+CAMPOS_TAREFA = tuple(campo for campo in Tarefa._fields if campo not in ('horario_minutos', 'criada_em'))
+_valores_tarefa = itemgetter(*(Tarefa._fields.index(campo) for campo in CAMPOS_TAREFA))
+
+CAMPOS_ATUALIZAVEIS = ('titulo', 'descricao', 'horario', 'prioridade', 'data', 'duracao',
+                       'dia_semana_id')
+
+PRIORIDADES_VALIDAS = ('baixa', 'media', 'alta')
+
+# =============================================
+# OPERAÇÕES (executadas nas threads do pool)
+# =============================================
+
+def _data(texto):
+    """'AAAA-MM-DD' -> date (None se vazio)"""
+    return datetime.date.fromisoformat(texto) if texto else None
+
+def _horario(texto):
+    """Valida 'HH:MM' (None se vazio)"""
+    if texto:
+        datetime.datetime.strptime(texto, '%H:%M')
+    return texto or None
+
+def _booleano(texto):
+    return str(texto).lower() in ('1', 'true', 'sim')
+
+def _booleano_estrito(valor, nome):
+    """true/false do JSON, 0/1 ou os mesmos textos da importação; ValueError no resto"""
+    if isinstance(valor, bool):
+        return valor
+    if isinstance(valor, int) and valor in (0, 1):
+        return bool(valor)
+    if isinstance(valor, str):
+        texto = valor.strip().lower()
+        if texto in ('1', 'true', 'sim'):
+            return True
+        if texto in ('0', 'false', 'nao', 'não'):
+            return False
+    raise ValueError(f"{nome} deve ser true ou false: {valor!r}")
+
+def _inteiro_positivo(valor, nome):
+    """Inteiro > 0 (None se ausente); recusa textos, frações e booleanos"""
+    if valor is None:
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, int) or valor <= 0:
+        raise ValueError(f"{nome} deve ser um inteiro positivo: {valor!r}")
+    return valor
+
+def _dia(valor):
+    """Id de dias_semana existente"""
+    if valor not in {id for id, nome, ordem in dao.listar_dias_semana()}:
+        raise ValueError(f"dia_semana_id inválido: {valor!r}")
+    return valor
+
+def _dias(valor):
+    """Lista de ids de dias_semana da recorrência (None se vazia)"""
+    if not valor:
+        return None
+    if not isinstance(valor, list):
+        raise ValueError("recorrencia_dias deve ser uma lista de ids de dias_semana")
+    return [_dia(dia) for dia in valor]
+
+def _prioridade(valor):
+    if valor not in PRIORIDADES_VALIDAS:
+        raise ValueError(f"prioridade inválida: {valor!r} (use {', '.join(PRIORIDADES_VALIDAS)})")
+    return valor
+
+def listar_tarefas(consulta, corpo):
+    """GET /tarefas?dia=&semana= | ?inicio=&fim= | (todas), com arquivo=1 opcional"""
+    incluir_arquivo = _booleano(consulta.get('arquivo'))
+    if 'dia' in consulta:
+        return 200, dao.listar_tarefas_por_dia(int(consulta['dia']), _data(consulta.get('semana')))
+    if 'inicio' in consulta:
+        inicio = _data(consulta['inicio'])
+        return 200, dao.listar_tarefas_por_data(inicio, _data(consulta.get('fim')) or inicio,
+                                                incluir_arquivo)
+    return 200, dao.listar_todas_tarefas(incluir_arquivo)
+
+def buscar(consulta, corpo):
+    """GET /busca?q="""
+    return 200, dao.buscar_tarefas(consulta.get('q', ''))
+
+def estatisticas(consulta, corpo):
+    """GET /estatisticas"""
+    return 200, dao.contar_estatisticas(_booleano(consulta.get('arquivo')))
+
+def listar_dias(consulta, corpo):
+    """GET /dias"""
+    return 200, [{'id': id, 'nome': nome, 'ordem': ordem}
+                 for id, nome, ordem in dao.listar_dias_semana()]
+
+def adicionar(consulta, corpo):
+    """POST /tarefas {titulo, data | dia_semana_id, ...}"""
+    titulo = (corpo.get('titulo') or '').strip()
+    if not titulo:
+        raise ValueError("título é obrigatório")
+    data = _data(corpo.get('data'))
+    if data is None and corpo.get('dia_semana_id') is None:
+        raise ValueError("informe data ou dia_semana_id")
+    dia_semana_id = corpo.get('dia_semana_id')
+    if dia_semana_id is not None:
+        _dia(dia_semana_id)
+
+    tarefa_id = dao.adicionar_tarefa(
+        dia_semana_id, titulo, corpo.get('descricao'), _horario(corpo.get('horario')),
+        _prioridade(corpo.get('prioridade', 'media')),
+        recorrencia_dias=_dias(corpo.get('recorrencia_dias')),
+        recorrencia_ate=_data(corpo.get('recorrencia_ate')),
+        recorrencia_vezes=_inteiro_positivo(corpo.get('recorrencia_vezes'), 'recorrencia_vezes'),
+        data=data, duracao=_inteiro_positivo(corpo.get('duracao'), 'duracao'),
+    )
+    return 201, {'id': tarefa_id}
+
+def atualizar(consulta, corpo, tarefa_id):
+    """PATCH /tarefas/<id> {campo: valor}"""
+    # Os nomes viram colunas do UPDATE: só os campos conhecidos passam
+    desconhecidos = set(corpo) - set(CAMPOS_ATUALIZAVEIS)
+    if desconhecidos:
+        raise ValueError(f"campos não atualizáveis: {', '.join(sorted(desconhecidos))}")
+    if not corpo:
+        raise ValueError("nenhum campo informado")
+    if 'data' in corpo:
+        corpo['data'] = _data(corpo['data'])
+        if corpo['data'] is None:
+            raise ValueError("data não pode ficar vazia")
+    if 'horario' in corpo:
+        corpo['horario'] = _horario(corpo['horario'])
+    if 'titulo' in corpo:
+        corpo['titulo'] = (corpo['titulo'] or '').strip()
+        if not corpo['titulo']:
+            raise ValueError("título é obrigatório")
+    if 'prioridade' in corpo:
+        _prioridade(corpo['prioridade'])
+    if 'duracao' in corpo:
+        _inteiro_positivo(corpo['duracao'], 'duracao')
+    if 'dia_semana_id' in corpo:
+        _dia(corpo['dia_semana_id'])
+
+    dao.atualizar_tarefa(int(tarefa_id), **corpo)
+    return 200, {'id': int(tarefa_id)}
+
+def concluir(consulta, corpo, tarefa_id):
+    """POST /tarefas/<id>/concluir {concluida, data (só para ocorrências)}"""
+    concluida = _booleano_estrito(corpo.get('concluida', True), 'concluida')
+    data = _data(corpo.get('data'))
+    if data is not None:
+        dao.marcar_ocorrencia_concluida(int(tarefa_id), data, concluida)
+    else:
+        dao.marcar_concluida(int(tarefa_id), concluida)
+    return 200, {'id': int(tarefa_id), 'concluida': concluida}
+
+def excluir(consulta, corpo, tarefa_id):
+    """DELETE /tarefas/<id>"""
+    dao.excluir_tarefa(int(tarefa_id))
+    return 200, {'id': int(tarefa_id)}
+
+def lote(consulta, corpo):
+    """POST /lote {operacoes: [{metodo, caminho, corpo}]}, em ordem, numa só requisição"""
+    operacoes = corpo.get('operacoes')
+    if not isinstance(operacoes, list):
+        raise ValueError("operacoes deve ser uma lista")
+    if len(operacoes) > MAXIMO_LOTE:
+        raise ValueError(f"no máximo {MAXIMO_LOTE} operações por lote")
+
+    respostas = []
+    for operacao in operacoes:
+        metodo = str(operacao.get('metodo', 'GET')).upper()
+        if metodo == 'POST' and urlsplit(operacao.get('caminho', '')).path == '/lote':
+            respostas.append({'status': 400, 'resposta': {'erro': "lote dentro de lote"}})
+            continue
+        status, resposta = rotear(metodo, operacao.get('caminho', ''), operacao.get('corpo') or {})
+        respostas.append({'status': status, 'resposta': resposta})
+    return 200, respostas
+
+# (método, caminho) -> operação; grupos nomeados do caminho viram argumentos
+ROTAS = [
+    ('GET', re.compile(r'/tarefas'), listar_tarefas),
+    ('POST', re.compile(r'/tarefas'), adicionar),
+    ('PATCH', re.compile(r'/tarefas/(?P<tarefa_id>\d+)'), atualizar),
+    ('DELETE', re.compile(r'/tarefas/(?P<tarefa_id>\d+)'), excluir),
+    ('POST', re.compile(r'/tarefas/(?P<tarefa_id>\d+)/concluir'), concluir),
+    ('GET', re.compile(r'/busca'), buscar),
+    ('GET', re.compile(r'/estatisticas'), estatisticas),
+    ('GET', re.compile(r'/dias'), listar_dias),
+    ('POST', re.compile(r'/lote'), lote),
+]
+
+def rotear(metodo, alvo, corpo):
+    """Executa a operação da rota; devolve (status, resposta) com os erros já tratados"""
+    partes = urlsplit(alvo)
+    metodos = []
+    for metodo_rota, padrao, operacao in ROTAS:
+        encontrado = padrao.fullmatch(partes.path)
+        if not encontrado:
+            continue
+        if metodo_rota != metodo:
+            metodos.append(metodo_rota)
+            continue
+        try:
+            return operacao(dict(parse_qsl(partes.query)), corpo, **encontrado.groupdict())
+        except sqlite3.IntegrityError as e:
+            return 409, {'erro': str(e)}
+        except sqlite3.Error as e:
+            return 500, {'erro': str(e)}
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            return 400, {'erro': str(e)}
+        except Exception:
+            logger.exception("Falha em %s %s", metodo, partes.path)
+            return 500, {'erro': "erro interno"}
+
+    if metodos:
+        return 405, {'erro': f"use {', '.join(metodos)}"}
+    return 404, {'erro': f"rota inexistente: {partes.path}"}
+
+def _em_json(valor):
+    """Tarefas (namedtuples) viram objetos; o json.dumps as trataria como listas"""
+    if isinstance(valor, Tarefa):
+        return dict(zip(CAMPOS_TAREFA, _valores_tarefa(valor)))
+    if isinstance(valor, list):
+        return [_em_json(item) for item in valor]
+    if isinstance(valor, dict):
+        return {chave: _em_json(item) for chave, item in valor.items()}
+    return valor
+
+def _json_padrao(valor):
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    raise TypeError(f"{type(valor).__name__} não é serializável")
+
+def _serializar(resposta):
+    return json.dumps(_em_json(resposta), ensure_ascii=False, default=_json_padrao).encode()
+
+_respostas = OrderedDict()  # (banco, usuário, alvo) -> (resultado do DAO, corpo JSON)
+_lock_respostas = threading.Lock()
+
+def _serializar_leitura(chave, resposta):
+    """Serializa um GET, reaproveitando o JSON enquanto o DAO devolver o mesmo objeto
+
+    As leituras do DAO vêm do cache (utils/cache.py) até a próxima escrita: o
+    mesmo objeto significa os mesmos dados, e a serialização custa bem mais que
+    a consulta em cache.
+    """
+    with _lock_respostas:
+        anterior = _respostas.get(chave)
+        if anterior is not None and anterior[0] is resposta:
+            _respostas.move_to_end(chave)
+            return anterior[1]
+
+    corpo = _serializar(resposta)
+    with _lock_respostas:
+        _respostas[chave] = (resposta, corpo)
+        _respostas.move_to_end(chave)
+        while len(_respostas) > MAXIMO_RESPOSTAS:
+            _respostas.popitem(last=False)
+    return corpo
+
+def processar(metodo, alvo, corpo, usuario=None, banco=None):
+    """Atende uma requisição na thread do pool; devolve (status, corpo JSON em bytes)"""
+    if corpo:
+        try:
+            corpo = json.loads(corpo)
+        except ValueError as e:
+            return 400, json.dumps({'erro': f"JSON inválido: {e}"}).encode()
+        if not isinstance(corpo, dict):
+            return 400, json.dumps({'erro': "o corpo deve ser um objeto JSON"}).encode()
+    else:
+        corpo = {}
+
+    # O pool não herda o contexto da requisição: o banco é escolhido aqui
+    with usar_banco(banco) if banco else nullcontext():
+        with usar_usuario(usuario) if usuario else nullcontext():
+            status, resposta = rotear(metodo, alvo, corpo)
+    if metodo == 'GET' and status == 200:
+        return status, _serializar_leitura((banco, usuario, alvo), resposta)
+    return status, _serializar(resposta)
+
+# =============================================
+# SERVIDOR HTTP (asyncio)
+# =============================================
+
+def montar_resposta(status, corpo, manter_conexao):
+    cabecalho = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                 f"Content-Type: application/json; charset=utf-8\r\n"
+                 f"Content-Length: {len(corpo)}\r\n"
+                 f"Connection: {'keep-alive' if manter_conexao else 'close'}\r\n\r\n")
+    return cabecalho.encode('latin-1') + corpo
+
+class ServidorApi:
+    """HTTP/1.1 com keep-alive sobre asyncio; o DAO roda em um pool de threads limitado
+
+    GETs idênticos que chegam enquanto um deles ainda está no pool são atendidos
+    por uma única execução (a chave inclui o número de escritas concluídas, então
+    ninguém recebe uma leitura anterior à própria escrita).
+    """
+
+    def __init__(self, banco=None, maximo_threads=MAXIMO_THREADS):
+        self.banco = banco
+        self.executor = ThreadPoolExecutor(max_workers=maximo_threads, thread_name_prefix='api')
+        self._em_andamento = {}
+        self.escritas = 0
+        self.requisicoes = 0
+        self.agrupadas = 0
+
+    async def despachar(self, metodo, alvo, corpo, usuario):
+        loop = asyncio.get_running_loop()
+        if metodo != 'GET':
+            try:
+                return await loop.run_in_executor(self.executor, processar, metodo, alvo, corpo,
+                                                  usuario, self.banco)
+            finally:
+                self.escritas += 1
+
+        chave = (usuario, alvo, self.escritas)
+        futuro = self._em_andamento.get(chave)
+        if futuro is None:
+            futuro = loop.run_in_executor(self.executor, processar, metodo, alvo, corpo,
+                                          usuario, self.banco)
+            self._em_andamento[chave] = futuro
+            futuro.add_done_callback(lambda _: self._em_andamento.pop(chave, None))
+        else:
+            self.agrupadas += 1
+        # shield: um cliente que desconecta não cancela a execução dos outros
+        return await asyncio.shield(futuro)
+
+    async def atender(self, leitor, escritor):
+        try:
+            while True:
+                try:
+                    bruto = await asyncio.wait_for(leitor.readuntil(b'\r\n\r\n'), TEMPO_OCIOSO_S)
+                except asyncio.LimitOverrunError:
+                    escritor.write(montar_resposta(431, b'{}', False))
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+
+                linhas = bruto.decode('latin-1').split('\r\n')
+                try:
+                    metodo, alvo, versao = linhas[0].split(' ')
+                except ValueError:
+                    escritor.write(montar_resposta(400, b'{}', False))
+                    break
+                cabecalhos = {}
+                for linha in linhas[1:]:
+                    nome, _, valor = linha.partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                try:
+                    tamanho = int(cabecalhos.get('content-length') or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    escritor.write(montar_resposta(400, b'{}', False))
+                    break
+                if tamanho > MAXIMO_CORPO:
+                    escritor.write(montar_resposta(413, b'{}', False))
+                    break
+                corpo = await leitor.readexactly(tamanho) if tamanho else b''
+
+                conexao = cabecalhos.get('connection', '').lower()
+                manter = conexao == 'keep-alive' if versao == 'HTTP/1.0' else conexao != 'close'
+
+                self.requisicoes += 1
+                try:
+                    status, resposta = await self.despachar(metodo, alvo, corpo,
+                                                            cabecalhos.get('x-usuario') or None)
+                except Exception:
+                    # Falha fora da operação (ex.: ao serializar): o cliente ainda recebe resposta
+                    logger.exception("Falha ao atender %s %s", metodo, alvo)
+                    status, resposta = 500, b'{"erro": "erro interno"}'
+                escritor.write(montar_resposta(status, resposta, manter))
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self, host=HOST_PADRAO, porta=PORTA_PADRAO, pronto=None):
+        servidor = await asyncio.start_server(self.atender, host, porta, limit=MAXIMO_CABECALHO,
+                                              reuse_address=True)
+        if pronto:
+            pronto(servidor)
+        async with servidor:
+            await servidor.serve_forever()
+
+# =============================================
+# LINHA DE COMANDO
+# =============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python api.py',
+        description='API JSON (HTTP) sobre as operações da agenda'
+    )
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--threads', type=int, default=MAXIMO_THREADS,
+                        help='threads do pool que executa o DAO')
+    parser.add_argument('--banco', help='arquivo do banco (padrão: database/agenda.db)')
+    args = parser.parse_args(argv)
+
+    # Esquema garantido uma vez, na subida, e não a cada requisição
+    with usar_banco(args.banco) if args.banco else nullcontext():
+        dao.criar_tabelas()
+
+    servidor = ServidorApi(args.banco, args.threads)
+    try:
+        asyncio.run(servidor.servir(
+            args.host, args.porta,
+            pronto=lambda _: print(f"API em http://{args.host}:{args.porta}", file=sys.stderr, flush=True)
+        ))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
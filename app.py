@@ -1,7 +1,38 @@
 import streamlit as st
 import sqlite3
 import datetime
-import os
+import io
+import math
+import tempfile
+from contextlib import nullcontext
+
+from utils.database import (
+    criar_tabelas, adicionar_tarefa, obter_semana,
+    listar_dias_semana, buscar_tarefas, contar_estatisticas, listar_tarefas_filtradas,
+    contar_tarefas_filtradas, marcar_concluidas, excluir_tarefas, aplicar_lote,
+    listar_tarefas_por_dia, marcar_concluida_sem_espera, excluir_tarefa_sem_espera,
+    listar_tarefas_recentes, listar_resumo_diario
+)
+from utils.alteracoes import alteracoes_desde, ultima_alteracao
+from utils.arquivo import IDADE_PADRAO_DIAS, estado_arquivamento, iniciar_arquivamento
+from utils.backup import estado_backup, iniciar_backup, listar_snapshots
+from utils.cache import estatisticas_cache
+from utils.conexao import banco_atual
+from utils.escritor import obter_escritor
+from utils.inquilinos import estatisticas_gerais, usar_usuario
+from utils.intervalos import DURACAO_PADRAO, proximo_horario_livre, verificar_conflitos
+from utils.instrumentacao import iniciar_coleta, limiar_lento_ms
+from utils.modelos import Tarefa
+from utils import otimistas
+from utils.recorrencia import inicio_da_semana
+from utils.transferencia import EXPORTADORES, LEITORES, importar_registros
+
+# Orçamento por rerun exibido no painel de desempenho
+ORCAMENTO_COMANDOS = 25
+ORCAMENTO_MS = 250
+
+# Intervalo entre as verificações de alterações da visão semanal ao vivo
+INTERVALO_AO_VIVO_S = 2
 
 # Configuração da página
 st.set_page_config(
@@ -10,272 +41,92 @@ st.set_page_config(
     layout="wide"
 )
 
-# =============================================
-# BANCO DE DADOS - FUNÇÕES
-# =============================================
-
-def criar_conexao():
-    """Cria conexão com o banco SQLite"""
-    # Criar pasta database se não existir
-    os.makedirs('database', exist_ok=True)
-    
-    conn = sqlite3.connect('database/agenda.db', check_same_thread=False)
-    # Ativar chaves estrangeiras
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
-
-def criar_tabelas():
-    """Cria todas as tabelas necessárias para SQLite"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    # Tabela de dias da semana
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS dias_semana (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT UNIQUE NOT NULL,
-            ordem INTEGER NOT NULL
-        )
-    ''')
-    
-    # Tabela de tarefas
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tarefas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            dia_semana_id INTEGER NOT NULL,
-            titulo TEXT NOT NULL,
-            descricao TEXT,
-            horario TEXT,
-            prioridade TEXT DEFAULT 'media',
-            concluida INTEGER DEFAULT 0,
-            data_criacao TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (dia_semana_id) REFERENCES dias_semana (id)
-        )
-    ''')
-    
-    conn.commit()
-    
-    # Inserir dias da semana padrão
-    dias_semana = [
-        ('Segunda-feira', 1),
-        ('Terça-feira', 2),
-        ('Quarta-feira', 3),
-        ('Quinta-feira', 4),
-        ('Sexta-feira', 5),
-        ('Sábado', 6),
-        ('Domingo', 7)
-    ]
-    
-    cursor.executemany('''
-        INSERT OR IGNORE INTO dias_semana (nome, ordem) 
-        VALUES (?, ?)
-    ''', dias_semana)
-    
-    conn.commit()
-    conn.close()
-
-def adicionar_tarefa(dia_semana_id, titulo, descricao=None, horario=None, prioridade='media'):
-    """Adiciona uma nova tarefa"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    # Validar prioridade
-    prioridades_validas = ['baixa', 'media', 'alta']
-    if prioridade not in prioridades_validas:
-        prioridade = 'media'
-    
-    cursor.execute('''
-        INSERT INTO tarefas (dia_semana_id, titulo, descricao, horario, prioridade)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (dia_semana_id, titulo, descricao, horario, prioridade))
-    
-    conn.commit()
-    conn.close()
-    return cursor.lastrowid
-
-def listar_tarefas_por_dia(dia_semana_id):
-    """Lista todas as tarefas de um dia específico"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
-               t.prioridade, t.concluida, t.data_criacao, ds.nome as dia_nome 
-        FROM tarefas t 
-        JOIN dias_semana ds ON t.dia_semana_id = ds.id 
-        WHERE t.dia_semana_id = ? 
-        ORDER BY 
-            CASE 
-                WHEN t.horario IS NULL THEN 1
-                ELSE 0
-            END,
-            t.horario,
-            CASE t.prioridade
-                WHEN 'alta' THEN 1
-                WHEN 'media' THEN 2
-                WHEN 'baixa' THEN 3
-                ELSE 4
-            END
-    ''', (dia_semana_id,))
-    
-    tarefas = cursor.fetchall()
-    conn.close()
-    return tarefas
-
-def listar_todas_tarefas():
-    """Lista todas as tarefas de todos os dias"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
-               t.prioridade, t.concluida, t.data_criacao, 
-               ds.nome as dia_nome, ds.ordem
-        FROM tarefas t 
-        JOIN dias_semana ds ON t.dia_semana_id = ds.id 
-        ORDER BY ds.ordem, 
-            CASE 
-                WHEN t.horario IS NULL THEN 1
-                ELSE 0
-            END,
-            t.horario,
-            CASE t.prioridade
-                WHEN 'alta' THEN 1
-                WHEN 'media' THEN 2
-                WHEN 'baixa' THEN 3
-                ELSE 4
-            END
-    ''')
-    
-    tarefas = cursor.fetchall()
-    conn.close()
-    return tarefas
-
-def listar_dias_semana():
-    """Lista todos os dias da semana"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id, nome, ordem FROM dias_semana ORDER BY ordem')
-    dias = cursor.fetchall()
-    conn.close()
-    return dias
-
-def atualizar_tarefa(tarefa_id, **kwargs):
-    """Atualiza uma tarefa existente"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    campos = []
-    valores = []
-    
-    for campo, valor in kwargs.items():
-        if campo == 'prioridade' and valor not in ['baixa', 'media', 'alta']:
-            continue
-        campos.append(f"{campo} = ?")
-        valores.append(valor)
-    
-    valores.append(tarefa_id)
-    
-    query = f"UPDATE tarefas SET {', '.join(campos)} WHERE id = ?"
-    cursor.execute(query, valores)
-    
-    conn.commit()
-    conn.close()
-
-def excluir_tarefa(tarefa_id):
-    """Exclui uma tarefa"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM tarefas WHERE id = ?', (tarefa_id,))
-    
-    conn.commit()
-    conn.close()
-
-def marcar_concluida(tarefa_id, concluida=True):
-    """Marca uma tarefa como concluída ou não"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    concluida_int = 1 if concluida else 0
-    cursor.execute('UPDATE tarefas SET concluida = ? WHERE id = ?', (concluida_int, tarefa_id))
-    
-    conn.commit()
-    conn.close()
-
-def buscar_tarefas(termo):
-    """Busca tarefas por termo"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
-               t.prioridade, t.concluida, t.data_criacao, ds.nome as dia_nome
-        FROM tarefas t 
-        JOIN dias_semana ds ON t.dia_semana_id = ds.id 
-        WHERE t.titulo LIKE ? OR t.descricao LIKE ?
-        ORDER BY ds.ordem, t.horario
-    ''', (f'%{termo}%', f'%{termo}%'))
-    
-    tarefas = cursor.fetchall()
-    conn.close()
-    return tarefas
-
-def contar_estatisticas():
-    """Conta estatísticas das tarefas"""
-    tarefas = listar_todas_tarefas()
-    total = len(tarefas)
-    concluidas = sum(1 for t in tarefas if t[6])  # índice 6 = concluida
-    
-    prioridades = {'alta': 0, 'media': 0, 'baixa': 0}
-    for tarefa in tarefas:
-        prioridade = tarefa[5]  # índice 5 = prioridade
-        if prioridade in prioridades:
-            prioridades[prioridade] += 1
-    
-    return {
-        'total': total,
-        'concluidas': concluidas,
-        'prioridades': prioridades
-    }
-
 # =============================================
 # INTERFACE STREAMLIT
 # =============================================
 
 def main():
-    st.title("📅 Minha Agenda de Tarefas")
+    # Coleta de consultas deste rerun (apenas com AGENDA_INSTRUMENTACAO=1)
+    coletor = iniciar_coleta()
     
-    # Inicializar banco de dados
-    criar_tabelas()
+    st.title("📅 Minha Agenda de Tarefas")
     
-    # Menu lateral
-    menu = st.sidebar.selectbox(
-        "Menu",
-        ["🏠 Visão Semanal", "➕ Adicionar Tarefa", "📋 Todas as Tarefas", "🔍 Buscar", "📊 Estatísticas"]
+    # Usuário opcional: cada um tem a própria agenda (um arquivo de banco por usuário)
+    st.sidebar.text_input(
+        "👤 Usuário",
+        key="usuario",
+        help="Deixe vazio para usar a agenda compartilhada"
     )
     
-    # Mostrar estatísticas rápidas no sidebar
-    mostrar_estatisticas_sidebar()
-    
-    # Navegação entre páginas
-    if menu == "🏠 Visão Semanal":
-        mostrar_visao_semanal()
-    elif menu == "➕ Adicionar Tarefa":
-        mostrar_adicionar_tarefa()
-    elif menu == "📋 Todas as Tarefas":
-        mostrar_todas_tarefas()
-    elif menu == "🔍 Buscar":
-        mostrar_buscar()
-    elif menu == "📊 Estatísticas":
-        mostrar_estatisticas_completas()
+    with agenda_da_sessao():
+        # Inicializar banco de dados
+        criar_tabelas()
+        
+        # Gravações em segundo plano dos cliques anteriores (atualização otimista)
+        reconciliar_otimistas(rerun_completo=True)
+        
+        # Menu lateral
+        menu = st.sidebar.selectbox(
+            "Menu",
+            ["🏠 Visão Semanal", "➕ Adicionar Tarefa", "📋 Todas as Tarefas", "🔍 Buscar",
+             "📊 Estatísticas", "📦 Importar/Exportar", "🗄️ Arquivo"]
+        )
+        
+        st.sidebar.toggle(
+            "🗂️ Modo tabela",
+            key="modo_tabela",
+            help="Mostra as listas em uma grade única, mais leve com muitas tarefas"
+        )
+        
+        st.sidebar.toggle(
+            "🗄️ Incluir arquivadas",
+            key="incluir_arquivo",
+            help="Inclui na visão semanal e nas estatísticas as tarefas já arquivadas"
+        )
+        
+        st.sidebar.toggle(
+            "🔴 Atualização ao vivo",
+            key="ao_vivo",
+            help=f"Verifica a cada {INTERVALO_AO_VIVO_S} s se outras sessões alteraram a semana "
+                 "e atualiza só os dias que mudaram"
+        )
+        
+        # Mostrar estatísticas rápidas no sidebar
+        mostrar_estatisticas_sidebar()
+        
+        # Navegação entre páginas
+        if menu == "🏠 Visão Semanal":
+            mostrar_visao_semanal()
+        elif menu == "➕ Adicionar Tarefa":
+            mostrar_adicionar_tarefa()
+        elif menu == "📋 Todas as Tarefas":
+            mostrar_todas_tarefas()
+        elif menu == "🔍 Buscar":
+            mostrar_buscar()
+        elif menu == "📊 Estatísticas":
+            mostrar_estatisticas_completas()
+        elif menu == "📦 Importar/Exportar":
+            mostrar_importar_exportar()
+        elif menu == "🗄️ Arquivo":
+            mostrar_arquivo()
+    
+    if coletor is not None:
+        mostrar_painel_desempenho(coletor)
+
+def agenda_da_sessao():
+    """Direciona o DAO para a agenda do usuário informado na sidebar"""
+    # Usado também nos callbacks, que rodam antes do corpo do script
+    usuario = st.session_state.get('usuario', '').strip()
+    return usar_usuario(usuario) if usuario else nullcontext()
 
 def mostrar_estatisticas_sidebar():
     """Mostra estatísticas rápidas na sidebar"""
-    st.sidebar.divider()
-    stats = contar_estatisticas()
+    stats = resumo_da_sessao()
+    # Contadores exibidos: um clique num fragmento de tarefa só pede o rerun
+    # completo (que redesenha a sidebar) quando eles mudaram
+    st.session_state.resumo_exibido = (stats['banco'], stats['total'], stats['concluidas'])
     
+    st.sidebar.divider()
     st.sidebar.write("**📊 Resumo:**")
     st.sidebar.write(f"Total: {stats['total']}")
     st.sidebar.write(f"Concluídas: {stats['concluidas']}")
@@ -285,9 +136,60 @@ def mostrar_estatisticas_sidebar():
         st.sidebar.write(f"Progresso: {porcentagem:.1f}%")
         st.sidebar.progress(porcentagem / 100)
 
+def mostrar_painel_desempenho(coletor):
+    """Painel na sidebar com o custo em banco do rerun atual"""
+    with st.sidebar.expander("⏱️ Desempenho deste rerun"):
+        st.write(f"**Comandos SQL:** {coletor.total_comandos} / {ORCAMENTO_COMANDOS}")
+        st.progress(min(coletor.total_comandos / ORCAMENTO_COMANDOS, 1.0))
+        st.write(f"**Tempo no DAO:** {coletor.total_ms:.1f} / {ORCAMENTO_MS} ms")
+        st.progress(min(coletor.total_ms / ORCAMENTO_MS, 1.0))
+        
+        cache = estatisticas_cache()
+        st.caption(f"Chamadas ao DAO: {len(coletor.chamadas)} · Linhas: {coletor.total_linhas} · "
+                   f"Conexões abertas: {coletor.conexoes_abertas} · "
+                   f"Cache: {cache['acertos']} acertos / {cache['falhas']} falhas")
+        
+        escritor = obter_escritor().metricas()
+        st.caption(f"Escritor: fila {escritor['fila']} (máx. {escritor['maior_fila']}) · "
+                   f"{escritor['operacoes_por_commit']:.1f} operações/commit · "
+                   f"commit médio {escritor['latencia_commit_media_ms']:.2f} ms")
+        
+        # Chamadas mais lentas primeiro; 🐢 = acima do limiar do log de consultas lentas
+        for chamada in sorted(coletor.chamadas, key=lambda c: c['duracao_ms'], reverse=True):
+            lenta = "🐢 " if chamada['duracao_ms'] >= limiar_lento_ms() else ""
+            st.write(f"{lenta}`{chamada['funcao']}` {chamada['duracao_ms']:.2f} ms · "
+                     f"{chamada['linhas']} linha(s) · {len(chamada['comandos'])} SQL")
+            for sql, duracao_ms in chamada['comandos']:
+                st.caption(f"{duracao_ms:.2f} ms — {' '.join(sql.split())[:120]}")
+
+def mudar_semana(semanas):
+    """Avança/volta a semana exibida (0 = volta para a semana atual)"""
+    inicio = st.session_state.get('semana_inicio', inicio_da_semana())
+    st.session_state.semana_inicio = (inicio + datetime.timedelta(weeks=semanas)
+                                      if semanas else inicio_da_semana())
+
 def mostrar_visao_semanal():
     st.header("📋 Visão Semanal")
     
+    # Navegação entre semanas
+    inicio = st.session_state.get('semana_inicio', inicio_da_semana())
+    fim = inicio + datetime.timedelta(days=6)
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 3])
+    with col1:
+        st.button("◀️ Anterior", on_click=mudar_semana, args=(-1,), use_container_width=True)
+    with col2:
+        st.button("📍 Hoje", on_click=mudar_semana, args=(0,), use_container_width=True)
+    with col3:
+        st.button("Próxima ▶️", on_click=mudar_semana, args=(1,), use_container_width=True)
+    with col4:
+        st.subheader(f"{inicio.strftime('%d/%m')} a {fim.strftime('%d/%m/%Y')}")
+    
+    # As tarefas da semana são lidas só no fragmento; aqui bastam os dias (em cache)
+    incluir_arquivo = st.session_state.get('incluir_arquivo', False)
+    dias = listar_dias_semana()
+    
+    mostrar_aviso_conflito()
+    
     # Botão para adicionar tarefa rápido
     col1, col2 = st.columns([3, 1])
     with col2:
@@ -299,7 +201,6 @@ def mostrar_visao_semanal():
         with st.form("quick_add_form"):
             st.subheader("Adicionar Tarefa Rápida")
             
-            dias = listar_dias_semana()
             dias_dict = {nome: id for id, nome, ordem in dias}
             
             col1, col2 = st.columns(2)
@@ -309,6 +210,7 @@ def mostrar_visao_semanal():
             with col2:
                 prioridade = st.selectbox("Prioridade", options=["baixa", "media", "alta"], index=1)
                 horario = st.text_input("Horário (HH:MM)", placeholder="09:00")
+                duracao = st.number_input("Duração (min)", min_value=5, step=5, value=DURACAO_PADRAO)
             
             descricao = st.text_area("Descrição (opcional)")
             
@@ -332,7 +234,13 @@ def mostrar_visao_semanal():
                             st.stop()
                     
                     try:
-                        adicionar_tarefa(dia_id, titulo, descricao, horario, prioridade)
+                        # O dia escolhido na semana que está sendo exibida
+                        ordem = next(ordem for id, nome, ordem in dias if id == dia_id)
+                        data = inicio + datetime.timedelta(days=ordem - 1)
+                        aviso = aviso_de_conflitos(data, horario, duracao) if horario else None
+                        adicionar_tarefa(dia_id, titulo, descricao, horario, prioridade, data=data,
+                                         duracao=duracao)
+                        st.session_state.aviso_conflito = aviso
                         st.success("✅ Tarefa adicionada com sucesso!")
                         st.session_state.show_quick_add = False
                         st.rerun()
@@ -343,24 +251,72 @@ def mostrar_visao_semanal():
         
         st.divider()
     
-    # Mostrar dias da semana
-    dias = listar_dias_semana()
+    # Ao vivo, só esta parte roda de novo a cada intervalo (fragmento), não a página inteira
+    if st.session_state.get('ao_vivo', False):
+        st.fragment(mostrar_dias_da_semana, run_every=INTERVALO_AO_VIVO_S)(inicio, incluir_arquivo)
+    else:
+        mostrar_dias_da_semana(inicio, incluir_arquivo)
+
+def semana_atualizada(inicio, incluir_arquivo):
+    """Semana exibida na sessão, relendo só os dias alterados desde a última verificação"""
+    chave = (banco_atual(), inicio, incluir_arquivo)
+    viva = st.session_state.get('semana_viva')
+    seq, datas = alteracoes_desde(viva['seq'] if viva and viva['chave'] == chave else None)
+    
+    if datas is None:
+        # Primeira vez, outra semana ou alteração que atinge dias demais
+        semana = obter_semana(inicio, incluir_arquivo=incluir_arquivo)
+    else:
+        semana = [
+            (dia, listar_tarefas_por_dia(dia[0], inicio, incluir_arquivo)
+             if inicio + datetime.timedelta(days=dia[2] - 1) in datas else tarefas)
+            for dia, tarefas in viva['semana']
+        ]
+    
+    st.session_state.semana_viva = {'chave': chave, 'seq': seq, 'semana': semana}
+    return semana
+
+def mostrar_dias_da_semana(inicio, incluir_arquivo):
+    """Tarefas da semana por dia; roda sozinho (fragmento) na atualização ao vivo"""
+    # Nos reruns do fragmento main() não roda: o banco do usuário é escolhido aqui de novo
+    with agenda_da_sessao():
+        semana = semana_atualizada(inicio, incluir_arquivo)
+        
+        # Modo tabela: a semana inteira em uma única grade
+        if st.session_state.get('modo_tabela'):
+            exibir_tabela_tarefas([tarefa for dia, tarefas in semana for tarefa in tarefas], 'semana')
+            return
+        
+        mostrar_tarefas_por_dia(inicio, semana)
+
+def mostrar_tarefas_por_dia(inicio, semana):
+    """Ações em lote e um expander por dia da semana"""
+    # Ocorrências de tarefas recorrentes são concluídas uma a uma, fora do lote
+    mostrar_acoes_em_lote([tarefa for dia, tarefas in semana for tarefa in tarefas
+                           if tarefa.data_ocorrencia is None], 'semana')
     
-    for dia in dias:
+    # Mostrar dias da semana
+    for dia, tarefas in semana:
         dia_id, nome, ordem = dia
-        with st.expander(f"📅 {nome}", expanded=True):
-            tarefas = listar_tarefas_por_dia(dia_id)
-            
+        data = inicio + datetime.timedelta(days=ordem - 1)
+        with st.expander(f"📅 {nome} · {data.strftime('%d/%m')}", expanded=True):
             if not tarefas:
                 st.info("Nenhuma tarefa para este dia.")
                 continue
             
             for tarefa in tarefas:
-                exibir_tarefa(tarefa)
+                # Dentro do fragmento ao vivo, o clique já roda de novo só a semana:
+                # os cartões não viram fragmentos aninhados
+                if st.session_state.get('ao_vivo', False):
+                    desenhar_tarefa(tarefa)
+                else:
+                    exibir_tarefa(tarefa)
 
 def mostrar_adicionar_tarefa():
     st.header("➕ Adicionar Nova Tarefa")
     
+    mostrar_aviso_conflito()
+    
     with st.form("form_tarefa", clear_on_submit=True):
         dias = listar_dias_semana()
         dias_dict = {nome: id for id, nome, ordem in dias}
@@ -368,10 +324,7 @@ def mostrar_adicionar_tarefa():
         col1, col2 = st.columns(2)
         
         with col1:
-            dia_selecionado = st.selectbox(
-                "Dia da Semana*",
-                options=list(dias_dict.keys())
-            )
+            data = st.date_input("Data*", value=datetime.date.today(), format="DD/MM/YYYY")
             
             titulo = st.text_input("Título da Tarefa*")
             
@@ -384,13 +337,25 @@ def mostrar_adicionar_tarefa():
         with col2:
             horario = st.text_input("Horário (HH:MM)", placeholder="Ex: 09:00, 14:30")
             
+            duracao = st.number_input("Duração (min)", min_value=5, step=5, value=DURACAO_PADRAO)
+            
             descricao = st.text_area("Descrição", height=100)
         
+        # Recorrência: uma única linha no banco, ocorrências geradas na leitura
+        with st.expander("🔁 Repetir toda semana"):
+            dias_repeticao = st.multiselect("Dias", options=list(dias_dict.keys()))
+            col1, col2 = st.columns(2)
+            with col1:
+                repetir_ate = st.date_input("Até (opcional)", value=None, format="DD/MM/YYYY")
+            with col2:
+                repeticoes = st.number_input("Nº de ocorrências (0 = sem limite)",
+                                             min_value=0, step=1, value=0)
+        
         submitted = st.form_submit_button("Adicionar Tarefa", use_container_width=True)
         
         if submitted:
-            if titulo and dia_selecionado:
-                dia_id = dias_dict[dia_selecionado]
+            if titulo and data:
+                dia_id = next(id for id, nome, ordem in dias if ordem == data.isoweekday())
                 
                 # Validar formato do horário
                 if horario:
@@ -400,61 +365,101 @@ def mostrar_adicionar_tarefa():
                         st.error("❌ Formato de horário inválido! Use HH:MM")
                         return
                 
+                # A série começa na data escolhida
+                recorrencia_dias = [dias_dict[nome] for nome in dias_repeticao] or None
+                
                 try:
-                    adicionar_tarefa(dia_id, titulo, descricao, horario, prioridade)
+                    aviso = aviso_de_conflitos(data, horario, duracao) if horario else None
+                    adicionar_tarefa(dia_id, titulo, descricao, horario, prioridade,
+                                     recorrencia_dias=recorrencia_dias,
+                                     recorrencia_ate=repetir_ate,
+                                     recorrencia_vezes=repeticoes or None,
+                                     data=data, duracao=duracao)
+                    st.session_state.aviso_conflito = aviso
                     st.success("✅ Tarefa adicionada com sucesso!")
                     st.rerun()
                 except sqlite3.Error as e:
                     st.error(f"❌ Erro ao adicionar tarefa: {e}")
             else:
-                st.error("❌ Título e Dia da Semana são obrigatórios!")
+                st.error("❌ Título e Data são obrigatórios!")
+
+def aviso_de_conflitos(data, horario, duracao):
+    """Texto do aviso se o horário se sobrepõe a outras tarefas do dia (None se livre)"""
+    conflitos = verificar_conflitos(data, horario, duracao)
+    if not conflitos:
+        return None
+    
+    nomes = ', '.join(f"{tarefa.titulo} ({tarefa.horario})" for tarefa in conflitos)
+    livre = proximo_horario_livre(data, duracao, apos=horario)
+    sugestao = f" Próximo horário livre de {duracao} min: {livre}." if livre else ""
+    return f"⚠️ {data.strftime('%d/%m')} às {horario} conflita com: {nomes}.{sugestao}"
+
+def mostrar_aviso_conflito():
+    """Mostra (uma vez) o aviso de conflito da última tarefa adicionada"""
+    aviso = st.session_state.pop('aviso_conflito', None)
+    if aviso:
+        st.warning(aviso)
 
 def mostrar_todas_tarefas():
     st.header("📋 Todas as Tarefas")
     
-    tarefas = listar_todas_tarefas()
+    total = contar_estatisticas()['total']
     
-    if not tarefas:
+    if not total:
         st.info("📝 Nenhuma tarefa cadastrada. Comece adicionando uma tarefa!")
         return
     
-    st.write(f"**Total:** {len(tarefas)} tarefas")
+    st.write(f"**Total:** {total} tarefas")
+    
+    dias = listar_dias_semana()
     
     # Filtros
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
         filtrar_concluidas = st.selectbox("Status", ["Todas", "Pendentes", "Concluídas"])
     with col2:
         filtrar_prioridade = st.selectbox("Prioridade", ["Todas", "Alta", "Média", "Baixa"])
     with col3:
-        filtrar_dia = st.selectbox("Dia", ["Todos"] + [nome for id, nome, ordem in listar_dias_semana()])
+        filtrar_dia = st.selectbox("Dia", ["Todos"] + [nome for id, nome, ordem in dias])
+    with col4:
+        por_pagina = st.selectbox("Por página", [25, 50, 100, 200], index=1)
+    
+    # Filtros aplicados no SQL
+    filtros = {
+        'concluida': {"Pendentes": False, "Concluídas": True}.get(filtrar_concluidas),
+        'prioridade': {"Alta": 'alta', "Média": 'media', "Baixa": 'baixa'}.get(filtrar_prioridade),
+        'dia_semana_id': {nome: id for id, nome, ordem in dias}.get(filtrar_dia),
+    }
     
-    # Aplicar filtros
-    tarefas_filtradas = []
-    for tarefa in tarefas:
-        (id, dia_id, titulo, descricao, horario, prioridade, 
-         concluida, data_criacao, dia_nome, ordem) = tarefa
-        
-        # Filtro de status
-        if filtrar_concluidas == "Pendentes" and concluida:
-            continue
-        if filtrar_concluidas == "Concluídas" and not concluida:
-            continue
-        
-        # Filtro de prioridade
-        if filtrar_prioridade != "Todas" and prioridade.lower() != filtrar_prioridade.lower():
-            continue
-        
-        # Filtro de dia
-        if filtrar_dia != "Todos" and dia_nome != filtrar_dia:
-            continue
-        
-        tarefas_filtradas.append(tarefa)
+    # Pilha de cursores das páginas visitadas; volta à primeira página quando os filtros mudam
+    assinatura = (tuple(filtros.values()), por_pagina)
+    if st.session_state.get('paginas_assinatura') != assinatura:
+        st.session_state.paginas_assinatura = assinatura
+        st.session_state.paginas_cursores = [None]
+    cursores = st.session_state.paginas_cursores
+    
+    tarefas_filtradas, proximo = listar_tarefas_filtradas(
+        apos=cursores[-1], limite=por_pagina, **filtros
+    )
+    total_filtrado = contar_tarefas_filtradas(**filtros)
     
-    st.write(f"**Mostrando:** {len(tarefas_filtradas)} tarefas")
+    pagina = len(cursores)
+    total_paginas = max(1, -(-total_filtrado // por_pagina))
+    st.write(f"**Mostrando:** {len(tarefas_filtradas)} de {total_filtrado} tarefas "
+             f"(página {pagina} de {total_paginas})")
     
-    for tarefa in tarefas_filtradas:
-        exibir_tarefa(tarefa)
+    exibir_lista_tarefas(tarefas_filtradas, 'todas')
+    
+    # Navegação entre páginas
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("⬅️ Anterior", disabled=pagina == 1, use_container_width=True):
+            cursores.pop()
+            st.rerun()
+    with col3:
+        if st.button("Próxima ➡️", disabled=proximo is None, use_container_width=True):
+            cursores.append(proximo)
+            st.rerun()
 
 def mostrar_buscar():
     st.header("🔍 Buscar Tarefas")
@@ -466,8 +471,7 @@ def mostrar_buscar():
         
         if tarefas:
             st.write(f"**{len(tarefas)}** tarefa(s) encontrada(s):")
-            for tarefa in tarefas:
-                exibir_tarefa(tarefa)
+            exibir_lista_tarefas(tarefas, 'busca')
         else:
             st.info("🔍 Nenhuma tarefa encontrada com esse termo.")
     else:
@@ -476,7 +480,7 @@ def mostrar_buscar():
 def mostrar_estatisticas_completas():
     st.header("📊 Estatísticas Detalhadas")
     
-    stats = contar_estatisticas()
+    stats = contar_estatisticas(incluir_arquivo=st.session_state.get('incluir_arquivo', False))
     total = stats['total']
     
     if total == 0:
@@ -528,24 +532,388 @@ def mostrar_estatisticas_completas():
             for prioridade, valor in prioridades.items():
                 if valor > 0:
                     st.write(f"{prioridade.title()}: {valor} ({valor/total*100:.1f}%)")
+
+        with cols[2]:
+            st.write("**Dias**")
+            for dia_id, nome, ordem in listar_dias_semana():
+                dia = stats['por_dia'].get(dia_id)
+                if dia:
+                    st.write(f"{nome}: {dia['concluidas']}/{dia['total']} concluídas")
+
+    mostrar_tendencias()
     
-    # Tarefas recentes
+    # Tarefas recentes: as últimas criadas, pelo índice de data_criacao
     st.subheader("🕒 Tarefas Recentes")
-    tarefas_recentes = listar_todas_tarefas()[:5]  # Últimas 5 tarefas
+    tarefas_recentes = listar_tarefas_recentes(5)
     if tarefas_recentes:
         for tarefa in tarefas_recentes:
-            (id, dia_id, titulo, descricao, horario, prioridade, 
-             concluida, data_criacao, dia_nome, ordem) = tarefa
-            
-            status = "✅" if concluida else "⏳"
-            st.write(f"{status} **{titulo}** - {dia_nome} ({prioridade.title()})")
+            status = "✅" if tarefa.concluida else "⏳"
+            st.write(f"{status} **{tarefa.titulo}** - {tarefa.dia_nome} ({tarefa.prioridade.title()})")
     else:
         st.info("Nenhuma tarefa recente.")
+    
+    mostrar_estatisticas_gerais()
+
+def mostrar_tendencias():
+    """Criadas x concluídas por semana ou mês, calculadas sobre o resumo diário"""
+    st.subheader("📉 Tendências")
+    
+    # numpy e pandas só são necessários aqui: sem eles, o resto do app funciona
+    try:
+        from utils.tendencias import PERIODOS, inclinacao, serie_diaria, tendencias
+    except ImportError:
+        st.info("Instale numpy e pandas (pip install numpy pandas) para ver as tendências.")
+        return
+    
+    # No máximo 3 linhas por dia do histórico, nunca as tarefas em si
+    diaria = serie_diaria(listar_resumo_diario())
+    if diaria.empty:
+        st.info("Ainda não há histórico para mostrar tendências.")
+        return
+    
+    rotulo = st.radio("Agrupar por", list(PERIODOS), horizontal=True, key="periodo_tendencias")
+    periodo = tendencias(diaria, PERIODOS[rotulo])
+    atual = periodo.iloc[-1]
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Concluídas no período atual", int(atual['concluidas']),
+                  delta=f"{inclinacao(periodo['concluidas']):+.1f} por período (tendência)")
+    with col2:
+        taxa = atual['taxa_conclusao']
+        st.metric("Concluídas / criadas", "—" if math.isnan(taxa) else f"{taxa:.0f}%")
+    with col3:
+        st.metric("Saldo criadas − concluídas", int(atual['saldo']))
+    
+    st.line_chart(periodo[['criadas', 'concluidas', 'media_concluidas']])
+    
+    colunas = [coluna for coluna in periodo.columns if coluna.startswith('concluidas_')]
+    if colunas:
+        st.caption("Concluídas por prioridade")
+        st.bar_chart(periodo[colunas])
+
+def mostrar_estatisticas_gerais():
+    """Totais de todas as agendas de usuários (consulta todos os shards)"""
+    with st.expander("🌐 Todas as agendas (administração)"):
+        if not st.button("Calcular", key="calcular_estatisticas_gerais"):
+            return
+        
+        geral = estatisticas_gerais()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Usuários", geral['usuarios'])
+        with col2:
+            st.metric("Tarefas", geral['total'])
+        with col3:
+            st.metric("Concluídas", geral['concluidas'])
+        
+        for usuario, stats in geral['por_usuario'].items():
+            st.write(f"{usuario}: {stats['concluidas']}/{stats['total']} concluídas")
+
+def aplicar_acao_em_lote(chave, acao):
+    """Aplica a ação às tarefas selecionadas em uma única transação"""
+    tarefa_ids = st.session_state.get(chave, [])
+    if not tarefa_ids:
+        return
+    
+    with agenda_da_sessao():
+        if acao == 'concluir':
+            marcar_concluidas(tarefa_ids, True)
+        elif acao == 'reabrir':
+            marcar_concluidas(tarefa_ids, False)
+        elif acao == 'excluir':
+            excluir_tarefas(tarefa_ids)
+    
+    # Limpa a seleção; o callback já provoca um único rerun
+    st.session_state[chave] = []
+
+def mostrar_acoes_em_lote(tarefas, chave):
+    """Barra de ações em lote para uma lista de tarefas"""
+    if not tarefas:
+        return
+    
+    chave = f"lote_{chave}"
+    rotulos = {tarefa.id: f"{tarefa.titulo} ({descrever_dia(tarefa)})" for tarefa in tarefas}
+    
+    with st.expander("☑️ Ações em lote"):
+        selecionadas = st.multiselect(
+            "Tarefas selecionadas",
+            options=list(rotulos),
+            format_func=rotulos.get,
+            key=chave
+        )
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.button("Selecionar todas", key=f"{chave}_todas", use_container_width=True,
+                      on_click=lambda: st.session_state.update({chave: list(rotulos)}))
+        with col2:
+            st.button("✔️ Concluir", key=f"{chave}_concluir", use_container_width=True,
+                      disabled=not selecionadas, on_click=aplicar_acao_em_lote,
+                      args=(chave, 'concluir'))
+        with col3:
+            st.button("↩️ Reabrir", key=f"{chave}_reabrir", use_container_width=True,
+                      disabled=not selecionadas, on_click=aplicar_acao_em_lote,
+                      args=(chave, 'reabrir'))
+        with col4:
+            st.button("🗑️ Excluir", key=f"{chave}_excluir", use_container_width=True,
+                      disabled=not selecionadas, on_click=aplicar_acao_em_lote,
+                      args=(chave, 'excluir'))
 
+def mostrar_importar_exportar():
+    st.header("📦 Importar / Exportar")
+    
+    st.subheader("⬇️ Exportar")
+    formato = st.radio("Formato", ["csv", "json"], horizontal=True, key="formato_exportacao")
+    
+    # O arquivo só é gerado quando pedido, não a cada rerun. Os lotes vão direto
+    # para um arquivo temporário em disco, e não para uma string na memória
+    if st.button("Gerar arquivo de exportação"):
+        arquivo = tempfile.TemporaryFile()
+        texto = io.TextIOWrapper(arquivo, encoding='utf-8', newline='')
+        total = EXPORTADORES[formato](texto)
+        texto.detach().seek(0)
+        st.download_button(
+            f"💾 Baixar {total} tarefa(s)",
+            data=arquivo,
+            file_name=f"agenda.{'csv' if formato == 'csv' else 'jsonl'}",
+            mime="text/csv" if formato == 'csv' else "application/json"
+        )
+    
+    st.subheader("⬆️ Importar")
+    st.caption("CSV com cabeçalho ou JSON Lines, com as mesmas colunas da exportação.")
+    arquivo = st.file_uploader("Arquivo", type=["csv", "json", "jsonl"])
+    
+    if arquivo and st.button("Importar tarefas"):
+        formato = 'csv' if arquivo.name.endswith('.csv') else 'json'
+        texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+        barra = st.progress(0.0, text="Importando...")
+        
+        def progresso(importadas, rejeitadas):
+            # Posição em bytes do arquivo enviado como aproximação do avanço
+            fracao = min(arquivo.tell() / max(arquivo.size, 1), 1.0)
+            barra.progress(fracao, text=f"{importadas} importada(s), {rejeitadas} rejeitada(s)")
+        
+        try:
+            relatorio = importar_registros(LEITORES[formato](texto), progresso=progresso)
+        except (ValueError, sqlite3.Error) as e:
+            st.error(f"❌ Erro ao importar: {e}")
+            return
+        
+        barra.progress(1.0, text="Importação concluída")
+        st.success(f"✅ {relatorio['importadas']} tarefa(s) importada(s)")
+        if relatorio['rejeitadas']:
+            st.warning(f"⚠️ {relatorio['rejeitadas']} registro(s) rejeitado(s)")
+            for numero, erro in relatorio['erros']:
+                st.caption(f"Registro {numero}: {erro}")
+
+def mostrar_arquivo():
+    st.header("🗄️ Arquivo de tarefas concluídas")
+    st.caption("Tarefas concluídas há muito tempo vão para um banco separado, deixando "
+               "as listagens, a busca e as estatísticas do dia a dia mais leves.")
+    
+    idade = st.number_input("Arquivar tarefas concluídas há mais de (dias)",
+                            min_value=0, value=IDADE_PADRAO_DIAS, step=1)
+    
+    em_andamento, resultado = estado_arquivamento()
+    if st.button("🗄️ Arquivar agora", disabled=em_andamento):
+        # Roda em segundo plano, em lotes curtos, sem travar a interface
+        iniciar_arquivamento(idade_dias=idade)
+        em_andamento = True
+    
+    if em_andamento:
+        st.info("⏳ Arquivamento em andamento...")
+    elif resultado:
+        st.success(f"✅ {resultado['arquivadas']} tarefa(s) arquivada(s) em "
+                   f"{resultado['lotes']} lote(s); {resultado['paginas_liberadas']} "
+                   f"página(s) devolvida(s) ao disco em {resultado['duracao_s']:.1f} s")
+    
+    st.divider()
+    st.subheader("💾 Backup")
+    st.caption("Cópia online, em passos curtos: as outras sessões continuam lendo e gravando.")
+    
+    em_andamento, resultado = estado_backup()
+    if st.button("💾 Fazer backup agora", disabled=em_andamento):
+        iniciar_backup()
+        em_andamento = True
+    
+    if em_andamento:
+        st.info("⏳ Backup em andamento...")
+    elif resultado:
+        st.success(f"✅ {resultado['bytes'] / 1024 / 1024:.1f} MB copiados em "
+                   f"{resultado['duracao_s']:.2f} s ({resultado['mb_por_s']:.1f} MB/s); "
+                   f"{len(resultado['apagados'])} snapshot(s) antigo(s) apagado(s)")
+    
+    snapshots = listar_snapshots()
+    if snapshots:
+        st.caption(f"{len(snapshots)} snapshot(s); o mais recente é de "
+                   f"{snapshots[0][0].strftime('%d/%m/%Y %H:%M')}. Para restaurar: "
+                   "python -m utils.backup --restaurar SNAPSHOT --destino NOVO.db "
+                   "(o banco de arquivo volta junto, como NOVO_arquivo.db)")
+
+def descrever_dia(tarefa):
+    """Dia da semana da tarefa, com a data de calendário quando a consulta a traz"""
+    if tarefa.data:
+        return f"{tarefa.dia_nome}, {tarefa.data.strftime('%d/%m/%Y')}"
+    return tarefa.dia_nome
+
+def exibir_lista_tarefas(tarefas, chave):
+    """Exibe uma lista de tarefas como grade (modo tabela) ou tarefa a tarefa"""
+    if st.session_state.get('modo_tabela'):
+        exibir_tabela_tarefas(tarefas, chave)
+        return
+    
+    mostrar_acoes_em_lote(tarefas, chave)
+    for tarefa in tarefas:
+        exibir_tarefa(tarefa)
+
+def aplicar_edicoes_tabela(chave):
+    """Converte as células editadas da grade em uma única escrita em lote"""
+    estado = f"tabela_{chave}"
+    ids = st.session_state.get(f"{estado}_ids", [])
+    datas = st.session_state.get(f"{estado}_datas", [])
+    edicoes = st.session_state.get(f"{estado}_{st.session_state.get(f'{estado}_versao', 0)}", {})
+    
+    concluir, reabrir, excluir, ocorrencias = [], [], [], []
+    for linha, colunas in edicoes.get('edited_rows', {}).items():
+        tarefa_id = ids[linha]
+        if colunas.get('Excluir'):
+            excluir.append(tarefa_id)
+        elif 'Concluída' in colunas and datas[linha]:
+            ocorrencias.append((tarefa_id, datas[linha], colunas['Concluída']))
+        elif 'Concluída' in colunas:
+            (concluir if colunas['Concluída'] else reabrir).append(tarefa_id)
+    
+    with agenda_da_sessao():
+        aplicar_lote(concluir=concluir, reabrir=reabrir, excluir=excluir, ocorrencias=ocorrencias)
+    
+    # Nova chave = grade recriada sem as edições já aplicadas
+    st.session_state[f"{estado}_versao"] = st.session_state.get(f"{estado}_versao", 0) + 1
+
+def exibir_tabela_tarefas(tarefas, chave):
+    """Exibe as tarefas em uma única grade editável (st.data_editor)"""
+    if not tarefas:
+        st.info("Nenhuma tarefa para mostrar.")
+        return
+    
+    estado = f"tabela_{chave}"
+    
+    # Estrutura colunar montada em uma passada: uma lista por campo do registro
+    colunas = Tarefa(*zip(*tarefas))
+    dados = {
+        'Concluída': [bool(c) for c in colunas.concluida],
+        'Título': colunas.titulo,
+        'Horário': colunas.horario,
+        'Dia': colunas.dia_nome,
+        'Data': colunas.data,
+        'Prioridade': colunas.prioridade,
+        'Descrição': colunas.descricao,
+        'Excluir': [False] * len(tarefas),
+    }
+    st.session_state[f"{estado}_ids"] = colunas.id
+    st.session_state[f"{estado}_datas"] = colunas.data_ocorrencia
+    
+    st.data_editor(
+        dados,
+        key=f"{estado}_{st.session_state.get(f'{estado}_versao', 0)}",
+        disabled=['Título', 'Horário', 'Dia', 'Data', 'Prioridade', 'Descrição'],
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'Concluída': st.column_config.CheckboxColumn(width='small'),
+            'Data': st.column_config.DateColumn(format='DD/MM/YYYY'),
+            'Excluir': st.column_config.CheckboxColumn("🗑️ Excluir", width='small'),
+        }
+    )
+    
+    st.button("💾 Aplicar alterações", key=f"{estado}_aplicar",
+              on_click=aplicar_edicoes_tabela, args=(chave,))
+
+# =============================================
+# ATUALIZAÇÃO OTIMISTA
+# =============================================
+
+def resumo_da_sessao():
+    """Total e concluídas da sidebar, relidos do banco só quando outra sessão o alterou
+    
+    Os cliques desta sessão ajustam os contadores na hora (aplicar_otimista) e,
+    gravados, avançam o seq guardado; qualquer outra alteração no meio força a releitura.
+    """
+    banco = banco_atual()
+    seq = ultima_alteracao()
+    resumo = st.session_state.get('resumo')
+    if resumo is None or resumo['banco'] != banco or resumo['seq'] != seq:
+        stats = contar_estatisticas()
+        # Cliques ainda não gravados não estão na contagem lida
+        resumo = otimistas.somar_pendentes(st.session_state, {
+            'banco': banco, 'seq': seq, 'total': stats['total'], 'concluidas': stats['concluidas']
+        })
+        st.session_state.resumo = resumo
+    return resumo
+
+def chave_otimista(tarefa):
+    """Chave da tarefa (ou da ocorrência) nas mudanças otimistas da sessão"""
+    ocorrencia = tarefa.data_ocorrencia
+    return (banco_atual(), f"{tarefa.id}_{ocorrencia}" if ocorrencia else tarefa.id)
+
+def aplicar_otimista(tarefa, acao):
+    """Callback dos botões de uma tarefa: muda a tela na hora e grava em segundo plano"""
+    with agenda_da_sessao():
+        if acao == 'excluir':
+            futuro = excluir_tarefa_sem_espera(tarefa.id)
+            # Uma ocorrência excluída leva a série inteira, cujo status não está na tela
+            chave = (banco_atual(), tarefa.id)
+            delta = None if tarefa.data_ocorrencia else (-1, -1 if tarefa.concluida else 0)
+        else:
+            concluida = acao == 'concluir'
+            futuro = marcar_concluida_sem_espera(tarefa.id, concluida, tarefa.data_ocorrencia)
+            chave = chave_otimista(tarefa)
+            # Ocorrências não contam no resumo (só as linhas de tarefas)
+            delta = (0, 0 if tarefa.data_ocorrencia else (1 if concluida else -1))
+    
+    otimistas.registrar(st.session_state, chave, acao, futuro, delta)
+    st.session_state.conferir_resumo = True
+
+def reconciliar_otimistas(rerun_completo=False):
+    """Confere as gravações em segundo plano; as que falharam são desfeitas na tela"""
+    for erro in otimistas.reconciliar(st.session_state, rerun_completo):
+        st.toast(f"❌ Não foi possível gravar a alteração: {erro}")
+
+def tarefa_otimista(tarefa):
+    """A tarefa com as mudanças otimistas desta sessão (None se foi excluída)"""
+    return otimistas.sobrepor(st.session_state, tarefa, chave_otimista(tarefa),
+                              (banco_atual(), tarefa.id))
+
+def conferir_resumo():
+    """Depois de um clique, redesenha a página inteira só se o resumo da sidebar mudou
+    
+    O rerun de um fragmento não alcança a sidebar, e escrever nela de dentro do
+    fragmento não é suportado: a alternativa é o rerun completo, evitado quando
+    o clique não altera os contadores (ocorrências, por exemplo).
+    """
+    if not st.session_state.pop('conferir_resumo', False):
+        return
+    stats = resumo_da_sessao()
+    if (stats['banco'], stats['total'], stats['concluidas']) != st.session_state.get('resumo_exibido'):
+        st.rerun(scope="app")
+
+@st.fragment
 def exibir_tarefa(tarefa):
-    """Exibe uma tarefa individualmente"""
-    (id, dia_id, titulo, descricao, horario, prioridade, 
-     concluida, data_criacao, dia_nome, *extra) = tarefa
+    """Exibe uma tarefa individualmente
+    
+    Fragmento: um clique nos botões roda de novo só esta tarefa, com a mudança
+    aplicada na sessão enquanto o escritor grava no banco.
+    """
+    desenhar_tarefa(tarefa)
+
+def desenhar_tarefa(tarefa):
+    """Cartão de uma tarefa, com as mudanças otimistas desta sessão"""
+    with agenda_da_sessao():
+        reconciliar_otimistas()
+        conferir_resumo()
+        tarefa = tarefa_otimista(tarefa)
+    if tarefa is None:
+        return
     
     # Container para cada tarefa
     with st.container():
@@ -553,54 +921,53 @@ def exibir_tarefa(tarefa):
         
         with col1:
             # Status (concluída ou pendente) - riscado se concluído
-            status = "✅" if concluida else "⏳"
-            if concluida:
-                st.write(f"{status} ~~{titulo}~~")
+            status = "✅" if tarefa.concluida else "⏳"
+            if tarefa.concluida:
+                st.write(f"{status} ~~{tarefa.titulo}~~")
                 st.caption("Concluída")
             else:
-                st.write(f"{status} **{titulo}**")
+                st.write(f"{status} **{tarefa.titulo}**")
             
-            if descricao:
-                st.caption(descricao)
+            if tarefa.descricao:
+                st.caption(tarefa.descricao)
         
         with col2:
             # Horário e dia
-            if horario:
-                st.write(f"🕒 {horario}")
-            st.write(f"📅 {dia_nome}")
+            if tarefa.horario:
+                st.write(f"🕒 {tarefa.horario}" + (f" · {tarefa.duracao} min" if tarefa.duracao else ""))
+            st.write(f"📅 {descrever_dia(tarefa)}")
+            if tarefa.data_ocorrencia:
+                st.caption(f"🔁 Ocorrência de {tarefa.data_ocorrencia.strftime('%d/%m/%Y')}")
             
-            # Data de criação
-            if data_criacao:
-                try:
-                    data = datetime.datetime.strptime(data_criacao, '%Y-%m-%d %H:%M:%S')
-                    st.caption(f"Criada: {data.strftime('%d/%m/%Y')}")
-                except:
-                    st.caption(f"Criada: {data_criacao}")
+            # Data de criação (já convertida na leitura do banco)
+            if tarefa.criada_em:
+                st.caption(f"Criada: {tarefa.criada_em.strftime('%d/%m/%Y')}")
+            elif tarefa.data_criacao:
+                st.caption(f"Criada: {tarefa.data_criacao}")
         
         with col3:
             # Prioridade com cores
             cores = {'alta': '🔴', 'media': '🟡', 'baixa': '🟢'}
-            st.write(f"{cores.get(prioridade, '⚪')} {prioridade.title()}")
+            st.write(f"{cores.get(tarefa.prioridade, '⚪')} {tarefa.prioridade.title()}")
         
         with col4:
-            # Botões de ação
+            # Botões de ação; ocorrências de tarefas recorrentes são concluídas por data
             col_a, col_b = st.columns(2)
+            ocorrencia = tarefa.data_ocorrencia
+            chave = f"{tarefa.id}_{ocorrencia}" if ocorrencia else tarefa.id
             
             with col_a:
-                if concluida:
-                    if st.button("↩️", key=f"desfazer_{id}", help="Desfazer conclusão"):
-                        marcar_concluida(id, False)
-                        st.rerun()
+                if tarefa.concluida:
+                    st.button("↩️", key=f"desfazer_{chave}", help="Desfazer conclusão",
+                              on_click=aplicar_otimista, args=(tarefa, 'reabrir'))
                 else:
-                    if st.button("✔️", key=f"concluir_{id}", help="Marcar como concluída"):
-                        marcar_concluida(id, True)
-                        st.rerun()
+                    st.button("✔️", key=f"concluir_{chave}", help="Marcar como concluída",
+                              on_click=aplicar_otimista, args=(tarefa, 'concluir'))
             
             with col_b:
-                if st.button("🗑️", key=f"excluir_{id}", help="Excluir tarefa"):
-                    excluir_tarefa(id)
-                    st.success("🗑️ Tarefa excluída!")
-                    st.rerun()
+                ajuda = "Excluir a série inteira" if ocorrencia else "Excluir tarefa"
+                st.button("🗑️", key=f"excluir_{chave}", help=ajuda,
+                          on_click=aplicar_otimista, args=(tarefa, 'excluir'))
         
         st.divider()
 
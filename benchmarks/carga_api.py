@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.gerador import gerar_agenda
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milhares de req/s só valem para leituras servidas do cache. Com 5% de escritas
+# (cenário misto) cada escrita invalida o cache inteiro do banco e as leituras
+# seguintes refazem consulta e JSON: num núcleo compartilhado com o gerador de
+# carga (10k tarefas, 32 conexões) o misto fica em ~0,5-0,7k req/s. Por isso ele
+# tem um piso próprio (--minimo-escrita) em vez do --minimo das leituras
+MINIMO_ESCRITA_PADRAO = 400
+
+# Requisições de cada cenário: (peso, método, caminho, corpo)
+CENARIOS = {
+    'listar_dia': [(1, 'GET', '/tarefas?dia=3&semana=2024-01-01', None)],
+    'estatisticas': [(1, 'GET', '/estatisticas', None)],
+    'buscar': [(1, 'GET', '/busca?q=reuniao', None)],
+    # Uso típico de uma automação: muitas leituras e algumas escritas. Toda
+    # escrita invalida o cache de leitura e as leituras seguintes refazem
+    # consulta e JSON, então a proporção de escritas domina o resultado
+    'misto': [
+        (60, 'GET', '/tarefas?dia=3&semana=2024-01-01', None),
+        (10, 'GET', '/tarefas?inicio=2024-01-01&fim=2024-01-07', None),
+        (20, 'GET', '/estatisticas', None),
+        (5, 'GET', '/busca?q=relatorio', None),
+        (5, 'POST', '/tarefas', {'titulo': 'Tarefa de carga', 'data': '2024-01-03',
+                                 'horario': '12:00', 'prioridade': 'alta'}),
+    ],
+}
+
+def _tem_escritas(cenario):
+    return any(metodo != 'GET' for _, metodo, _, _ in CENARIOS[cenario])
+
+def _porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _montar_requisicao(metodo, caminho, corpo):
+    dados = json.dumps(corpo).encode() if corpo is not None else b''
+    return (f"{metodo} {caminho} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Length: {len(dados)}\r\n\r\n").encode('latin-1') + dados
+
+async def _cliente(host, porta, requisicoes, pesos, fim, latencias, erros, semente):
+    """Uma conexão keep-alive enviando requisições em sequência até `fim`"""
+    aleatorio = random.Random(semente)
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    try:
+        while time.perf_counter() < fim:
+            requisicao = aleatorio.choices(requisicoes, pesos)[0]
+            inicio = time.perf_counter()
+            escritor.write(requisicao)
+            cabecalho = await leitor.readuntil(b'\r\n\r\n')
+            status = int(cabecalho[9:12])
+            tamanho = 0
+            for linha in cabecalho.split(b'\r\n'):
+                if linha.lower().startswith(b'content-length:'):
+                    tamanho = int(linha.split(b':', 1)[1])
+            await leitor.readexactly(tamanho)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if status >= 400:
+                erros.append(status)
+    finally:
+        escritor.close()
+
+async def gerar_carga(host, porta, cenario, conexoes, duracao):
+    """Dispara `conexoes` clientes por `duracao` segundos; devolve as medidas"""
+    itens = CENARIOS[cenario]
+    requisicoes = [_montar_requisicao(metodo, caminho, corpo) for _, metodo, caminho, corpo in itens]
+    pesos = [peso for peso, *_ in itens]
+
+    latencias = []
+    erros = []
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    await asyncio.gather(*(
+        _cliente(host, porta, requisicoes, pesos, fim, latencias, erros, semente)
+        for semente in range(conexoes)
+    ))
+    decorrido = time.perf_counter() - inicio
+
+    percentis = statistics.quantiles(latencias, n=100, method='inclusive')
+    return {
+        'requisicoes': len(latencias),
+        'por_segundo': round(len(latencias) / decorrido, 1),
+        'p50_ms': round(percentis[49], 3),
+        'p95_ms': round(percentis[94], 3),
+        'p99_ms': round(percentis[98], 3),
+        'erros': len(erros),
+    }
+
+def iniciar_servidor(banco, porta, threads, nucleo=None):
+    """Sobe api.py em outro processo (fixado em `nucleo`, se informado) e espera a porta"""
+    def fixar_nucleo():
+        if nucleo is not None and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, {nucleo})
+
+    processo = subprocess.Popen(
+        [sys.executable, os.path.join(RAIZ, 'api.py'), '--banco', banco,
+         '--porta', str(porta), '--threads', str(threads)],
+        preexec_fn=fixar_nucleo, cwd=RAIZ,
+    )
+    limite = time.perf_counter() + 30
+    while time.perf_counter() < limite:
+        try:
+            socket.create_connection(('127.0.0.1', porta), timeout=0.2).close()
+            return processo
+        except OSError:
+            if processo.poll() is not None:
+                raise RuntimeError("a API terminou durante a inicialização")
+            time.sleep(0.1)
+    processo.terminate()
+    raise RuntimeError("a API não respondeu em 30 s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.carga_api',
+        description='Teste de carga da API HTTP (api.py) com conexões keep-alive'
+    )
+    parser.add_argument('--cenarios', nargs='+', choices=sorted(CENARIOS), default=sorted(CENARIOS))
+    parser.add_argument('--escala', type=int, default=10000, help='tarefas na agenda sintética')
+    parser.add_argument('--conexoes', type=int, default=32)
+    parser.add_argument('--duracao', type=float, default=10, help='segundos por cenário')
+    parser.add_argument('--threads', type=int, default=4, help='threads do pool da API')
+    parser.add_argument('--nucleo', type=int, default=0,
+                        help='núcleo em que a API roda (-1 = sem fixar)')
+    parser.add_argument('--minimo', type=float,
+                        help='falha se algum cenário só de leituras ficar abaixo (req/s)')
+    parser.add_argument('--minimo-escrita', type=float, default=MINIMO_ESCRITA_PADRAO,
+                        help='piso (req/s) dos cenários com escritas, usado junto com --minimo; '
+                             'bem menor que o das leituras porque cada escrita invalida o cache '
+                             f'(padrão: {MINIMO_ESCRITA_PADRAO})')
+    parser.add_argument('--saida', help='arquivo JSON com os resultados')
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = os.path.join(pasta, f'agenda_{args.escala}.db')
+        print(f"Gerando {args.escala} tarefas em {banco}...", file=sys.stderr)
+        gerar_agenda(banco, args.escala)
+
+        porta = _porta_livre()
+        processo = iniciar_servidor(banco, porta, args.threads,
+                                    None if args.nucleo < 0 else args.nucleo)
+        try:
+            for cenario in args.cenarios:
+                medida = asyncio.run(gerar_carga('127.0.0.1', porta, cenario,
+                                                 args.conexoes, args.duracao))
+                resultados[cenario] = medida
+                print(f"{cenario:<14} {medida['por_segundo']:>9.1f} req/s  "
+                      f"p50={medida['p50_ms']:>7.3f} ms  p95={medida['p95_ms']:>7.3f} ms  "
+                      f"p99={medida['p99_ms']:>7.3f} ms  erros={medida['erros']}")
+        finally:
+            processo.terminate()
+            processo.wait()
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+    if args.minimo:
+        abaixo = [cenario for cenario, medida in resultados.items()
+                  if medida['erros'] or medida['por_segundo'] < (
+                      args.minimo_escrita if _tem_escritas(cenario) else args.minimo)]
+        if abaixo:
+            print(f"Abaixo do mínimo: {', '.join(abaixo)}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.gerador import gerar_agenda
+from utils import database as dao
+from utils import intervalos
+from utils.cache import invalidar_cache
+from utils.conexao import usar_banco
+
+ESCALAS_PADRAO = [1000, 10000, 100000]
+
+# Primeira semana das agendas sintéticas (benchmarks/gerador.py começa em 2024-01-01)
+SEMANA = datetime.date(2024, 1, 1)
+
+# Funções do DAO e caminhos de dados de cada página do app.py
+CENARIOS = {
+    'listar_dias_semana': lambda: dao.listar_dias_semana(),
+    'listar_tarefas_por_dia': lambda: dao.listar_tarefas_por_dia(3, SEMANA),
+    'listar_todas_tarefas': lambda: dao.listar_todas_tarefas(),
+    'obter_semana': lambda: dao.obter_semana(SEMANA),
+    'listar_tarefas_por_data': lambda: dao.listar_tarefas_por_data(
+        SEMANA, SEMANA + datetime.timedelta(days=30)
+    ),
+    'listar_tarefas_filtradas': lambda: dao.listar_tarefas_filtradas(concluida=False, limite=50),
+    'contar_tarefas_filtradas': lambda: dao.contar_tarefas_filtradas(concluida=False),
+    'buscar_tarefas': lambda: dao.buscar_tarefas('reuniao equipe'),
+    'contar_estatisticas': lambda: dao.contar_estatisticas(),
+    # O índice de horários do dia não depende do cache: é montado na 1ª execução
+    'verificar_conflitos': lambda: intervalos.verificar_conflitos(
+        SEMANA + datetime.timedelta(days=2), '10:00', 45
+    ),
+    'proximo_horario_livre': lambda: intervalos.proximo_horario_livre(
+        SEMANA + datetime.timedelta(days=2), 45
+    ),
+    'ciclo_escrita': lambda: _ciclo_escrita(),
+    'pagina_visao_semanal': lambda: (dao.contar_estatisticas(), dao.obter_semana(SEMANA)),
+    'pagina_todas_tarefas': lambda: (
+        dao.contar_estatisticas(), dao.listar_dias_semana(),
+        dao.listar_tarefas_filtradas(limite=50), dao.contar_tarefas_filtradas()
+    ),
+    'pagina_buscar': lambda: (dao.contar_estatisticas(), dao.buscar_tarefas('relatorio')),
+    'pagina_estatisticas': lambda: (
+        dao.contar_estatisticas(), dao.listar_dias_semana(), dao.listar_resumo_diario(),
+        dao.listar_tarefas_recentes(5)
+    ),
+}
+
+def _ciclo_escrita():
+    """Adiciona, conclui e exclui uma tarefa (deixa o banco como estava)"""
+    tarefa_id = dao.adicionar_tarefa(1, 'Tarefa de benchmark', None, '12:00', 'alta')
+    dao.marcar_concluida(tarefa_id, True)
+    dao.excluir_tarefa(tarefa_id)
+
+def medir(cenario, repeticoes, com_cache=False):
+    """Executa o cenário e devolve latências p50/p95 (ms) e pico de memória (KiB)"""
+    tempos = []
+    for _ in range(repeticoes):
+        if not com_cache:
+            invalidar_cache()
+        inicio = time.perf_counter()
+        cenario()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    # Memória medida em uma execução separada: o tracemalloc distorce os tempos
+    if not com_cache:
+        invalidar_cache()
+    tracemalloc.start()
+    cenario()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    percentis = statistics.quantiles(tempos, n=100, method='inclusive') if len(tempos) > 1 else tempos * 99
+    return {
+        'p50_ms': round(statistics.median(tempos), 4),
+        'p95_ms': round(percentis[94], 4),
+        'pico_memoria_kib': round(pico / 1024, 1),
+        'repeticoes': repeticoes,
+    }
+
+def _commit_atual():
+    """Hash do commit atual, para comparar resultados entre versões"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def executar(escalas, repeticoes, pasta_dados, cenarios=None, com_cache=False, saida=print):
+    """Gera (ou reaproveita) os bancos sintéticos e mede cada cenário em cada escala"""
+    resultados = {}
+    for escala in escalas:
+        caminho = os.path.join(pasta_dados, f'agenda_{escala}.db')
+        if not os.path.exists(caminho):
+            saida(f"Gerando {escala} tarefas em {caminho}...")
+            gerar_agenda(caminho, escala)
+
+        resultados[str(escala)] = {}
+        with usar_banco(caminho):
+            dao.criar_tabelas()
+            for nome in cenarios or CENARIOS:
+                # Menos repetições para as listagens completas nas escalas grandes
+                vezes = max(3, repeticoes // 10) if escala >= 100000 and 'todas' in nome else repeticoes
+                medida = medir(CENARIOS[nome], vezes, com_cache)
+                resultados[str(escala)][nome] = medida
+                saida(f"{escala:>9} {nome:<28} p50={medida['p50_ms']:>10.3f} ms  "
+                      f"p95={medida['p95_ms']:>10.3f} ms  pico={medida['pico_memoria_kib']:>10.1f} KiB")
+
+    return {
+        'commit': _commit_atual(),
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'com_cache': com_cache,
+        'resultados': resultados,
+    }
+
+def comparar(atual, anterior, tolerancia=0.2, saida=print):
+    """Aponta cenários cujo p95 piorou mais que `tolerancia` em relação ao anterior"""
+    regressoes = []
+    for escala, medidas in atual['resultados'].items():
+        for nome, medida in medidas.items():
+            base = anterior['resultados'].get(escala, {}).get(nome)
+            if not base or not base['p95_ms']:
+                continue
+            razao = medida['p95_ms'] / base['p95_ms']
+            if razao > 1 + tolerancia:
+                regressoes.append((escala, nome, razao))
+                saida(f"REGRESSÃO {escala:>9} {nome:<28} p95 {base['p95_ms']:.3f} -> "
+                      f"{medida['p95_ms']:.3f} ms ({razao:.2f}x)")
+    return regressoes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.executar',
+        description='Mede as funções do DAO e as páginas do app em agendas sintéticas'
+    )
+    parser.add_argument('--escalas', type=int, nargs='+', default=ESCALAS_PADRAO,
+                        help='quantidades de tarefas (10³ a 10⁶)')
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--cenarios', nargs='+', choices=sorted(CENARIOS))
+    parser.add_argument('--dados', help='pasta para guardar/reaproveitar os bancos gerados')
+    parser.add_argument('--com-cache', action='store_true',
+                        help='mede com o cache de leitura aquecido')
+    parser.add_argument('--saida', help='arquivo JSON com os resultados')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help='piora relativa do p95 considerada regressão')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta = args.dados or temporaria
+        os.makedirs(pasta, exist_ok=True)
+        relatorio = executar(args.escalas, args.repeticoes, pasta, args.cenarios, args.com_cache)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            if comparar(relatorio, json.load(arquivo), args.tolerancia):
+                return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import datetime
+import os
+import random
+
+from utils.cache import invalidar_cache
+from utils.conexao import obter_gerenciador, usar_banco
+from utils.migracoes import migrar
+
+# Vocabulário para títulos e descrições realistas
+ACOES = ['Reunião', 'Ligar para', 'Revisar', 'Enviar', 'Estudar', 'Comprar', 'Pagar',
+         'Agendar', 'Preparar', 'Organizar', 'Responder', 'Visitar', 'Treino de']
+OBJETOS = ['equipe', 'cliente', 'relatório mensal', 'orçamento', 'apresentação',
+           'médico', 'dentista', 'mercado', 'contas de luz', 'aluguel', 'inglês',
+           'matemática', 'projeto final', 'e-mails', 'fornecedor', 'academia', 'natação']
+COMPLEMENTOS = ['com urgência', 'antes do almoço', 'levar documentos', 'confirmar horário',
+                'ver pendências da semana passada', 'trazer notebook', 'sem falta']
+
+PRIORIDADES = ['alta', 'media', 'baixa']
+PESOS_PRIORIDADES = [0.2, 0.5, 0.3]
+
+TAMANHO_LOTE = 10000
+
+def gerar_tarefas(quantidade, semente=42):
+    """Gera tuplas de tarefas sintéticas de forma determinística"""
+    aleatorio = random.Random(semente)
+    inicio = datetime.datetime(2024, 1, 1)
+
+    for i in range(quantidade):
+        titulo = f"{aleatorio.choice(ACOES)} {aleatorio.choice(OBJETOS)}"
+        descricao = aleatorio.choice(COMPLEMENTOS) if aleatorio.random() < 0.4 else None
+
+        # 20% sem horário; os demais entre 07:00 e 21:45, em passos de 15 minutos
+        if aleatorio.random() < 0.2:
+            horario = None
+        else:
+            minutos = aleatorio.randrange(7 * 60, 22 * 60, 15)
+            horario = f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+        prioridade = aleatorio.choices(PRIORIDADES, PESOS_PRIORIDADES)[0]
+        concluida = 1 if aleatorio.random() < 0.4 else 0
+        criada_em = inicio + datetime.timedelta(minutes=i * 7)
+
+        yield (aleatorio.randint(1, 7), titulo, descricao, horario, prioridade,
+               concluida, criada_em.strftime('%Y-%m-%d %H:%M:%S'))
+
+def gerar_agenda(caminho, quantidade, semente=42):
+    """Cria (ou recria) um banco no formato de agenda.db com `quantidade` tarefas"""
+    obter_gerenciador(caminho).fechar()
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+
+    with usar_banco(caminho):
+        gerenciador = obter_gerenciador()
+        migrar(gerenciador.conexao())
+        tarefas = gerar_tarefas(quantidade, semente)
+
+        while True:
+            lote = [tarefa for _, tarefa in zip(range(TAMANHO_LOTE), tarefas)]
+            if not lote:
+                break
+            with gerenciador.transacao() as conn:
+                conn.executemany('''
+                    INSERT INTO tarefas (dia_semana_id, titulo, descricao, horario,
+                                         prioridade, concluida, data_criacao)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', lote)
+
+        gerenciador.conexao().execute('ANALYZE')
+        invalidar_cache()
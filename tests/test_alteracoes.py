@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from utils import database as dao
+from utils.alteracoes import alteracoes_desde, ultima_alteracao
+from utils.conexao import obter_conexao, obter_gerenciador, transacao, usar_banco
+from utils.migracoes import HISTORICO_ALTERACOES, LIMPEZA_ALTERACOES
+
+SEGUNDA = date(2024, 1, 1)
+QUARTA = date(2024, 1, 3)
+
+
+class TestAlteracoes(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def test_datas_alteradas_desde_o_seq_conhecido(self):
+        seq, datas = alteracoes_desde(None)
+        # Sessão nova: não há o que comparar, recarrega tudo
+        self.assertIsNone(datas)
+        self.assertEqual(alteracoes_desde(seq), (seq, set()))
+
+        tarefa_id = dao.adicionar_tarefa(1, 'Reunião', data=SEGUNDA)
+        seq, datas = alteracoes_desde(seq)
+        self.assertEqual(datas, {SEGUNDA})
+
+        # Mudar de dia atualiza o dia antigo e o novo
+        dao.atualizar_tarefa(tarefa_id, data=QUARTA)
+        seq, datas = alteracoes_desde(seq)
+        self.assertEqual(datas, {SEGUNDA, QUARTA})
+
+        dao.excluir_tarefa(tarefa_id)
+        self.assertEqual(alteracoes_desde(seq)[1], {QUARTA})
+
+    def test_ocorrencia_e_serie(self):
+        serie = dao.adicionar_tarefa(1, 'Série', data=SEGUNDA, recorrencia_dias=[1, 3])
+        seq = ultima_alteracao()
+
+        dao.marcar_ocorrencia_concluida(serie, QUARTA)
+        seq, datas = alteracoes_desde(seq)
+        self.assertEqual(datas, {QUARTA})
+
+        # A série inteira mudou: atinge todos os dias, recarrega tudo
+        dao.atualizar_tarefa(serie, titulo='Série renomeada')
+        self.assertIsNone(alteracoes_desde(seq)[1])
+
+    def test_seq_a_frente_do_banco_recarrega(self):
+        dao.adicionar_tarefa(1, 'Reunião', data=SEGUNDA)
+        # Banco restaurado de um snapshot mais antigo que a sessão
+        seq = ultima_alteracao()
+        self.assertEqual(alteracoes_desde(seq + 5), (seq, None))
+
+    def test_limpeza_e_sessao_atrasada(self):
+        total = HISTORICO_ALTERACOES + LIMPEZA_ALTERACOES
+        with transacao() as conn:
+            conn.executemany('INSERT INTO alteracoes (tarefa_id, data) VALUES (?, ?)',
+                             [(1, SEGUNDA.isoformat())] * total)
+
+        primeiro, ultimo = obter_conexao().execute(
+            'SELECT MIN(seq), MAX(seq) FROM alteracoes').fetchone()
+        # A limpeza roda a cada LIMPEZA_ALTERACOES e mantém HISTORICO_ALTERACOES
+        self.assertEqual((primeiro, ultimo), (total - HISTORICO_ALTERACOES + 1, total))
+
+        # Logo antes do histórico restante: ainda dá para atualizar só o que mudou
+        self.assertEqual(alteracoes_desde(primeiro - 1), (total, {SEGUNDA}))
+        # Atrasada além da limpeza: parte do histórico sumiu, recarrega tudo
+        self.assertEqual(alteracoes_desde(primeiro - 2), (total, None))
+        self.assertEqual(alteracoes_desde(0), (total, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import api
+from utils import database as dao
+from utils.conexao import obter_gerenciador, usar_banco
+
+
+class TestApi(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        with usar_banco(self.caminho):
+            dao.criar_tabelas()
+            self.tarefa_id = dao.adicionar_tarefa(1, 'Existente')
+
+    def tearDown(self):
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def requisitar(self, metodo, alvo, corpo=None):
+        status, resposta = api.processar(metodo, alvo, json.dumps(corpo).encode() if corpo else b'',
+                                         banco=self.caminho)
+        return status, json.loads(resposta)
+
+    def test_adicionar_valida_recorrencia_e_duracao(self):
+        invalidos = [
+            {'recorrencia_dias': [1, 9]},
+            {'recorrencia_dias': '1,3'},
+            {'recorrencia_dias': [1], 'recorrencia_vezes': 0},
+            {'recorrencia_dias': [1], 'recorrencia_vezes': '3'},
+            {'duracao': -30},
+            {'duracao': 1.5},
+            {'prioridade': 'urgente'},
+            {'dia_semana_id': 42},
+        ]
+        for extra in invalidos:
+            with self.subTest(extra):
+                status, resposta = self.requisitar('POST', '/tarefas',
+                                                   {'titulo': 'Nova', 'dia_semana_id': 1, **extra})
+                self.assertEqual(status, 400, resposta)
+
+        status, resposta = self.requisitar('POST', '/tarefas', {
+            'titulo': 'Série', 'data': '2024-01-01', 'recorrencia_dias': [1, 3],
+            'recorrencia_vezes': 4, 'duracao': 30,
+        })
+        self.assertEqual(status, 201, resposta)
+
+    def test_atualizar_com_campo_invalido_responde_400(self):
+        for corpo in ({'prioridade': 'urgente'}, {'duracao': 0}, {'dia_semana_id': 42},
+                      {'titulo': '  '}):
+            with self.subTest(corpo):
+                status, resposta = self.requisitar('PATCH', f'/tarefas/{self.tarefa_id}', corpo)
+                self.assertEqual(status, 400, resposta)
+
+        status, resposta = self.requisitar('PATCH', f'/tarefas/{self.tarefa_id}', {'prioridade': 'alta'})
+        self.assertEqual(status, 200, resposta)
+
+    def test_concluir_interpreta_concluida_estritamente(self):
+        casos = [(True, True), (False, False), (1, True), (0, False), ('true', True),
+                 ('false', False), ('1', True), ('0', False), ('sim', True), ('não', False)]
+        for valor, esperado in casos:
+            with self.subTest(valor):
+                status, resposta = self.requisitar('POST', f'/tarefas/{self.tarefa_id}/concluir',
+                                                   {'concluida': valor})
+                self.assertEqual(status, 200, resposta)
+                self.assertIs(resposta['concluida'], esperado)
+                with usar_banco(self.caminho):
+                    self.assertEqual(dao.contar_estatisticas()['concluidas'], int(esperado))
+
+        for valor in ('talvez', 2, None, [], {}):
+            with self.subTest(valor):
+                status, resposta = self.requisitar('POST', f'/tarefas/{self.tarefa_id}/concluir',
+                                                   {'concluida': valor})
+                self.assertEqual(status, 400, resposta)
+
+        # Sem o campo, conclui
+        status, resposta = self.requisitar('POST', f'/tarefas/{self.tarefa_id}/concluir')
+        self.assertEqual((status, resposta['concluida']), (200, True))
+
+    def test_erro_inesperado_responde_500(self):
+        with mock.patch.object(dao, 'contar_estatisticas', side_effect=RuntimeError('falhou')):
+            with self.assertLogs('agenda.api', 'ERROR'):
+                status, resposta = self.requisitar('GET', '/estatisticas')
+        self.assertEqual(status, 500)
+        self.assertEqual(resposta, {'erro': "erro interno"})
+
+    def enviar(self, bruto):
+        """Envia bytes crus ao servidor e devolve a linha de status da resposta"""
+        async def conversar():
+            servidor = api.ServidorApi(self.caminho, maximo_threads=1)
+            rede = await asyncio.start_server(servidor.atender, '127.0.0.1', 0)
+            porta = rede.sockets[0].getsockname()[1]
+            try:
+                leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+                escritor.write(bruto)
+                await escritor.drain()
+                linha = await asyncio.wait_for(leitor.readline(), 5)
+                escritor.close()
+                return linha.decode().strip()
+            finally:
+                rede.close()
+                await rede.wait_closed()
+                servidor.executor.shutdown()
+
+        return asyncio.run(conversar())
+
+    def test_content_length_invalido_responde_400(self):
+        for valor in (b'abc', b'-5'):
+            with self.subTest(valor):
+                linha = self.enviar(b'POST /tarefas HTTP/1.1\r\nContent-Length: ' + valor + b'\r\n\r\n')
+                self.assertEqual(linha, 'HTTP/1.1 400 Bad Request')
+
+    def test_falha_ao_despachar_responde_500(self):
+        with mock.patch.object(api, 'processar', side_effect=RuntimeError('falhou')):
+            with self.assertLogs('agenda.api', 'ERROR'):
+                linha = self.enviar(b'GET /dias HTTP/1.1\r\nConnection: close\r\n\r\n')
+        self.assertEqual(linha, 'HTTP/1.1 500 Internal Server Error')
+
+
+if __name__ == '__main__':
+    unittest.main()
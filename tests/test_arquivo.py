@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+from utils import database as dao
+from utils import escritor
+from utils.arquivo import ESQUEMA, _sincronizar_esquema, anexar_arquivo, arquivar, caminho_arquivo
+from utils.conexao import obter_conexao, obter_gerenciador, transacao, usar_banco
+
+DATA = date(2024, 1, 3)
+
+
+class TestArquivar(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+
+        self.antiga = dao.adicionar_tarefa(3, 'Antiga', horario='09:00', prioridade='alta', data=DATA)
+        self.recente = dao.adicionar_tarefa(3, 'Recente', data=DATA)
+        self.pendente = dao.adicionar_tarefa(3, 'Pendente', horario='14:00', data=DATA)
+        self.serie = dao.adicionar_tarefa(1, 'Série', data=DATA, recorrencia_dias=[3])
+        dao.marcar_concluidas([self.antiga, self.recente, self.serie])
+        with transacao() as conn:
+            conn.execute("UPDATE tarefas SET concluida_em = '2000-01-01' WHERE id IN (?, ?)",
+                         (self.antiga, self.serie))
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        for nome in os.listdir(self.pasta.name):
+            obter_gerenciador(os.path.join(self.pasta.name, nome)).fechar()
+        self.pasta.cleanup()
+
+    def titulos(self, tarefas):
+        return sorted(tarefa.titulo for tarefa in tarefas)
+
+    def test_move_so_as_concluidas_antigas_pelo_escritor(self):
+        eventos = []
+        with mock.patch.object(escritor, '_ao_confirmar', [lambda caminho, lote: eventos.extend(lote)]):
+            resultado = arquivar(idade_dias=30, pausa=0)
+
+        self.assertEqual((resultado['arquivadas'], resultado['lotes']), (1, 1))
+        # Séries recorrentes não são arquivadas, mesmo concluídas há muito tempo
+        self.assertEqual(self.titulos(dao.listar_todas_tarefas()), ['Pendente', 'Recente', 'Série'])
+        self.assertIn(('tarefa', self.antiga), eventos)
+
+        conn = sqlite3.connect(caminho_arquivo(self.caminho))
+        try:
+            self.assertEqual(conn.execute('SELECT id, titulo FROM tarefas').fetchall(),
+                             [(self.antiga, 'Antiga')])
+        finally:
+            conn.close()
+
+    def test_arquivada_sai_do_indice_de_horarios(self):
+        from utils.intervalos import verificar_conflitos
+
+        self.assertEqual([tarefa.id for tarefa in verificar_conflitos(DATA, '09:15')], [self.antiga])
+        arquivar(idade_dias=30, pausa=0)
+        self.assertEqual(verificar_conflitos(DATA, '09:15'), [])
+
+    def test_nova_execucao_nao_duplica(self):
+        arquivar(idade_dias=30, pausa=0)
+        self.assertEqual(arquivar(idade_dias=30, pausa=0)['arquivadas'], 0)
+        self.assertEqual(self.titulos(dao.listar_todas_tarefas(incluir_arquivo=True)),
+                         ['Antiga', 'Pendente', 'Recente', 'Série'])
+
+    def test_lotes_pequenos(self):
+        with transacao() as conn:
+            conn.execute("UPDATE tarefas SET concluida_em = '2000-01-01' WHERE id = ?", (self.recente,))
+        resultado = arquivar(idade_dias=30, tamanho_lote=1, pausa=0)
+        self.assertEqual((resultado['arquivadas'], resultado['lotes']), (2, 2))
+
+    def test_consultas_com_e_sem_arquivo(self):
+        arquivar(idade_dias=30, pausa=0)
+
+        self.assertEqual(self.titulos(dao.listar_tarefas_por_data(DATA, DATA)), ['Pendente', 'Recente'])
+        self.assertEqual(self.titulos(dao.listar_tarefas_por_data(DATA, DATA, incluir_arquivo=True)),
+                         ['Antiga', 'Pendente', 'Recente'])
+        # A visão semanal junta as ocorrências da série aos dois lados do UNION
+        semana = dao.obter_semana(DATA, incluir_arquivo=True)
+        self.assertEqual(self.titulos(tarefa for dia, tarefas in semana if dia[2] == 3
+                                      for tarefa in tarefas),
+                         ['Antiga', 'Pendente', 'Recente', 'Série'])
+
+        sem = dao.contar_estatisticas()
+        com = dao.contar_estatisticas(incluir_arquivo=True)
+        self.assertEqual((sem['total'], sem['concluidas']), (3, 2))
+        self.assertEqual((com['total'], com['concluidas']), (4, 3))
+        self.assertEqual(com['prioridades']['alta'] - sem['prioridades']['alta'], 1)
+
+
+class TestSincronizarEsquema(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        for nome in os.listdir(self.pasta.name):
+            obter_gerenciador(os.path.join(self.pasta.name, nome)).fechar()
+        self.pasta.cleanup()
+
+    def colunas(self, conn, esquema):
+        return [linha[1] for linha in conn.execute(f'PRAGMA {esquema}.table_info(tarefas)')]
+
+    def test_cria_com_as_colunas_e_indices_do_principal(self):
+        conn = obter_conexao()
+        anexar_arquivo(conn)
+        self.assertEqual(self.colunas(conn, ESQUEMA), self.colunas(conn, 'main'))
+        indices = {linha[1] for linha in conn.execute(f'PRAGMA {ESQUEMA}.index_list(tarefas)')}
+        self.assertTrue({'idx_tarefas_data_chave_ordem', 'idx_tarefas_estatisticas'} <= indices)
+
+    def test_completa_arquivo_de_versao_anterior(self):
+        # Arquivo criado antes das colunas mais novas de main.tarefas
+        antigo = sqlite3.connect(caminho_arquivo(self.caminho))
+        antigo.execute('CREATE TABLE tarefas (id INTEGER PRIMARY KEY, dia_semana_id INTEGER, titulo TEXT)')
+        antigo.execute("INSERT INTO tarefas VALUES (1, 1, 'Velha')")
+        antigo.commit()
+        antigo.close()
+
+        conn = obter_conexao()
+        anexar_arquivo(conn)
+        self.assertEqual(sorted(self.colunas(conn, ESQUEMA)), sorted(self.colunas(conn, 'main')))
+        self.assertEqual(conn.execute(f'SELECT titulo, data FROM {ESQUEMA}.tarefas').fetchall(),
+                         [('Velha', None)])
+        # Já sincronizado: uma nova chamada não altera nada
+        _sincronizar_esquema(conn)
+        self.assertEqual([tarefa.titulo for tarefa in dao.listar_todas_tarefas(incluir_arquivo=True)],
+                         ['Velha'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+from utils import database as dao
+from utils.arquivo import arquivar, caminho_arquivo
+from utils.backup import aplicar_retencao, copiar_banco, criar_snapshot, listar_snapshots, restaurar
+from utils.conexao import obter_gerenciador, transacao, usar_banco
+
+
+class TestBackupComArquivo(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        with usar_banco(self.caminho):
+            dao.criar_tabelas()
+            dao.adicionar_tarefas([{'dia_semana_id': 1, 'titulo': f'Tarefa {i}'} for i in range(10)])
+            dao.marcar_concluidas([1, 2, 3, 4])
+            with transacao() as conn:
+                conn.execute("UPDATE tarefas SET concluida_em = '2000-01-01' WHERE concluida = 1")
+            self.assertEqual(arquivar(idade_dias=30, pausa=0)['arquivadas'], 4)
+
+    def tearDown(self):
+        for raiz, pastas, arquivos in os.walk(self.pasta.name):
+            for nome in arquivos:
+                obter_gerenciador(os.path.join(raiz, nome)).fechar()
+        self.pasta.cleanup()
+
+    def titulos(self, caminho):
+        with usar_banco(caminho):
+            return sorted(tarefa.titulo for tarefa in dao.listar_todas_tarefas(incluir_arquivo=True))
+
+    def test_snapshot_e_restauracao_incluem_o_arquivo(self):
+        snapshot = criar_snapshot(self.caminho, pausa=0)
+        self.assertEqual(snapshot['snapshot_arquivo'], caminho_arquivo(snapshot['arquivo']))
+        self.assertTrue(os.path.exists(snapshot['snapshot_arquivo']))
+
+        destino = os.path.join(self.pasta.name, 'restaurada.db')
+        resultado = restaurar(snapshot['arquivo'], destino)
+        self.assertTrue(os.path.exists(caminho_arquivo(destino)))
+        self.assertEqual(resultado['duplicadas'], 0)
+        self.assertEqual(self.titulos(destino), self.titulos(self.caminho))
+
+    def test_restauracao_desfaz_tarefa_arquivada_entre_as_copias(self):
+        snapshot = criar_snapshot(self.caminho, pausa=0)
+        # Como se a tarefa 5 tivesse sido arquivada depois da cópia do principal
+        conn = sqlite3.connect(snapshot['snapshot_arquivo'])
+        conn.execute('ATTACH DATABASE ? AS principal', (snapshot['arquivo'],))
+        with conn:
+            conn.execute('INSERT INTO tarefas SELECT * FROM principal.tarefas WHERE id = 5')
+        conn.close()
+
+        destino = os.path.join(self.pasta.name, 'restaurada.db')
+        self.assertEqual(restaurar(snapshot['arquivo'], destino)['duplicadas'], 1)
+        self.assertEqual(self.titulos(destino), self.titulos(self.caminho))
+
+    def test_restauracao_recusa_arquivo_existente_no_destino(self):
+        snapshot = criar_snapshot(self.caminho, pausa=0)
+        destino = os.path.join(self.pasta.name, 'restaurada.db')
+        open(caminho_arquivo(destino), 'w').close()
+        with self.assertRaises(FileExistsError):
+            restaurar(snapshot['arquivo'], destino)
+        self.assertFalse(os.path.exists(destino))
+
+    def test_retencao_apaga_a_copia_do_arquivo_junto(self):
+        antigo = criar_snapshot(self.caminho, pausa=0)
+        recente = criar_snapshot(self.caminho, pausa=0)
+        self.assertEqual(len(listar_snapshots(self.caminho)), 2)
+
+        apagados = aplicar_retencao(self.caminho, manter_ultimos=1, manter_diarios=0,
+                                    manter_semanais=0, agora=datetime.now())
+        self.assertEqual(apagados, [antigo['arquivo']])
+        self.assertFalse(os.path.exists(antigo['snapshot_arquivo']))
+        self.assertTrue(os.path.exists(recente['snapshot_arquivo']))
+
+    def test_copia_de_origem_inexistente_nao_cria_arquivos(self):
+        origem = os.path.join(self.pasta.name, 'nao_existe.db')
+        destino = os.path.join(self.pasta.name, 'copia.db')
+        with self.assertRaises(sqlite3.OperationalError):
+            copiar_banco(origem, destino)
+        self.assertFalse(os.path.exists(origem))
+        self.assertFalse(os.path.exists(destino))
+
+    def test_copia_aceita_caminho_com_caracteres_de_uri(self):
+        origem = os.path.join(self.pasta.name, 'agenda #1?.db')
+        with usar_banco(origem):
+            dao.criar_tabelas()
+            dao.adicionar_tarefa(1, 'Única')
+        destino = os.path.join(self.pasta.name, 'copia.db')
+        copiar_banco(origem, destino, pausa=0)
+        self.assertEqual(self.titulos(destino), ['Única'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from utils import database as dao
+from utils.conexao import obter_gerenciador, usar_banco
+
+
+class TestCacheLeitura(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def test_escrita_externa_invalida_para_uma_thread_nova(self):
+        dao.adicionar_tarefa(1, 'Pelo DAO')
+        self.assertEqual(dao.contar_estatisticas()['total'], 1)
+
+        # Commit de fora do DAO (outro processo, sqlite3 direto)
+        externa = sqlite3.connect(self.caminho)
+        externa.execute("INSERT INTO tarefas (dia_semana_id, titulo) VALUES (1, 'Externa')")
+        externa.commit()
+        externa.close()
+
+        # Uma thread nova ganha uma conexão nova, sem data_version anterior
+        totais = []
+
+        def contar():
+            with usar_banco(self.caminho):
+                totais.append(dao.contar_estatisticas()['total'])
+
+        thread = threading.Thread(target=contar)
+        thread.start()
+        thread.join()
+        self.assertEqual(totais, [2])
+        self.assertEqual(dao.contar_estatisticas()['total'], 2)
+
+    def test_escrita_do_dao_invalida(self):
+        self.assertEqual(dao.contar_estatisticas()['total'], 0)
+        dao.adicionar_tarefa(1, 'Nova')
+        self.assertEqual(dao.contar_estatisticas()['total'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from utils import conexao
+from utils import database as dao
+from utils.conexao import obter_conexao, obter_gerenciador, transacao, usar_banco
+from utils.transferencia import iterar_tarefas
+
+
+class TestConexoes(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        for nome in os.listdir(self.pasta.name):
+            obter_gerenciador(os.path.join(self.pasta.name, nome)).fechar()
+        self.pasta.cleanup()
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta.name, f'{nome}.db')
+
+    def test_commit_que_falha_desfaz_a_transacao(self):
+        with usar_banco(self.caminho('agenda')):
+            dao.criar_tabelas()
+            with self.assertRaises(sqlite3.IntegrityError):
+                with transacao() as conn:
+                    conn.execute('PRAGMA defer_foreign_keys = ON')
+                    conn.execute("INSERT INTO ocorrencias (tarefa_id, data) VALUES (999, '2024-01-01')")
+            self.assertFalse(obter_conexao().in_transaction)
+
+    def test_descarte_lru_nao_fecha_leitura_em_andamento(self):
+        with usar_banco(self.caminho('a')):
+            dao.criar_tabelas()
+            dao.adicionar_tarefas([{'dia_semana_id': 1, 'titulo': f'Tarefa {i}'} for i in range(50)])
+
+        with mock.patch.object(conexao, 'MAXIMO_BANCOS_ABERTOS', 2):
+            with usar_banco(self.caminho('a')):
+                exportacao = iterar_tarefas(tamanho_lote=10)
+                lidas = [next(exportacao) for _ in range(5)]
+
+                # Outra thread abre mais bancos do que o limite, descartando 'a'
+                def abrir_outros():
+                    for nome in ('b', 'c', 'd'):
+                        with usar_banco(self.caminho(nome)):
+                            dao.criar_tabelas()
+                            dao.contar_estatisticas()
+
+                thread = threading.Thread(target=abrir_outros)
+                thread.start()
+                thread.join()
+
+                lidas.extend(exportacao)
+        self.assertEqual(len(lidas), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
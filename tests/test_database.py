@@ -0,0 +1,351 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+from utils import database as dao
+from utils.conexao import obter_conexao, obter_gerenciador, transacao, usar_banco
+from utils.migracoes import MIGRACOES
+from utils.recorrencia import inicio_da_semana
+from utils.transferencia import importar_registros
+
+SEMANA = date(2024, 1, 1)
+AGENDA_PUBLICADA = os.path.join(os.path.dirname(__file__), '..', 'database', 'agenda.db')
+
+
+class TestAdicionarTarefas(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def test_lote_aceita_os_parametros_de_adicionar_tarefa(self):
+        inseridas = dao.adicionar_tarefas([
+            {'titulo': 'Só com data', 'data': date(2024, 1, 3), 'duracao': 90},
+            {'titulo': 'Série', 'data': SEMANA, 'recorrencia_dias': [2, 4], 'recorrencia_vezes': 3},
+            {'dia_semana_id': 5, 'titulo': 'Prioridade inválida', 'data': date(2024, 1, 5),
+             'prioridade': 'urgente'},
+        ])
+        self.assertEqual(inseridas, 3)
+
+        por_titulo = {tarefa.titulo: tarefa for dia, tarefas in dao.obter_semana(SEMANA)
+                      for tarefa in tarefas}
+        self.assertEqual(por_titulo['Só com data'].data, date(2024, 1, 3))
+        self.assertEqual(por_titulo['Só com data'].duracao, 90)
+        self.assertEqual(por_titulo['Prioridade inválida'].prioridade, 'media')
+        # As duas ocorrências da série nesta semana (terça e quinta)
+        self.assertEqual(sorted(dia[0] for dia, tarefas in dao.obter_semana(SEMANA)
+                                for tarefa in tarefas if tarefa.titulo == 'Série'), [2, 4])
+
+    def test_listagens_trazem_data_e_duracao(self):
+        dao.adicionar_tarefa(3, 'Reunião de equipe', data=date(2024, 1, 3), duracao=30)
+
+        tarefas_da_pagina, proximo = dao.listar_tarefas_filtradas()
+        listagens = {
+            'todas': dao.listar_todas_tarefas(),
+            'filtradas': tarefas_da_pagina,
+            'busca': dao.buscar_tarefas('reuniao'),
+        }
+        for nome, tarefas in listagens.items():
+            with self.subTest(nome):
+                self.assertEqual([(tarefa.data, tarefa.duracao) for tarefa in tarefas],
+                                 [(date(2024, 1, 3), 30)])
+
+    def test_sem_data_usa_a_semana_local(self):
+        # A semana "atual" vem do relógio local do Python, não do UTC do SQLite
+        semana_local = date(2030, 1, 7)
+        with mock.patch.object(dao, 'inicio_da_semana', return_value=semana_local):
+            dao.adicionar_tarefa(3, 'Avulsa')
+            dao.adicionar_tarefas([{'dia_semana_id': 4, 'titulo': 'Em lote'}])
+            importar_registros([{'dia_semana_id': 5, 'titulo': 'Importada'}])
+
+        datas = {tarefa.titulo: tarefa.data for tarefa in dao.listar_todas_tarefas()}
+        self.assertEqual(datas, {'Avulsa': date(2030, 1, 9), 'Em lote': date(2030, 1, 10),
+                                 'Importada': date(2030, 1, 11)})
+
+
+class TestEscritasEmLote(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+        dao.adicionar_tarefas([{'titulo': f'Tarefa {i}', 'data': SEMANA} for i in range(4)])
+        self.ids = [tarefa.id for tarefa in dao.listar_todas_tarefas()]
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def por_id(self):
+        return {tarefa.id: tarefa for tarefa in dao.listar_todas_tarefas()}
+
+    def test_marcar_e_excluir_varias(self):
+        dao.marcar_concluidas(self.ids[:3])
+        dao.marcar_concluidas(self.ids[2:], concluida=False)
+        self.assertEqual([self.por_id()[id].concluida for id in self.ids], [1, 1, 0, 0])
+
+        dao.excluir_tarefas(self.ids[1:3])
+        self.assertEqual(sorted(self.por_id()), [self.ids[0], self.ids[3]])
+        # Lista vazia não falha nem grava nada
+        dao.excluir_tarefas([])
+        dao.marcar_concluidas([])
+        self.assertEqual(len(self.por_id()), 2)
+
+    def test_atualizar_varias_com_campos_diferentes(self):
+        dao.atualizar_tarefas([
+            (self.ids[0], {'titulo': 'Renomeada', 'prioridade': 'alta'}),
+            (self.ids[1], {'titulo': 'Também renomeada', 'prioridade': 'baixa'}),
+            (self.ids[2], {'data': date(2024, 1, 5)}),
+            # Prioridade inválida é ignorada; sem nenhum campo válido, nada muda
+            (self.ids[3], {'prioridade': 'urgente'}),
+        ])
+        tarefas = self.por_id()
+        self.assertEqual([(tarefas[id].titulo, tarefas[id].prioridade) for id in self.ids[:2]],
+                         [('Renomeada', 'alta'), ('Também renomeada', 'baixa')])
+        self.assertEqual((tarefas[self.ids[2]].data, tarefas[self.ids[2]].dia_semana_id),
+                         (date(2024, 1, 5), 5))
+        self.assertEqual(tarefas[self.ids[3]].prioridade, 'media')
+
+    def test_lote_com_erro_nao_grava_nada(self):
+        antes = self.por_id()
+        with self.assertRaises(sqlite3.IntegrityError):
+            dao.atualizar_tarefas([
+                (self.ids[0], {'titulo': 'Gravaria'}),
+                (self.ids[1], {'titulo': None}),  # NOT NULL
+            ])
+        with self.assertRaises(sqlite3.IntegrityError):
+            dao.adicionar_tarefas([{'titulo': 'Válida', 'data': SEMANA}, {'titulo': None, 'data': SEMANA}])
+        self.assertEqual(self.por_id(), antes)
+
+    def test_aplicar_lote(self):
+        serie = dao.adicionar_tarefa(1, 'Série', data=SEMANA, recorrencia_dias=[1, 3])
+        dao.marcar_concluida(self.ids[1])
+        dao.marcar_ocorrencia_concluida(serie, date(2024, 1, 3))
+
+        dao.aplicar_lote(concluir=[self.ids[0]], reabrir=[self.ids[1]], excluir=[self.ids[2]],
+                         ocorrencias=[(serie, SEMANA, True), (serie, date(2024, 1, 3), False)])
+        tarefas = self.por_id()
+        self.assertEqual((tarefas[self.ids[0]].concluida, tarefas[self.ids[1]].concluida), (1, 0))
+        self.assertNotIn(self.ids[2], tarefas)
+        ocorrencias = [(tarefa.data_ocorrencia, tarefa.concluida)
+                       for dia, lista in dao.obter_semana(SEMANA) for tarefa in lista
+                       if tarefa.id == serie]
+        self.assertEqual(ocorrencias, [(SEMANA, True), (date(2024, 1, 3), False)])
+
+    def test_aplicar_lote_com_erro_desfaz_tudo(self):
+        antes = self.por_id()
+        # Ocorrência de uma tarefa inexistente viola a chave estrangeira
+        with self.assertRaises(sqlite3.IntegrityError):
+            dao.aplicar_lote(concluir=[self.ids[0]], excluir=[self.ids[1]],
+                             ocorrencias=[(999, SEMANA, True)])
+        self.assertEqual(self.por_id(), antes)
+
+
+class TestBuscarTarefas(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+        self.reuniao = dao.adicionar_tarefa(1, 'Reunião de orçamento', 'Levar planilhas', data=SEMANA)
+        self.relatorio = dao.adicionar_tarefa(2, 'Relatório', 'Preparar a reunião de sexta',
+                                              data=date(2024, 1, 2))
+        dao.adicionar_tarefa(3, 'Academia', data=date(2024, 1, 3))
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def ids(self, termo):
+        return [tarefa.id for tarefa in dao.buscar_tarefas(termo)]
+
+    def test_prefixo_e_acentos(self):
+        self.assertEqual(self.ids('reuniao'), [self.reuniao, self.relatorio])
+        self.assertEqual(self.ids('REUNIÃO'), [self.reuniao, self.relatorio])
+        self.assertEqual(self.ids('orc'), [self.reuniao])
+        self.assertEqual(self.ids('re'), [self.reuniao, self.relatorio])
+        # Todas as palavras precisam aparecer (em título ou descrição)
+        self.assertEqual(self.ids('reu planilha'), [self.reuniao])
+
+    def test_titulo_pesa_mais_que_descricao(self):
+        # "reuniao" está no título de uma e na descrição da outra
+        self.assertEqual(self.ids('reuniao')[0], self.reuniao)
+
+    def test_sintaxe_do_fts_e_neutralizada(self):
+        self.assertEqual(self.ids('reuniao OR academia'), [])
+        self.assertEqual(self.ids('"orçamento'), [self.reuniao])
+        self.assertEqual(self.ids('*'), [])
+        self.assertEqual(self.ids(''), [])
+
+    def test_indice_acompanha_edicao_e_exclusao(self):
+        dao.atualizar_tarefa(self.relatorio, titulo='Balanço', descricao=None)
+        self.assertEqual(self.ids('reuniao'), [self.reuniao])
+        self.assertEqual(self.ids('balanco'), [self.relatorio])
+        dao.excluir_tarefa(self.reuniao)
+        self.assertEqual(self.ids('orcamento'), [])
+
+
+class TestContarEstatisticas(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def test_banco_vazio(self):
+        self.assertEqual(dao.contar_estatisticas(), {
+            'total': 0, 'concluidas': 0,
+            'prioridades': {'alta': 0, 'media': 0, 'baixa': 0},
+            'por_dia': {},
+        })
+
+    def test_somas_por_prioridade_e_por_dia(self):
+        ids = [
+            dao.adicionar_tarefa(1, 'A', prioridade='alta'),
+            dao.adicionar_tarefa(1, 'B', prioridade='alta'),
+            dao.adicionar_tarefa(1, 'C'),
+            dao.adicionar_tarefa(5, 'D', prioridade='baixa'),
+        ]
+        dao.marcar_concluidas([ids[0], ids[3]])
+        # Prioridade fora das três conhecidas (gravada por fora do DAO) só conta no total
+        with transacao() as conn:
+            conn.execute("INSERT INTO tarefas (dia_semana_id, titulo, prioridade) VALUES (5, 'E', 'urgente')")
+
+        self.assertEqual(dao.contar_estatisticas(), {
+            'total': 5, 'concluidas': 2,
+            'prioridades': {'alta': 2, 'media': 1, 'baixa': 1},
+            # Só os dias com tarefas, pelo id de dias_semana
+            'por_dia': {1: {'total': 3, 'concluidas': 1}, 5: {'total': 2, 'concluidas': 1}},
+        })
+
+
+class TestEsquema(unittest.TestCase):
+
+    def test_banco_de_tarefas_so_tem_as_tabelas_da_agenda(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'agenda.db')
+            with usar_banco(caminho):
+                dao.criar_tabelas()
+                tabelas = {nome for nome, in obter_conexao().execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'")}
+            obter_gerenciador(caminho).fechar()
+        self.assertIn('tarefas', tabelas)
+        self.assertNotIn('usuarios', tabelas)
+
+
+class TestDatas(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+
+    def tearDown(self):
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def criar_na_versao(self, versao, tarefas):
+        """Banco parado na migração `versao`, com (dia_semana_id, titulo, data_criacao)"""
+        conn = sqlite3.connect(self.caminho)
+        cursor = conn.cursor()
+        for numero, descricao, migracao in MIGRACOES:
+            if numero <= versao:
+                migracao(cursor)
+        cursor.executemany('INSERT INTO tarefas (dia_semana_id, titulo, data_criacao) VALUES (?, ?, ?)',
+                           tarefas)
+        conn.execute(f'PRAGMA user_version = {versao}')
+        conn.commit()
+        conn.close()
+
+    def test_migracao_poe_as_tarefas_existentes_na_semana_atual(self):
+        self.criar_na_versao(6, [(3, 'Antiga', '2020-03-04 10:00:00'), (7, 'Sem criação', None)])
+        with usar_banco(self.caminho):
+            dao.criar_tabelas()
+            datas = {tarefa.titulo: tarefa.data for tarefa in dao.listar_todas_tarefas()}
+            semana = dao.obter_semana()
+        inicio = inicio_da_semana()
+        self.assertEqual(datas, {'Antiga': inicio + timedelta(days=2),
+                                 'Sem criação': inicio + timedelta(days=6)})
+        self.assertEqual(sorted(tarefa.titulo for dia, tarefas in semana for tarefa in tarefas),
+                         ['Antiga', 'Sem criação'])
+
+    def test_agenda_publicada_continua_na_visao_semanal(self):
+        # Cópia: o banco do repositório não é alterado
+        shutil.copy(AGENDA_PUBLICADA, self.caminho)
+        with usar_banco(self.caminho):
+            dao.criar_tabelas()
+            titulos = [tarefa.titulo for dia, tarefas in dao.obter_semana() for tarefa in tarefas]
+        self.assertEqual(titulos, ['Receber documentos QSCon'])
+
+    @unittest.skipUnless(hasattr(time, 'tzset'), "sem time.tzset nesta plataforma")
+    def test_trigger_usa_a_semana_local(self):
+        fuso = os.environ.get('TZ')
+        os.environ['TZ'] = 'America/Sao_Paulo'
+        time.tzset()
+        try:
+            with usar_banco(self.caminho):
+                dao.criar_tabelas()
+                # Segunda 01:00 em UTC ainda é domingo (22:00) no horário local
+                with transacao() as conn:
+                    conn.execute("INSERT INTO tarefas (dia_semana_id, titulo, data_criacao) "
+                                 "VALUES (1, 'Virada', '2024-01-08 01:00:00')")
+                self.assertEqual([tarefa.data for tarefa in dao.listar_todas_tarefas()],
+                                 [date(2024, 1, 1)])
+        finally:
+            if fuso is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = fuso
+            time.tzset()
+
+    def test_listar_tarefas_por_data(self):
+        with usar_banco(self.caminho):
+            dao.criar_tabelas()
+            dao.adicionar_tarefa(1, 'Domingo anterior', data=date(2023, 12, 31))
+            dao.adicionar_tarefa(1, 'Segunda tarde', horario='15:00', data=SEMANA)
+            dao.adicionar_tarefa(1, 'Segunda manhã', horario='08:00', data=SEMANA)
+            dao.adicionar_tarefa(1, 'Segunda sem horário', data=SEMANA)
+            dao.adicionar_tarefa(3, 'Quarta', data=date(2024, 1, 3))
+            dao.adicionar_tarefa(7, 'Domingo', data=date(2024, 1, 7))
+            dao.adicionar_tarefa(1, 'Segunda seguinte', data=date(2024, 1, 8))
+            dao.adicionar_tarefa(1, 'Série', data=SEMANA, recorrencia_dias=[1, 3])
+
+            semana = dao.listar_tarefas_por_data(SEMANA, date(2024, 1, 7))
+            um_dia = dao.listar_tarefas_por_data(date(2024, 1, 3), date(2024, 1, 3))
+            vazio = dao.listar_tarefas_por_data(date(2024, 1, 4), date(2024, 1, 6))
+
+        # Limites inclusivos, ordem por data e horário; séries ficam de fora
+        self.assertEqual([tarefa.titulo for tarefa in semana],
+                         ['Segunda manhã', 'Segunda tarde', 'Segunda sem horário', 'Quarta', 'Domingo'])
+        self.assertEqual([(tarefa.titulo, tarefa.data, tarefa.dia_nome) for tarefa in um_dia],
+                         [('Quarta', date(2024, 1, 3), 'Quarta-feira')])
+        self.assertEqual(vazio, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from utils import database as dao
+from utils.conexao import obter_gerenciador, usar_banco
+from utils.escritor import executar_escrita, preparar_conexao_escritor
+
+
+def _violar_chave_adiada(conn):
+    # Chave estrangeira adiada: o erro só aparece no COMMIT do lote
+    conn.execute('PRAGMA defer_foreign_keys = ON')
+    conn.execute("INSERT INTO ocorrencias (tarefa_id, data) VALUES (999, '2024-01-01')")
+
+
+class TestEscritorUnico(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def contar_no_disco(self):
+        """Tarefas vistas por uma conexão independente (só o que foi de fato gravado)"""
+        conn = sqlite3.connect(self.caminho)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM tarefas').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_escrita_depois_de_commit_que_falhou_e_gravada(self):
+        with self.assertRaises(sqlite3.IntegrityError):
+            executar_escrita(_violar_chave_adiada)
+
+        tarefa_id = dao.adicionar_tarefa(1, 'Depois da falha')
+        self.assertIsNotNone(tarefa_id)
+        self.assertEqual(self.contar_no_disco(), 1)
+        # O escritor não ficou com o lock de escrita
+        externa = sqlite3.connect(self.caminho, timeout=0.5)
+        try:
+            externa.execute("INSERT INTO tarefas (dia_semana_id, titulo) VALUES (1, 'Externa')")
+            externa.commit()
+        finally:
+            externa.close()
+        self.assertEqual(self.contar_no_disco(), 2)
+
+    def test_falha_de_uma_operacao_nao_desfaz_as_outras(self):
+        dao.adicionar_tarefa(1, 'Primeira')
+        with self.assertRaises(sqlite3.Error):
+            executar_escrita(lambda conn: conn.execute('INSERT INTO tabela_inexistente VALUES (1)'))
+        dao.adicionar_tarefa(1, 'Segunda')
+        self.assertEqual(self.contar_no_disco(), 2)
+
+    def test_preparacao_roda_fora_da_transacao_na_conexao_do_escritor(self):
+        self.assertFalse(preparar_conexao_escritor(lambda conn: conn.in_transaction))
+        # A mesma conexão das escritas seguintes (ex.: um ATTACH feito antes delas)
+        preparar_conexao_escritor(lambda conn: conn.execute("ATTACH DATABASE ':memory:' AS extra"))
+        bancos = executar_escrita(lambda conn: [linha[1] for linha in conn.execute('PRAGMA database_list')])
+        self.assertIn('extra', bancos)
+        preparar_conexao_escritor(lambda conn: conn.execute('DETACH DATABASE extra'))
+
+
+if __name__ == '__main__':
+    unittest.main()
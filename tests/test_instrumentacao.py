@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+from utils import database as dao
+from utils import instrumentacao
+from utils.cache import invalidar_cache
+from utils.conexao import obter_gerenciador, usar_banco
+from utils.instrumentacao import configurar_instrumentacao, iniciar_coleta, medir
+
+
+@medir
+def _externa():
+    dao.listar_dias_semana()
+    return _interna()
+
+
+@medir
+def _interna():
+    return ([1, 2, 3], None)
+
+
+@medir
+def _falha():
+    raise ValueError('sem dados')
+
+
+class TestMedir(unittest.TestCase):
+
+    def setUp(self):
+        self.config = dict(instrumentacao._config)
+        configurar_instrumentacao(ativa=True, limiar_lento_ms=10_000)
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        # A conexão nasce durante a coleta: recebe o rastreio de comandos
+        self.coletor = iniciar_coleta()
+        dao.criar_tabelas()
+        dao.adicionar_tarefa(1, 'Reunião')
+        invalidar_cache()
+
+    def tearDown(self):
+        instrumentacao._coletor_atual.set(None)
+        self.banco.__exit__(None, None, None)
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+        instrumentacao._config.update(self.config)
+
+    def test_registra_funcao_comandos_e_linhas(self):
+        coletor = iniciar_coleta()
+        tarefas = dao.listar_todas_tarefas()
+
+        self.assertEqual([chamada['funcao'] for chamada in coletor.chamadas], ['listar_todas_tarefas'])
+        chamada = coletor.chamadas[0]
+        self.assertEqual(chamada['linhas'], len(tarefas))
+        self.assertTrue(any('FROM tarefas' in sql for sql, _ in chamada['comandos']))
+        self.assertGreaterEqual(chamada['duracao_ms'], 0)
+        self.assertEqual(coletor.total_comandos, len(chamada['comandos']))
+        self.assertGreaterEqual(self.coletor.conexoes_abertas, 1)
+
+    def test_chamadas_aninhadas_separam_os_comandos(self):
+        coletor = iniciar_coleta()
+        self.assertEqual(_externa(), ([1, 2, 3], None))
+
+        # A interna termina antes; a listagem de dias é própria de listar_dias_semana
+        funcoes = [chamada['funcao'] for chamada in coletor.chamadas]
+        self.assertEqual(funcoes, ['listar_dias_semana', '_interna', '_externa'])
+        por_funcao = {chamada['funcao']: chamada for chamada in coletor.chamadas}
+        self.assertEqual(por_funcao['_interna']['linhas'], 3)
+        self.assertEqual(por_funcao['_externa']['comandos'], [])
+        self.assertTrue(por_funcao['listar_dias_semana']['comandos'])
+
+    def test_falha_e_registrada_e_propagada(self):
+        coletor = iniciar_coleta()
+        with self.assertRaises(ValueError):
+            _falha()
+        self.assertEqual([(chamada['funcao'], chamada['linhas']) for chamada in coletor.chamadas],
+                         [('_falha', 0)])
+
+    def test_consulta_lenta_vai_para_o_log(self):
+        configurar_instrumentacao(limiar_lento_ms=0)
+        with self.assertLogs('agenda.consultas', level='WARNING') as logs:
+            _interna()
+        self.assertIn('_interna', logs.output[0])
+
+    def test_desligada_nao_coleta(self):
+        configurar_instrumentacao(ativa=False)
+        self.assertIsNone(iniciar_coleta())
+        with self.assertNoLogs('agenda.consultas'):
+            configurar_instrumentacao(limiar_lento_ms=0)
+            self.assertEqual(_interna(), ([1, 2, 3], None))
+
+
+if __name__ == '__main__':
+    unittest.main()
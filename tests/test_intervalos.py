@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+from utils import database as dao
+from utils.conexao import obter_gerenciador, usar_banco
+from utils.intervalos import (DURACAO_PADRAO, FIM_DIA, IndiceIntervalos, indice_do_dia,
+                              proximo_horario_livre, verificar_conflitos)
+from utils.modelos import Tarefa, horario_em_minutos
+
+DATA = date(2024, 1, 3)  # quarta-feira
+
+
+def tarefa(tarefa_id, horario, duracao=None):
+    return Tarefa(tarefa_id, 3, f'Tarefa {tarefa_id}', None, horario, 'media', 0, None, 'Quarta-feira', 3,
+                  horario_em_minutos(horario), None, duracao=duracao)
+
+
+def ids(tarefas):
+    return sorted(tarefa.id for tarefa in tarefas)
+
+
+class TestIndiceIntervalos(unittest.TestCase):
+
+    def test_intervalos_que_se_tocam_nao_conflitam(self):
+        indice = IndiceIntervalos([tarefa(1, '09:00', 60)])
+        self.assertEqual(ids(indice.conflitos(10 * 60, 10 * 60 + 30)), [])
+        self.assertEqual(ids(indice.conflitos(8 * 60 + 30, 9 * 60)), [])
+        self.assertEqual(ids(indice.conflitos(9 * 60 + 59, 10 * 60 + 30)), [1])
+        self.assertEqual(ids(indice.conflitos(8 * 60 + 30, 9 * 60 + 1)), [1])
+
+    def test_sem_horario_nao_ocupa_o_dia(self):
+        indice = IndiceIntervalos([tarefa(1, None), tarefa(2, '')])
+        self.assertEqual(len(indice), 0)
+        self.assertEqual(indice.proximo_livre(60, 9 * 60), 9 * 60)
+
+    def test_duracao_padrao(self):
+        indice = IndiceIntervalos([tarefa(1, '09:00')])
+        self.assertEqual(ids(indice.conflitos(9 * 60 + DURACAO_PADRAO - 1, 11 * 60)), [1])
+        self.assertEqual(ids(indice.conflitos(9 * 60 + DURACAO_PADRAO, 11 * 60)), [])
+
+    def test_tarefa_longa_que_comeca_antes_da_janela(self):
+        # A busca binária começa antes da janela o bastante para a maior duração
+        indice = IndiceIntervalos([tarefa(1, '08:00', 240), tarefa(2, '11:00'), tarefa(3, '13:00')])
+        self.assertEqual(ids(indice.conflitos(11 * 60 + 45, 12 * 60)), [1])
+        self.assertEqual(ids(indice.conflitos(10 * 60, 13 * 60 + 1)), [1, 2, 3])
+        self.assertEqual(ids(indice.conflitos(10 * 60, 13 * 60 + 1, ignorar=1)), [2, 3])
+
+    def test_proximo_livre_pula_os_ocupados_e_respeita_o_fim_do_dia(self):
+        indice = IndiceIntervalos([tarefa(1, '08:00', 60), tarefa(2, '09:00', 30), tarefa(3, '10:00')])
+        self.assertEqual(indice.proximo_livre(30, 8 * 60), 9 * 60 + 30)
+        self.assertEqual(indice.proximo_livre(31, 8 * 60), 10 * 60 + 30)
+
+        tarde = IndiceIntervalos([tarefa(1, '21:00', 30)])
+        # Termina exatamente no fim do dia: cabe
+        self.assertEqual(tarde.proximo_livre(30, 21 * 60, FIM_DIA), 21 * 60 + 30)
+        self.assertIsNone(tarde.proximo_livre(31, 21 * 60, FIM_DIA))
+
+    def test_inserir_substitui_e_remover_tira(self):
+        indice = IndiceIntervalos([tarefa(1, '09:00'), tarefa(2, '09:00')])
+        indice.inserir(tarefa(1, '15:00'))
+        self.assertEqual(ids(indice.conflitos(9 * 60, 9 * 60 + 1)), [2])
+        self.assertEqual(ids(indice.conflitos(15 * 60, 15 * 60 + 1)), [1])
+
+        indice.inserir(tarefa(2, None))
+        indice.remover(1)
+        indice.remover(99)
+        self.assertEqual(len(indice), 0)
+
+
+class TestIndicesDoBanco(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+        self.reuniao = dao.adicionar_tarefa(3, 'Reunião', horario='09:00', data=DATA, duracao=60)
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        obter_gerenciador(self.caminho).fechar()
+        self.pasta.cleanup()
+
+    def test_consultas_do_dia(self):
+        dao.adicionar_tarefa(3, 'Sem horário', data=DATA)
+        dao.adicionar_tarefa(4, 'Outro dia', horario='10:30', data=date(2024, 1, 4))
+
+        self.assertEqual(ids(verificar_conflitos(DATA, '09:30')), [self.reuniao])
+        self.assertEqual(verificar_conflitos(DATA, '10:00'), [])
+        self.assertEqual(verificar_conflitos(DATA, None), [])
+        self.assertEqual(verificar_conflitos(DATA, '09:30', ignorar=self.reuniao), [])
+        self.assertEqual(proximo_horario_livre(DATA, 30, apos='08:45'), '10:00')
+        self.assertEqual(proximo_horario_livre(DATA, 60, apos='21:30'), None)
+
+    def test_escritas_do_dao_atualizam_o_indice_sem_remontar(self):
+        # O primeiro commit observado só fixa a versão da conexão do escritor
+        indice_do_dia(DATA)
+        dao.adicionar_tarefa(5, 'Outro dia', data=date(2024, 1, 5))
+        indice = indice_do_dia(DATA)
+
+        nova = dao.adicionar_tarefa(3, 'Almoço', horario='12:00', data=DATA)
+        self.assertEqual(ids(verificar_conflitos(DATA, '12:15')), [nova])
+
+        dao.atualizar_tarefa(self.reuniao, horario='14:00')
+        self.assertEqual(verificar_conflitos(DATA, '09:30'), [])
+        self.assertEqual(ids(verificar_conflitos(DATA, '14:30')), [self.reuniao])
+
+        dao.excluir_tarefa(nova)
+        self.assertEqual(verificar_conflitos(DATA, '12:15'), [])
+        # Mesmo objeto: os eventos do escritor atualizaram o índice no lugar
+        self.assertIs(indice_do_dia(DATA), indice)
+
+    def test_gravacao_fora_do_escritor_remonta_o_indice(self):
+        indice = indice_do_dia(DATA)
+        externa = sqlite3.connect(self.caminho)
+        with externa:
+            externa.execute("UPDATE tarefas SET horario = '16:00' WHERE id = ?", (self.reuniao,))
+        externa.close()
+
+        self.assertIsNot(indice_do_dia(DATA), indice)
+        self.assertEqual(ids(verificar_conflitos(DATA, '16:10')), [self.reuniao])
+
+
+if __name__ == '__main__':
+    unittest.main()
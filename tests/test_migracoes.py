@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from utils import migracoes
+from utils.migracoes import MIGRACOES, VERSAO_ATUAL, migrar, versao_esquema
+
+
+def _falhar(cursor):
+    cursor.execute('CREATE TABLE metade_aplicada (id INTEGER)')
+    raise sqlite3.OperationalError('falha no meio da migração')
+
+
+class TestMigrar(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.pasta.name, 'agenda.db'), isolation_level=None)
+
+    def tearDown(self):
+        self.conn.close()
+        self.pasta.cleanup()
+
+    def tabelas(self):
+        return {nome for nome, in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    def test_banco_novo_recebe_todas_e_so_uma_vez(self):
+        aplicadas = migrar(self.conn)
+        self.assertEqual([versao for versao, _ in aplicadas], [versao for versao, _, _ in MIGRACOES])
+        self.assertEqual(versao_esquema(self.conn), VERSAO_ATUAL)
+        self.assertTrue({'tarefas', 'dias_semana', 'ocorrencias', 'alteracoes', 'resumo_diario'}
+                        <= self.tabelas())
+        self.assertEqual(migrar(self.conn), [])
+
+    def test_banco_parado_recebe_so_as_que_faltam(self):
+        cursor = self.conn.cursor()
+        for versao, _, migracao in MIGRACOES:
+            if versao <= 4:
+                migracao(cursor)
+        self.conn.execute('PRAGMA user_version = 4')
+
+        aplicadas = [versao for versao, _ in migrar(self.conn)]
+        self.assertEqual(aplicadas, [versao for versao, _, _ in MIGRACOES if versao > 4])
+        self.assertEqual(versao_esquema(self.conn), VERSAO_ATUAL)
+
+    def test_falha_desfaz_a_migracao_e_mantem_a_versao(self):
+        lista = MIGRACOES[:2] + [(VERSAO_ATUAL + 1, 'Quebrada', _falhar)]
+        with mock.patch.object(migracoes, 'MIGRACOES', lista):
+            with self.assertRaises(sqlite3.OperationalError):
+                migrar(self.conn)
+
+        # As anteriores ficam; a que falhou não deixa nada pela metade
+        self.assertEqual(versao_esquema(self.conn), lista[1][0])
+        self.assertNotIn('metade_aplicada', self.tabelas())
+        self.assertFalse(self.conn.in_transaction)
+
+
+if __name__ == '__main__':
+    unittest.main()
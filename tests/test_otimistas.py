@@ -0,0 +1,98 @@
+import unittest
+from concurrent.futures import Future
+
+from utils import otimistas
+from utils.modelos import Tarefa
+
+BANCO = 'agenda.db'
+
+
+def tarefa(concluida=False):
+    return Tarefa(7, 1, 'Tarefa', None, None, 'media', concluida, None, 'Segunda', 1, None, None)
+
+
+def gravada(antes, depois):
+    futuro = Future()
+    futuro.set_result((antes, depois))
+    return futuro
+
+
+def falhou():
+    futuro = Future()
+    futuro.set_exception(RuntimeError('disco cheio'))
+    return futuro
+
+
+class TestOtimistas(unittest.TestCase):
+
+    def setUp(self):
+        self.estado = {'resumo': {'banco': BANCO, 'seq': 10, 'total': 3, 'concluidas': 1}}
+
+    def exibida(self):
+        return otimistas.sobrepor(self.estado, tarefa(), (BANCO, 7), (BANCO, 7))
+
+    def test_clique_aparece_antes_da_gravacao(self):
+        futuro = Future()
+        otimistas.registrar(self.estado, (BANCO, 7), 'concluir', futuro, (0, 1))
+
+        self.assertTrue(self.exibida().concluida)
+        self.assertEqual(self.estado['resumo']['concluidas'], 2)
+        # Ainda em andamento: nada a conferir
+        self.assertEqual(otimistas.reconciliar(self.estado, rerun_completo=True), [])
+        self.assertEqual(len(self.estado['pendentes']), 1)
+        self.assertTrue(self.exibida().concluida)
+
+    def test_falha_desfaz_a_sobreposicao(self):
+        otimistas.registrar(self.estado, (BANCO, 7), 'concluir', falhou(), (0, 1))
+
+        erros = otimistas.reconciliar(self.estado)
+        self.assertEqual([str(erro) for erro in erros], ['disco cheio'])
+        self.assertFalse(self.exibida().concluida)
+        self.assertEqual(self.estado['pendentes'], [])
+        # Contadores ajustados descartados: relidos do banco no próximo resumo
+        self.assertIsNone(self.estado['resumo'])
+
+    def test_sucesso_mantem_a_sobreposicao_ate_o_rerun_completo(self):
+        otimistas.registrar(self.estado, (BANCO, 7), 'concluir', gravada(10, 11), (0, 1))
+
+        self.assertEqual(otimistas.reconciliar(self.estado), [])
+        # Rerun de fragmento: a lista exibida ainda é a lida antes do clique
+        self.assertTrue(self.exibida().concluida)
+        self.assertEqual(self.estado['resumo'], {'banco': BANCO, 'seq': 11, 'total': 3, 'concluidas': 2})
+
+        otimistas.reconciliar(self.estado, rerun_completo=True)
+        self.assertEqual(self.estado['otimistas'], {})
+
+    def test_alteracao_de_outra_sessao_no_meio_descarta_o_resumo(self):
+        otimistas.registrar(self.estado, (BANCO, 7), 'concluir', gravada(12, 13), (0, 1))
+        otimistas.reconciliar(self.estado)
+        self.assertIsNone(self.estado['resumo'])
+        self.assertTrue(self.exibida().concluida)
+
+    def test_falha_de_clique_antigo_nao_desfaz_o_mais_novo(self):
+        otimistas.registrar(self.estado, (BANCO, 7), 'concluir', falhou(), (0, 1))
+        otimistas.registrar(self.estado, (BANCO, 7), 'reabrir', gravada(10, 11), (0, -1))
+
+        self.assertEqual(len(otimistas.reconciliar(self.estado)), 1)
+        self.assertEqual(self.estado['otimistas'][(BANCO, 7)]['acao'], 'reabrir')
+        self.assertFalse(self.exibida().concluida)
+
+    def test_exclusao_da_serie_esconde_as_ocorrencias(self):
+        otimistas.registrar(self.estado, (BANCO, 7), 'excluir', Future(), None)
+        ocorrencia = otimistas.sobrepor(self.estado, tarefa(), (BANCO, '7_2024-01-02'), (BANCO, 7))
+        self.assertIsNone(ocorrencia)
+        # Efeito desconhecido até gravar: o resumo não muda na hora
+        self.assertEqual(self.estado['resumo']['total'], 3)
+
+    def test_resumo_relido_soma_so_os_cliques_pendentes(self):
+        otimistas.registrar(self.estado, (BANCO, 7), 'concluir', Future(), (0, 1))
+        otimistas.registrar(self.estado, (BANCO, 8), 'excluir', gravada(10, 11), (-1, 0))
+        otimistas.registrar(self.estado, ('outro.db', 9), 'excluir', Future(), (-1, 0))
+
+        lido = otimistas.somar_pendentes(self.estado, {'banco': BANCO, 'seq': 11, 'total': 5,
+                                                       'concluidas': 2})
+        self.assertEqual((lido['total'], lido['concluidas']), (5, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
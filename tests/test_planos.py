@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+from utils import database as dao
+from utils.cache import invalidar_cache
+from utils.conexao import obter_conexao, obter_gerenciador, usar_banco
+
+SEMANA = date(2024, 1, 1)
+
+
+class TestPlanosDasListagens(unittest.TestCase):
+    """As listagens saem dos índices já na ordem: sem varrer tarefas e sem B-tree temporária"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pasta = tempfile.TemporaryDirectory()
+        cls.caminho = os.path.join(cls.pasta.name, 'agenda.db')
+        cls.banco = usar_banco(cls.caminho)
+        cls.banco.__enter__()
+        # Pelo DAO, como o app: sem ANALYZE, o planejador só conta com os índices
+        dao.criar_tabelas()
+        prioridades = ['baixa', 'media', 'alta']
+        dao.adicionar_tarefas([
+            {'dia_semana_id': i % 7 + 1, 'titulo': f'Tarefa {i}', 'prioridade': prioridades[i % 3],
+             'horario': f'{8 + i % 12:02d}:00' if i % 4 else None}
+            for i in range(500)
+        ])
+        for i in range(30):
+            dao.adicionar_tarefa(1, f'Com data {i}', horario='09:00', data=SEMANA + timedelta(days=i))
+        dao.adicionar_tarefa(1, 'Série', horario='08:00', recorrencia_dias=[1, 3], data=SEMANA)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.banco.__exit__(None, None, None)
+        obter_gerenciador(cls.caminho).fechar()
+        cls.pasta.cleanup()
+
+    def planos(self, funcao, *args, **kwargs):
+        """Passos do EXPLAIN QUERY PLAN de cada SELECT executado por funcao(*args)"""
+        conn = obter_conexao()
+        comandos = []
+        # Resultado já em cache (de um teste anterior) não executaria nenhum SELECT
+        invalidar_cache()
+        conn.set_trace_callback(comandos.append)
+        try:
+            funcao(*args, **kwargs)
+        finally:
+            conn.set_trace_callback(None)
+
+        selects = [sql for sql in comandos if sql.lstrip().upper().startswith('SELECT')]
+        self.assertTrue(selects, f"{funcao.__name__} não executou nenhuma consulta")
+        return [[linha[3] for linha in conn.execute(f'EXPLAIN QUERY PLAN {sql}')] for sql in selects]
+
+    def assertSemVarreduraNemOrdenacao(self, funcao, *args, **kwargs):
+        for plano in self.planos(funcao, *args, **kwargs):
+            for passo in plano:
+                self.assertNotIn('USE TEMP B-TREE', passo, plano)
+                # Só o índice parcial das séries recorrentes pode ser percorrido inteiro
+                if passo.startswith('SCAN t ') or passo == 'SCAN t':
+                    self.assertIn('idx_tarefas_recorrentes', passo, plano)
+
+    def test_listar_todas_tarefas(self):
+        self.assertSemVarreduraNemOrdenacao(dao.listar_todas_tarefas)
+
+    def test_listar_tarefas_filtradas(self):
+        self.assertSemVarreduraNemOrdenacao(dao.listar_tarefas_filtradas)
+        self.assertSemVarreduraNemOrdenacao(dao.listar_tarefas_filtradas, concluida=False)
+        self.assertSemVarreduraNemOrdenacao(dao.listar_tarefas_filtradas, dia_semana_id=3)
+
+    def test_listar_tarefas_filtradas_proxima_pagina(self):
+        _, cursor = dao.listar_tarefas_filtradas(prioridade='alta', limite=10)
+        self.assertIsNotNone(cursor)
+        self.assertSemVarreduraNemOrdenacao(dao.listar_tarefas_filtradas, prioridade='alta',
+                                            apos=cursor, limite=10)
+
+    def test_listar_tarefas_por_dia(self):
+        self.assertSemVarreduraNemOrdenacao(dao.listar_tarefas_por_dia, 3, SEMANA)
+
+    def test_listar_tarefas_por_data(self):
+        self.assertSemVarreduraNemOrdenacao(dao.listar_tarefas_por_data, date(2024, 1, 8),
+                                            date(2024, 1, 21))
+
+    def test_obter_semana(self):
+        self.assertSemVarreduraNemOrdenacao(dao.obter_semana, date(2024, 2, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
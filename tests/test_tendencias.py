@@ -0,0 +1,116 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from utils import database as dao
+from utils.arquivo import arquivar
+from utils.cache import invalidar_cache
+from utils.conexao import obter_gerenciador, transacao, usar_banco
+
+TEM_PANDAS = all(importlib.util.find_spec(nome) for nome in ('numpy', 'pandas'))
+
+
+class TestResumoDiario(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'agenda.db')
+        self.banco = usar_banco(self.caminho)
+        self.banco.__enter__()
+        dao.criar_tabelas()
+
+    def tearDown(self):
+        self.banco.__exit__(None, None, None)
+        for nome in os.listdir(self.pasta.name):
+            obter_gerenciador(os.path.join(self.pasta.name, nome)).fechar()
+        self.pasta.cleanup()
+
+    def totais(self):
+        """{prioridade: (criadas, concluidas)} somando todos os dias do resumo"""
+        totais = {}
+        for dia, prioridade, criadas, concluidas in dao.listar_resumo_diario():
+            anterior = totais.get(prioridade, (0, 0))
+            totais[prioridade] = (anterior[0] + criadas, anterior[1] + concluidas)
+        return {prioridade: total for prioridade, total in totais.items() if total != (0, 0)}
+
+    def test_contagens_acompanham_as_escritas(self):
+        alta = dao.adicionar_tarefa(1, 'Alta', prioridade='alta')
+        media = dao.adicionar_tarefa(2, 'Média')
+        self.assertEqual(self.totais(), {'alta': (1, 0), 'media': (1, 0)})
+
+        dao.marcar_concluida(alta)
+        self.assertEqual(self.totais(), {'alta': (1, 1), 'media': (1, 0)})
+
+        # Reabrir tira a conclusão do dia em que tinha sido contada
+        dao.marcar_concluida(alta, False)
+        self.assertEqual(self.totais(), {'alta': (1, 0), 'media': (1, 0)})
+
+        # Nova prioridade: a criação e a conclusão passam para ela
+        dao.marcar_concluida(alta)
+        dao.atualizar_tarefa(alta, prioridade='baixa')
+        self.assertEqual(self.totais(), {'baixa': (1, 1), 'media': (1, 0)})
+
+        # Exclusão não apaga o histórico
+        dao.excluir_tarefa(media)
+        self.assertEqual(self.totais(), {'baixa': (1, 1), 'media': (1, 0)})
+
+    def test_arquivamento_nao_apaga_o_historico(self):
+        tarefa_id = dao.adicionar_tarefa(1, 'Antiga', prioridade='alta')
+        dao.marcar_concluida(tarefa_id)
+        with transacao() as conn:
+            conn.execute("UPDATE tarefas SET concluida_em = '2000-01-01 10:00:00' WHERE id = ?",
+                         (tarefa_id,))
+        antes = dao.listar_resumo_diario()
+        self.assertIn(('2000-01-01', 'alta', 0, 1), antes)
+
+        self.assertEqual(arquivar(idade_dias=30, pausa=0)['arquivadas'], 1)
+        invalidar_cache()  # relê do banco, não da leitura anterior
+        self.assertEqual(dao.listar_resumo_diario(), antes)
+
+    def test_periodo_limita_os_dias(self):
+        dao.adicionar_tarefa(1, 'Hoje')
+        with transacao() as conn:
+            conn.execute("INSERT INTO tarefas (dia_semana_id, titulo, data_criacao, data) "
+                         "VALUES (1, 'Antiga', '2020-03-02 09:00:00', '2020-03-02')")
+        self.assertEqual(dao.listar_resumo_diario(date(2020, 1, 1), date(2020, 12, 31)),
+                         [('2020-03-02', 'media', 1, 0)])
+
+
+@unittest.skipUnless(TEM_PANDAS, "numpy e pandas não estão instalados")
+class TestTendencias(unittest.TestCase):
+
+    def test_serie_e_tendencias_semanais(self):
+        from utils.tendencias import inclinacao, serie_diaria, tendencias
+
+        linhas = [
+            ('2024-01-01', 'alta', 2, 1),
+            ('2024-01-03', 'media', 2, 0),
+            ('2024-01-10', 'alta', 0, 3),
+        ]
+        diaria = serie_diaria(linhas)
+        # Índice contínuo: os dias sem eventos entram com zero
+        self.assertEqual(len(diaria), 10)
+        self.assertEqual(int(diaria['criadas'].sum()), 4)
+        self.assertEqual(int(diaria.loc['2024-01-02', 'criadas']), 0)
+        self.assertEqual(int(diaria['concluidas_alta'].sum()), 4)
+
+        periodo = tendencias(diaria, 'W-MON')
+        self.assertEqual(list(periodo['criadas']), [4, 0])
+        self.assertEqual(list(periodo['concluidas']), [1, 3])
+        self.assertEqual(periodo['taxa_conclusao'].iloc[0], 25.0)
+        # Semana sem tarefas criadas: taxa indefinida, não infinita
+        self.assertTrue(periodo['taxa_conclusao'].isna().iloc[1])
+        self.assertEqual(list(periodo['saldo']), [3.0, 0.0])
+        self.assertAlmostEqual(inclinacao(periodo['concluidas']), 2.0)
+
+    def test_sem_historico(self):
+        from utils.tendencias import inclinacao, serie_diaria
+
+        self.assertTrue(serie_diaria([]).empty)
+        self.assertEqual(inclinacao([5]), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from utils import database as dao
+from utils.conexao import obter_gerenciador, usar_banco
+from utils.transferencia import EXPORTADORES, LEITORES, importar_registros, iterar_tarefas
+
+SEMANA = date(2024, 1, 1)
+
+
+class TestTransferencia(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.origem = os.path.join(self.pasta.name, 'origem.db')
+        with usar_banco(self.origem):
+            dao.criar_tabelas()
+            dao.adicionar_tarefa(1, 'Avulsa', horario='10:00', data=date(2024, 1, 3), duracao=45)
+            dao.adicionar_tarefa(1, 'Série', horario='08:00', prioridade='alta', data=SEMANA,
+                                 recorrencia_dias=[1, 3, 5], recorrencia_ate=date(2024, 3, 1))
+            dao.adicionar_tarefa(1, 'Série curta', data=SEMANA, recorrencia_dias=[2],
+                                 recorrencia_vezes=3)
+
+    def tearDown(self):
+        for nome in os.listdir(self.pasta.name):
+            obter_gerenciador(os.path.join(self.pasta.name, nome)).fechar()
+        self.pasta.cleanup()
+
+    def ida_e_volta(self, formato):
+        arquivo = io.StringIO()
+        with usar_banco(self.origem):
+            EXPORTADORES[formato](arquivo)
+        arquivo.seek(0)
+
+        destino = os.path.join(self.pasta.name, f'destino_{formato}.db')
+        with usar_banco(destino):
+            dao.criar_tabelas()
+            relatorio = importar_registros(LEITORES[formato](arquivo))
+            self.assertEqual(relatorio['rejeitadas'], 0, relatorio['erros'])
+            return destino
+
+    def campos(self, caminho):
+        chaves = ('titulo', 'data', 'duracao', 'recorrencia_dias', 'recorrencia_ate', 'recorrencia_vezes')
+        with usar_banco(caminho):
+            return sorted(tuple(tarefa[chave] for chave in chaves) for tarefa in iterar_tarefas())
+
+    def titulos_da_semana(self, caminho):
+        with usar_banco(caminho):
+            return sorted(tarefa.titulo for dia, tarefas in dao.obter_semana(SEMANA) for tarefa in tarefas)
+
+    def test_csv_preserva_recorrencia(self):
+        destino = self.ida_e_volta('csv')
+        self.assertEqual(self.campos(destino), self.campos(self.origem))
+        self.assertEqual(self.titulos_da_semana(destino), self.titulos_da_semana(self.origem))
+
+    def test_json_preserva_recorrencia(self):
+        destino = self.ida_e_volta('json')
+        self.assertEqual(self.campos(destino), self.campos(self.origem))
+        self.assertEqual(self.titulos_da_semana(destino), self.titulos_da_semana(self.origem))
+
+    def test_recorrencia_invalida_e_rejeitada(self):
+        with usar_banco(os.path.join(self.pasta.name, 'invalida.db')):
+            dao.criar_tabelas()
+            relatorio = importar_registros([
+                {'titulo': 'Dias por nome', 'dia_semana_id': 1, 'recorrencia_dias': 'seg'},
+                {'titulo': 'Dia inexistente', 'dia_semana_id': 1, 'recorrencia_dias': [9]},
+                {'titulo': 'Vezes negativo', 'dia_semana_id': 1, 'recorrencia_dias': '1',
+                 'recorrencia_vezes': -2},
+                {'titulo': 'Lista JSON', 'dia_semana_id': 1, 'recorrencia_dias': [3, 1]},
+            ])
+            self.assertEqual(relatorio['importadas'], 1)
+            self.assertEqual(relatorio['rejeitadas'], 3)
+            self.assertEqual([tarefa['recorrencia_dias'] for tarefa in iterar_tarefas()], ['1,3'])
+
+    def test_registros_malformados_sao_rejeitados_sem_interromper(self):
+        linhas = [
+            '{"titulo": "Antes", "dia_semana_id": 1}',
+            '{"titulo": 5, "dia_semana_id": 2}',
+            '["não", "é", "objeto"]',
+            '"texto solto"',
+            '{"titulo": "JSON quebrado"',
+            '{"titulo": ["lista"], "dia_semana_id": 1}',
+            '{"titulo": "Dia lista", "dia_nome": ["Segunda"]}',
+            '{"titulo": "Descrição objeto", "dia_semana_id": 1, "descricao": {"a": 1}}',
+            '{"titulo": "Criação lista", "dia_semana_id": 1, "data_criacao": [2024]}',
+            '{"titulo": "Duração fracionária", "dia_semana_id": 1, "duracao": 1.5}',
+            '{"titulo": "Horário número", "dia_semana_id": 1, "horario": 930}',
+            '{"titulo": "Recorrência objeto", "dia_semana_id": 1, "recorrencia_dias": {"1": true}}',
+            '{"titulo": "Depois", "dia_semana_id": 3}',
+        ]
+        with usar_banco(os.path.join(self.pasta.name, 'malformados.db')):
+            dao.criar_tabelas()
+            # Um lote por registro: os anteriores já estão gravados quando chegam os ruins
+            relatorio = importar_registros(LEITORES['json'](io.StringIO('\n'.join(linhas))),
+                                           tamanho_lote=1)
+            self.assertEqual(relatorio['importadas'], 3)
+            self.assertEqual(relatorio['rejeitadas'], 10)
+            self.assertEqual([numero for numero, erro in relatorio['erros']], list(range(3, 13)))
+            self.assertEqual(sorted(tarefa['titulo'] for tarefa in iterar_tarefas()),
+                             ['5', 'Antes', 'Depois'])
+
+
+if __name__ == '__main__':
+    unittest.main()
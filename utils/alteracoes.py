@@ -0,0 +1,73 @@
+import threading
+import weakref
+from datetime import date
+
+from utils.conexao import banco_atual, obter_conexao, obter_gerenciador
+
+# Último seq visto por banco: caminho -> (ref. fraca ao gerenciador, data_version, seq)
+_ultimas = {}
+_lock = threading.Lock()
+
+
+def _maior_seq(conn):
+    return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM alteracoes').fetchone()[0]
+
+
+def ultima_alteracao():
+    """Seq da alteração mais recente no banco atual (0 se nenhuma)
+
+    Só consulta a tabela alteracoes quando o PRAGMA data_version mudou: com o
+    banco parado, cada sessão paga uma leitura de pragma por verificação.
+    """
+    caminho = banco_atual()
+    gerenciador = obter_gerenciador(caminho)
+    # Lida antes da consulta: um commit no meio só faz a próxima chamada consultar de novo
+    versao = gerenciador.versao_dados()
+    with _lock:
+        ultima = _ultimas.get(caminho)
+    # O gerenciador pode ter sido recriado (LRU) e a contagem de versões reiniciado
+    if ultima is not None and ultima[0]() is gerenciador and ultima[1] == versao:
+        return ultima[2]
+
+    seq = _maior_seq(obter_conexao())
+    with _lock:
+        _ultimas[caminho] = (weakref.ref(gerenciador), versao, seq)
+    return seq
+
+
+def alteracoes_desde(seq):
+    """(seq atual, datas alteradas depois de `seq`) no banco atual
+
+    As datas voltam como um set de date (vazio se nada mudou). None no lugar
+    do set pede para recarregar tudo: `seq` desconhecido, histórico já limpo
+    (sessão muito atrasada), banco restaurado ou tarefa recorrente alterada.
+    """
+    atual = ultima_alteracao()
+    if seq is None or atual < seq:
+        return atual, None
+    if atual == seq:
+        return atual, set()
+
+    # Uma única consulta (um único snapshot); seq é contíguo, então um buraco
+    # logo depois de `seq` significa que a limpeza já passou por ali
+    linhas = obter_conexao().execute('''
+        SELECT data, MIN(seq) FROM alteracoes
+        WHERE seq > ? AND seq <= ?
+        GROUP BY data
+    ''', (seq, atual)).fetchall()
+    if not linhas or min(primeiro for _, primeiro in linhas) > seq + 1:
+        return atual, None
+    if any(data is None for data, _ in linhas):
+        return atual, None
+    return atual, {date.fromisoformat(data) for data, _ in linhas}
+
+
+def com_faixa_de_alteracoes(conn, funcao, *args):
+    """Roda funcao(conn, *args) no escritor e devolve (seq antes, seq depois)
+
+    Quem já aplicou a mudança na própria tela compara `antes` com o seq que
+    conhecia: se forem iguais, nada de outra sessão entrou no meio.
+    """
+    antes = _maior_seq(conn)
+    funcao(conn, *args)
+    return antes, _maior_seq(conn)
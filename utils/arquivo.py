@@ -0,0 +1,216 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+from utils.conexao import banco_atual, obter_conexao, usar_banco
+from utils.escritor import executar_escrita, preparar_conexao_escritor, publicar
+from utils.migracoes import garantir_esquema
+
+# Tarefas concluídas há mais de IDADE_PADRAO_DIAS vão para o banco de arquivo
+IDADE_PADRAO_DIAS = 30
+
+# Lotes curtos: cada um é uma transação rápida e as escritas do app passam entre eles
+TAMANHO_LOTE = 500
+PAUSA_ENTRE_LOTES_S = 0.05
+
+# Nome do banco anexado (ATTACH) nas conexões que consultam o arquivo
+ESQUEMA = 'arquivo'
+
+# Colunas lidas pelas consultas do DAO quando incluem o arquivo
+COLUNAS_CONSULTA = ('id', 'dia_semana_id', 'titulo', 'descricao', 'horario', 'prioridade',
+                    'concluida', 'data_criacao', 'chave_ordem', 'recorrencia_dias', 'data',
+                    'concluida_em', 'duracao')
+
+_execucoes = {}  # caminho do banco -> {'thread', 'resultado'}
+_lock = threading.Lock()
+
+# =============================================
+# BANCO DE ARQUIVO
+# =============================================
+
+def caminho_arquivo(caminho=None):
+    """Arquivo do banco de arquivo: database/agenda.db -> database/agenda_arquivo.db"""
+    base, extensao = os.path.splitext(caminho or banco_atual())
+    return f"{base}_arquivo{extensao or '.db'}"
+
+def anexar_arquivo(conn):
+    """Anexa (ATTACH) o banco de arquivo à conexão, uma única vez por conexão"""
+    if any(nome == ESQUEMA for _, nome, _ in conn.execute('PRAGMA database_list')):
+        return
+
+    # ATTACH não pode ser feito dentro de uma transação
+    conn.execute(f'ATTACH DATABASE ? AS {ESQUEMA}', (caminho_arquivo(),))
+    conn.execute(f'PRAGMA {ESQUEMA}.journal_mode = WAL')
+    _sincronizar_esquema(conn)
+
+def _sincronizar_esquema(conn):
+    """Cria ou completa arquivo.tarefas com as mesmas colunas de main.tarefas"""
+    colunas = conn.execute('PRAGMA main.table_info(tarefas)').fetchall()
+    existentes = {linha[1] for linha in conn.execute(f'PRAGMA {ESQUEMA}.table_info(tarefas)')}
+
+    if not existentes:
+        definicoes = ', '.join(f"{nome} {tipo}" + (' PRIMARY KEY' if pk else '')
+                               for _, nome, tipo, _, _, pk in colunas)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {ESQUEMA}.tarefas ({definicoes})')
+        # Mesmos índices das listagens por data e das estatísticas
+        conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS {ESQUEMA}.idx_tarefas_data_chave_ordem
+            ON tarefas (data, chave_ordem)
+        ''')
+        conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS {ESQUEMA}.idx_tarefas_estatisticas
+            ON tarefas (dia_semana_id, prioridade, concluida)
+        ''')
+        return
+
+    # Migrações novas em main.tarefas: acrescenta as colunas que faltam
+    for _, nome, tipo, *_ in colunas:
+        if nome not in existentes:
+            conn.execute(f'ALTER TABLE {ESQUEMA}.tarefas ADD COLUMN {nome} {tipo}')
+
+def origem_tarefas(incluir_arquivo=False):
+    """Tabela para o FROM das consultas: tarefas ou tarefas + arquivo (UNION ALL)"""
+    if not incluir_arquivo:
+        return 'tarefas'
+
+    anexar_arquivo(obter_conexao())
+    colunas = ', '.join(COLUNAS_CONSULTA)
+    return (f'(SELECT {colunas} FROM main.tarefas '
+            f'UNION ALL SELECT {colunas} FROM {ESQUEMA}.tarefas)')
+
+# =============================================
+# ARQUIVAMENTO
+# =============================================
+
+def _arquivar_lote(conn, idade_dias, tamanho_lote):
+    """Move um lote de tarefas antigas para o arquivo; retorna quantas foram movidas
+
+    Roda no escritor, com o arquivo já anexado à conexão dele (anexar_arquivo).
+    """
+    ids = [id for id, in conn.execute('''
+        SELECT id FROM main.tarefas
+        WHERE concluida = 1 AND concluida_em < datetime('now', ?)
+          AND recorrencia_dias IS NULL
+        ORDER BY concluida_em
+        LIMIT ?
+    ''', (f'-{idade_dias} days', tamanho_lote))]
+    if not ids:
+        return 0
+
+    colunas = ', '.join(linha[1] for linha in conn.execute('PRAGMA main.table_info(tarefas)'))
+    marcadores = ', '.join('?' * len(ids))
+    # No modo WAL o commit não é atômico entre bancos anexados: copiar antes de
+    # apagar garante que uma falha no meio no máximo duplica, nunca perde, e o
+    # OR REPLACE torna a nova tentativa idempotente
+    conn.execute(f'''
+        INSERT OR REPLACE INTO {ESQUEMA}.tarefas ({colunas})
+        SELECT {colunas} FROM main.tarefas WHERE id IN ({marcadores})
+    ''', ids)
+    conn.execute(f'DELETE FROM main.tarefas WHERE id IN ({marcadores})', ids)
+    # Tarefas que saíram das listagens (índices de horários, utils/intervalos.py)
+    for tarefa_id in ids:
+        publicar(('tarefa', tarefa_id))
+    return len(ids)
+
+def vacuum_incremental(conn):
+    """Devolve ao sistema as páginas livres do banco principal; retorna quantas"""
+    antes = conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+    # execute() dá um único passo no pragma (uma página); executescript roda até o fim
+    conn.executescript('PRAGMA main.incremental_vacuum;')
+    return antes - conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+
+def converter_vacuum_incremental(conn):
+    """Ativa auto_vacuum=INCREMENTAL em um banco antigo (VACUUM completo, uma única vez)"""
+    if conn.execute('PRAGMA main.auto_vacuum').fetchone()[0] == 2:
+        return False
+    conn.execute('PRAGMA main.auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM main')
+    return True
+
+def arquivar(idade_dias=IDADE_PADRAO_DIAS, tamanho_lote=TAMANHO_LOTE,
+             pausa=PAUSA_ENTRE_LOTES_S, progresso=None):
+    """Move, em lotes, as tarefas concluídas há mais de `idade_dias` para o arquivo
+
+    `progresso`, se informado, é chamado com o total arquivado após cada lote.
+    """
+    garantir_esquema()
+
+    resultado = {'arquivadas': 0, 'lotes': 0, 'paginas_liberadas': 0}
+    inicio = time.perf_counter()
+
+    # Tudo pelo escritor único: cada lote é uma operação dele, entre as escritas
+    # do app, e o cache é invalidado após o COMMIT. O ATTACH é feito antes de cada
+    # lote (só a primeira vez anexa) porque o escritor ocioso pode trocar de conexão
+    while True:
+        preparar_conexao_escritor(anexar_arquivo)
+        movidas = executar_escrita(_arquivar_lote, idade_dias, tamanho_lote)
+        if not movidas:
+            break
+        resultado['arquivadas'] += movidas
+        resultado['lotes'] += 1
+        resultado['paginas_liberadas'] += preparar_conexao_escritor(vacuum_incremental)
+        if progresso:
+            progresso(resultado['arquivadas'])
+        time.sleep(pausa)
+
+    resultado['duracao_s'] = time.perf_counter() - inicio
+    return resultado
+
+def iniciar_arquivamento(**opcoes):
+    """Roda arquivar() em uma thread de fundo no banco atual (uma execução por banco)"""
+    caminho = banco_atual()
+    with _lock:
+        execucao = _execucoes.get(caminho)
+        if execucao and execucao['thread'].is_alive():
+            return execucao['thread']
+
+        execucao = _execucoes[caminho] = {'thread': None, 'resultado': None}
+
+        def executar():
+            with usar_banco(caminho):
+                execucao['resultado'] = arquivar(**opcoes)
+
+        execucao['thread'] = threading.Thread(target=executar, name=f"arquivamento:{caminho}",
+                                              daemon=True)
+        execucao['thread'].start()
+        return execucao['thread']
+
+def estado_arquivamento():
+    """(em andamento, resultado da última execução concluída) no banco atual"""
+    execucao = _execucoes.get(banco_atual())
+    if execucao is None:
+        return False, None
+    return execucao['thread'].is_alive(), execucao['resultado']
+
+# =============================================
+# LINHA DE COMANDO
+# =============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m utils.arquivo',
+        description='Move as tarefas concluídas antigas para o banco de arquivo'
+    )
+    parser.add_argument('--idade', type=int, default=IDADE_PADRAO_DIAS,
+                        help='dias desde a conclusão')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE)
+    parser.add_argument('--converter-vacuum', action='store_true',
+                        help='ativa o vacuum incremental em um banco antigo (VACUUM completo)')
+    args = parser.parse_args(argv)
+
+    garantir_esquema()
+    if args.converter_vacuum and converter_vacuum_incremental(obter_conexao()):
+        print("auto_vacuum=INCREMENTAL ativado", file=sys.stderr)
+
+    resultado = arquivar(args.idade, args.lote,
+                         progresso=lambda total: print(f"\r{total} arquivada(s)", end='',
+                                                       file=sys.stderr))
+    print(f"\n{resultado['arquivadas']} tarefa(s) em {resultado['lotes']} lote(s), "
+          f"{resultado['paginas_liberadas']} página(s) liberada(s), "
+          f"{resultado['duracao_s']:.1f} s", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
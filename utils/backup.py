@@ -0,0 +1,348 @@
+import argparse
+import os
+import pathlib
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from utils.arquivo import caminho_arquivo
+from utils.conexao import banco_atual, usar_banco
+from utils.inquilinos import caminho_do_usuario
+
+# Páginas copiadas por passo da API de backup; entre um passo e outro o banco fica
+# livre, então leitores e escritores seguem trabalhando durante a cópia
+PAGINAS_POR_PASSO = 256
+PAUSA_ENTRE_PASSOS_S = 0.005
+
+# Um commit de outra conexão no meio da cópia faz o SQLite recomeçar do zero;
+# depois de tantos recomeços, copia tudo em um passo (um snapshot de leitura no WAL)
+MAXIMO_RECOMECOS = 3
+
+# Retenção padrão: os últimos N, um por dia nos últimos D dias e um por semana nas
+# últimas S semanas (o mais recente de cada período)
+MANTER_ULTIMOS = 5
+MANTER_DIARIOS = 7
+MANTER_SEMANAIS = 4
+
+FORMATO_DATA = '%Y%m%d-%H%M%S'
+
+_execucoes = {}  # caminho do banco -> {'thread', 'resultado'}
+_lock = threading.Lock()
+
+
+class _Recomecou(Exception):
+    """A cópia incremental recomeçou vezes demais"""
+
+
+# =============================================
+# CÓPIA
+# =============================================
+
+def pasta_backups(caminho=None):
+    """Pasta dos snapshots: database/agenda.db -> database/backups/"""
+    return os.path.join(os.path.dirname(caminho or banco_atual()), 'backups')
+
+def copiar_banco(origem, destino, paginas=PAGINAS_POR_PASSO, pausa=PAUSA_ENTRE_PASSOS_S,
+                 progresso=None):
+    """Copia o banco `origem` para o arquivo `destino` com a API de backup do SQLite
+
+    `progresso`, se informado, é chamado com (páginas copiadas, total) a cada passo.
+    Retorna as métricas da cópia.
+    """
+    contagem = {'passos': 0, 'recomecos': 0, 'restantes': None}
+
+    def acompanhar(status, restantes, total):
+        contagem['passos'] += 1
+        if contagem['restantes'] is not None and restantes > contagem['restantes']:
+            contagem['recomecos'] += 1
+            if contagem['recomecos'] > MAXIMO_RECOMECOS:
+                raise _Recomecou()
+        contagem['restantes'] = restantes
+        if progresso:
+            progresso(total - restantes, total)
+
+    inicio = time.perf_counter()
+    # Somente leitura: uma origem inexistente é erro, não um banco vazio criado no lugar
+    fonte = sqlite3.connect(f'{pathlib.Path(origem).resolve().as_uri()}?mode=ro', uri=True)
+    try:
+        alvo = sqlite3.connect(destino)
+        try:
+            try:
+                fonte.backup(alvo, pages=paginas, progress=acompanhar, sleep=pausa)
+            except _Recomecou:
+                # Escritas constantes: um único passo lê um snapshot consistente
+                # sem bloquear os escritores (modo WAL)
+                fonte.backup(alvo, pages=-1)
+            total_paginas = alvo.execute('PRAGMA page_count').fetchone()[0]
+            tamanho_pagina = alvo.execute('PRAGMA page_size').fetchone()[0]
+        finally:
+            alvo.close()
+    finally:
+        fonte.close()
+
+    duracao = time.perf_counter() - inicio
+    tamanho = total_paginas * tamanho_pagina
+    return {
+        'paginas': total_paginas,
+        'bytes': tamanho,
+        'passos': contagem['passos'],
+        'recomecos': contagem['recomecos'],
+        'duracao_s': duracao,
+        'mb_por_s': tamanho / 1024 / 1024 / duracao if duracao else 0.0,
+    }
+
+# =============================================
+# SNAPSHOTS
+# =============================================
+
+def _padrao_snapshot(caminho):
+    base = os.path.splitext(os.path.basename(caminho))[0]
+    return re.compile(rf'^{re.escape(base)}_(\d{{8}}-\d{{6}})(?:_\d+)?\.db$')
+
+def listar_snapshots(caminho=None):
+    """Snapshots do banco, do mais recente para o mais antigo: [(datetime, arquivo)]"""
+    caminho = caminho or banco_atual()
+    pasta = pasta_backups(caminho)
+    if not os.path.isdir(pasta):
+        return []
+
+    padrao = _padrao_snapshot(caminho)
+    snapshots = []
+    for nome in os.listdir(pasta):
+        encontrado = padrao.match(nome)
+        if encontrado:
+            snapshots.append((datetime.strptime(encontrado.group(1), FORMATO_DATA),
+                              os.path.join(pasta, nome)))
+    return sorted(snapshots, reverse=True)
+
+def criar_snapshot(caminho=None, paginas=PAGINAS_POR_PASSO, pausa=PAUSA_ENTRE_PASSOS_S,
+                   progresso=None):
+    """Copia o banco para um snapshot com data e hora no nome; retorna as métricas
+
+    O banco de arquivo (<banco>_arquivo.db), se existir, é copiado junto para
+    <snapshot>_arquivo.db. As cópias são feitas em arquivos temporários e
+    renomeadas no fim, a do arquivo antes: um snapshot listado está sempre completo.
+    """
+    caminho = caminho or banco_atual()
+    pasta = pasta_backups(caminho)
+    os.makedirs(pasta, exist_ok=True)
+
+    base = os.path.splitext(os.path.basename(caminho))[0]
+    carimbo = datetime.now().strftime(FORMATO_DATA)
+    arquivo = os.path.join(pasta, f"{base}_{carimbo}.db")
+    sequencia = 1
+    while os.path.exists(arquivo):
+        arquivo = os.path.join(pasta, f"{base}_{carimbo}_{sequencia}.db")
+        sequencia += 1
+
+    parcial = arquivo + '.parcial'
+    origem_arquivo = caminho_arquivo(caminho)
+    copia_arquivo = caminho_arquivo(arquivo) if os.path.exists(origem_arquivo) else None
+    parcial_arquivo = copia_arquivo and copia_arquivo + '.parcial'
+    try:
+        resultado = copiar_banco(caminho, parcial, paginas, pausa, progresso)
+        if copia_arquivo:
+            # Depois do principal: uma tarefa arquivada entre as duas cópias fica nas
+            # duas (restaurar desfaz a duplicata), nunca em nenhuma
+            resultado['bytes_arquivo'] = copiar_banco(origem_arquivo, parcial_arquivo,
+                                                      paginas, pausa)['bytes']
+            os.replace(parcial_arquivo, copia_arquivo)
+        os.replace(parcial, arquivo)
+    except BaseException:
+        for temporario in (parcial, parcial_arquivo):
+            if temporario and os.path.exists(temporario):
+                os.remove(temporario)
+        raise
+
+    resultado['arquivo'] = arquivo
+    resultado['snapshot_arquivo'] = copia_arquivo
+    return resultado
+
+def aplicar_retencao(caminho=None, manter_ultimos=MANTER_ULTIMOS, manter_diarios=MANTER_DIARIOS,
+                     manter_semanais=MANTER_SEMANAIS, agora=None):
+    """Apaga os snapshots fora das regras de retenção; retorna os arquivos apagados"""
+    snapshots = listar_snapshots(caminho)
+    agora = agora or datetime.now()
+
+    manter = {arquivo for _, arquivo in snapshots[:manter_ultimos]}
+    dias, semanas = set(), set()
+    # Do mais recente para o mais antigo: o primeiro de cada período é o que fica
+    for momento, arquivo in snapshots:
+        dia = momento.date()
+        if agora - momento < timedelta(days=manter_diarios) and dia not in dias:
+            dias.add(dia)
+            manter.add(arquivo)
+        semana = dia.isocalendar()[:2]
+        if agora - momento < timedelta(weeks=manter_semanais) and semana not in semanas:
+            semanas.add(semana)
+            manter.add(arquivo)
+
+    apagados = [arquivo for _, arquivo in snapshots if arquivo not in manter]
+    for arquivo in apagados:
+        os.remove(arquivo)
+        # A cópia do banco de arquivo tem o mesmo carimbo e sai junto
+        if os.path.exists(caminho_arquivo(arquivo)):
+            os.remove(caminho_arquivo(arquivo))
+    return apagados
+
+def fazer_backup(caminho=None, progresso=None, **retencao):
+    """Cria um snapshot e aplica a retenção; retorna as métricas (com 'apagados')"""
+    caminho = caminho or banco_atual()
+    resultado = criar_snapshot(caminho, progresso=progresso)
+    resultado['apagados'] = aplicar_retencao(caminho, **retencao)
+    return resultado
+
+def _copiar_verificado(origem, parcial):
+    """Copia `origem` para `parcial` e confere a integridade da cópia"""
+    resultado = copiar_banco(origem, parcial)
+    conn = sqlite3.connect(parcial)
+    try:
+        verificacao = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        conn.close()
+    if verificacao != 'ok':
+        raise sqlite3.DatabaseError(f"snapshot corrompido ({origem}): {verificacao}")
+    return resultado
+
+def _remover_duplicadas(parcial, parcial_arquivo):
+    """Tira do arquivo restaurado as tarefas que o snapshot principal ainda tem
+
+    O arquivo é copiado depois do principal: uma tarefa nos dois foi arquivada
+    entre as cópias, e vale o estado do principal. Retorna quantas saíram.
+    """
+    conn = sqlite3.connect(parcial_arquivo)
+    try:
+        conn.execute('ATTACH DATABASE ? AS principal', (parcial,))
+        with conn:
+            return conn.execute('DELETE FROM main.tarefas '
+                                'WHERE id IN (SELECT id FROM principal.tarefas)').rowcount
+    finally:
+        conn.close()
+
+def restaurar(snapshot, destino):
+    """Restaura `snapshot` em um arquivo novo `destino` e confere a integridade
+
+    A cópia do banco de arquivo do snapshot, se houver, volta junto como
+    <destino>_arquivo.db. Nunca sobrescreve: para voltar a agenda, pare o app e
+    troque os arquivos (os dois, quando houver arquivo).
+    """
+    copia_arquivo = caminho_arquivo(snapshot)
+    if not os.path.exists(copia_arquivo):
+        copia_arquivo = None
+    destino_arquivo = caminho_arquivo(destino)
+    # Um arquivo que já estivesse ao lado do destino seria anexado à agenda restaurada
+    for alvo in (destino, destino_arquivo):
+        if os.path.exists(alvo):
+            raise FileExistsError(f"{alvo} já existe")
+
+    parcial = destino + '.parcial'
+    parcial_arquivo = destino_arquivo + '.parcial'
+    try:
+        resultado = _copiar_verificado(snapshot, parcial)
+        resultado['duplicadas'] = 0
+        if copia_arquivo:
+            resultado['bytes_arquivo'] = _copiar_verificado(copia_arquivo, parcial_arquivo)['bytes']
+            resultado['duplicadas'] = _remover_duplicadas(parcial, parcial_arquivo)
+            os.replace(parcial_arquivo, destino_arquivo)
+        os.replace(parcial, destino)
+    except BaseException:
+        for temporario in (parcial, parcial_arquivo):
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        raise
+
+    resultado['arquivo'] = destino
+    resultado['snapshot_arquivo'] = destino_arquivo if copia_arquivo else None
+    return resultado
+
+# =============================================
+# EM SEGUNDO PLANO
+# =============================================
+
+def iniciar_backup(**opcoes):
+    """Roda fazer_backup() em uma thread de fundo no banco atual (uma execução por banco)"""
+    caminho = banco_atual()
+    with _lock:
+        execucao = _execucoes.get(caminho)
+        if execucao and execucao['thread'].is_alive():
+            return execucao['thread']
+
+        execucao = _execucoes[caminho] = {'thread': None, 'resultado': None}
+
+        def executar():
+            with usar_banco(caminho):
+                execucao['resultado'] = fazer_backup(caminho, **opcoes)
+
+        execucao['thread'] = threading.Thread(target=executar, name=f"backup:{caminho}",
+                                              daemon=True)
+        execucao['thread'].start()
+        return execucao['thread']
+
+def estado_backup():
+    """(em andamento, resultado do último backup concluído) no banco atual"""
+    execucao = _execucoes.get(banco_atual())
+    if execucao is None:
+        return False, None
+    return execucao['thread'].is_alive(), execucao['resultado']
+
+# =============================================
+# LINHA DE COMANDO
+# =============================================
+
+def _relatar(resultado):
+    print(f"\n{resultado['arquivo']}: {resultado['paginas']} página(s), "
+          f"{resultado['bytes'] / 1024 / 1024:.1f} MB em {resultado['duracao_s']:.2f} s "
+          f"({resultado['mb_por_s']:.1f} MB/s, {resultado['passos']} passo(s), "
+          f"{resultado['recomecos']} recomeço(s))", file=sys.stderr)
+    if resultado.get('snapshot_arquivo'):
+        print(f"{resultado['snapshot_arquivo']}: {resultado['bytes_arquivo'] / 1024 / 1024:.1f} MB "
+              f"(banco de arquivo)", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m utils.backup',
+        description='Snapshots online do banco da agenda (API de backup do SQLite)'
+    )
+    parser.add_argument('--banco', help='arquivo do banco (padrão: database/agenda.db)')
+    parser.add_argument('--usuario', help='agenda de um usuário (database/usuarios/)')
+    parser.add_argument('--listar', action='store_true', help='lista os snapshots existentes')
+    parser.add_argument('--restaurar', metavar='SNAPSHOT', help='snapshot a restaurar')
+    parser.add_argument('--destino', help='arquivo novo para a restauração')
+    parser.add_argument('--manter-ultimos', type=int, default=MANTER_ULTIMOS)
+    parser.add_argument('--manter-diarios', type=int, default=MANTER_DIARIOS)
+    parser.add_argument('--manter-semanais', type=int, default=MANTER_SEMANAIS)
+    args = parser.parse_args(argv)
+
+    caminho = args.banco or (caminho_do_usuario(args.usuario) if args.usuario else banco_atual())
+
+    if args.listar:
+        for momento, arquivo in listar_snapshots(caminho):
+            print(f"{momento:%d/%m/%Y %H:%M:%S}  {os.path.getsize(arquivo) / 1024:>10.1f} KB  {arquivo}")
+        return 0
+
+    if args.restaurar:
+        if not args.destino:
+            parser.error('--restaurar exige --destino')
+        _relatar(restaurar(args.restaurar, args.destino))
+        return 0
+
+    if not os.path.exists(caminho):
+        parser.error(f'{caminho} não existe')
+    resultado = fazer_backup(
+        caminho,
+        progresso=lambda copiadas, total: print(f"\r{copiadas}/{total} página(s)", end='',
+                                                file=sys.stderr),
+        manter_ultimos=args.manter_ultimos,
+        manter_diarios=args.manter_diarios,
+        manter_semanais=args.manter_semanais,
+    )
+    _relatar(resultado)
+    if resultado['apagados']:
+        print(f"{len(resultado['apagados'])} snapshot(s) antigo(s) apagado(s)", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import threading
+import weakref
+from collections import OrderedDict
+from functools import wraps
+
+from utils.conexao import obter_gerenciador
+
+TAMANHO_MAXIMO = 256
+
+
+class CacheLeitura:
+    """Cache LRU compartilhado entre sessões, invalidado por geração de escrita
+
+    Cada banco tem um contador de geração. As escritas do DAO incrementam o
+    contador e o PRAGMA data_version detecta commits feitos por outros
+    processos (ou conexões fora do DAO) no mesmo arquivo.
+    """
+
+    def __init__(self, tamanho_maximo=TAMANHO_MAXIMO):
+        self.tamanho_maximo = tamanho_maximo
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+        self._itens = OrderedDict()  # chave -> (geração, valor)
+        self._geracoes = {}  # caminho do banco -> geração atual
+        # caminho do banco -> (referência fraca ao gerenciador, último data_version visto);
+        # fraca para não manter vivo um gerenciador descartado pelo LRU
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def _verificar_outros_processos(self, caminho):
+        """Invalida o banco se houve commits de fora do DAO desde a última consulta"""
+        # Uma versão por banco, lida da sentinela: uma conexão nova de outra
+        # thread não tem referência própria e deixaria passar o commit externo
+        gerenciador = obter_gerenciador(caminho)
+        versao = gerenciador.versao_dados()
+        with self._lock:
+            anterior = self._versoes.get(caminho)
+            self._versoes[caminho] = (weakref.ref(gerenciador), versao)
+        # Gerenciador recriado (LRU): a contagem de versões recomeçou
+        if anterior is not None and (anterior[0]() is not gerenciador or anterior[1] != versao):
+            self.invalidar(caminho)
+
+    def obter(self, caminho, chave):
+        """Retorna (encontrado, valor, geração atual do banco)"""
+        self._verificar_outros_processos(caminho)
+        with self._lock:
+            geracao = self._geracoes.get(caminho, 0)
+            item = self._itens.get(chave)
+            if item is not None and item[0] == geracao:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return True, item[1], geracao
+            self.falhas += 1
+            return False, None, geracao
+
+    def guardar(self, caminho, chave, valor, geracao):
+        """Guarda o valor se nenhuma escrita aconteceu desde a leitura"""
+        with self._lock:
+            if self._geracoes.get(caminho, 0) != geracao:
+                return
+            self._itens[chave] = (geracao, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, caminho):
+        """Descarta tudo o que foi lido do banco informado"""
+        with self._lock:
+            self._geracoes[caminho] = self._geracoes.get(caminho, 0) + 1
+            self.invalidacoes += 1
+            for chave in [c for c in self._itens if c[0] == caminho]:
+                del self._itens[chave]
+
+    def estatisticas(self):
+        """Contadores de acertos e falhas do cache"""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+                'invalidacoes': self.invalidacoes,
+                'itens': len(self._itens),
+            }
+
+
+_cache = CacheLeitura()
+
+
+def em_cache(funcao):
+    """Decorador que guarda o resultado de uma leitura do DAO no cache compartilhado
+
+    O valor guardado é devolvido a todas as sessões: quem chama não deve alterá-lo.
+    """
+    @wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        caminho = obter_gerenciador().caminho
+        chave = (caminho, funcao.__name__, args, tuple(sorted(kwargs.items())))
+
+        encontrado, valor, geracao = _cache.obter(caminho, chave)
+        if encontrado:
+            return valor
+
+        valor = funcao(*args, **kwargs)
+        _cache.guardar(caminho, chave, valor, geracao)
+        return valor
+
+    return envoltorio
+
+
+def invalidar_cache():
+    """Chamada pelas escritas do DAO após o commit"""
+    _cache.invalidar(obter_gerenciador().caminho)
+
+
+def estatisticas_cache():
+    """Acertos, falhas e tamanho do cache de leitura"""
+    return _cache.estatisticas()
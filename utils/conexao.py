@@ -0,0 +1,210 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils import instrumentacao
+
+CAMINHO_PADRAO = os.path.join('database', 'agenda.db')
+
+# Pragmas aplicados uma única vez, na abertura de cada conexão
+PRAGMAS = (
+    # Só tem efeito em bancos novos e precisa vir antes do WAL; bancos antigos
+    # são convertidos uma vez por utils/arquivo.py (VACUUM)
+    ('auto_vacuum', 'INCREMENTAL'),
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('foreign_keys', 'ON'),
+    ('busy_timeout', 5000),
+    ('cache_size', -16000),  # negativo = tamanho em KiB (~16 MB)
+    ('mmap_size', 256 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+)
+
+# Bancos (shards de usuários) com conexões abertas ao mesmo tempo no processo
+MAXIMO_BANCOS_ABERTOS = 64
+
+
+class GerenciadorConexoes:
+    """Pool de conexões SQLite de um arquivo de banco, uma por thread ativa"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.conexoes_abertas = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexoes = {}  # ident da thread -> conexão
+        self._livres = []  # conexões de threads encerradas, prontas para reuso
+        self._sentinela = None  # só para PRAGMA data_version (ver versao_dados)
+        self._lock_sentinela = threading.Lock()
+
+    def _abrir(self):
+        """Abre uma nova conexão e aplica os pragmas de desempenho"""
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+        # isolation_level=None: leituras em autocommit, escritas com BEGIN explícito
+        conn = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None)
+        for nome, valor in PRAGMAS:
+            conn.execute(f"PRAGMA {nome} = {valor}")
+        instrumentacao.ao_abrir_conexao(conn)
+        return conn
+
+    def _reservar(self):
+        """Entrega à thread atual uma conexão livre ou, se não houver, uma nova"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._recolher_threads_encerradas()
+            # O ident pode ter sido reaproveitado de uma thread que já terminou
+            conn = self._conexoes.get(ident)
+            if conn is None and self._livres:
+                conn = self._conexoes[ident] = self._livres.pop()
+            if conn is not None:
+                return conn
+
+        conn = self._abrir()
+        with self._lock:
+            self._conexoes[ident] = conn
+            self.conexoes_abertas += 1
+        return conn
+
+    def _recolher_threads_encerradas(self):
+        """Devolve ao pool as conexões de threads que já terminaram (chamar com o lock)"""
+        # O Streamlit executa cada rerun em uma thread nova: reaproveitar a
+        # conexão evita reabrir o arquivo e reaplicar os pragmas a cada interação
+        vivas = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._conexoes if i not in vivas]:
+            conn = self._conexoes.pop(ident)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._livres.append(conn)
+
+    def conexao(self):
+        """Retorna a conexão da thread atual, reservando-a na primeira chamada"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._reservar()
+        return conn
+
+    @contextmanager
+    def transacao(self):
+        """Executa o bloco em uma transação de escrita (commit ou rollback automático)"""
+        conn = self.conexao()
+        if conn.in_transaction:
+            # Transação já aberta: isola o bloco em um savepoint
+            conn.execute("SAVEPOINT bloco")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK TO bloco")
+                conn.execute("RELEASE bloco")
+                raise
+            conn.execute("RELEASE bloco")
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            # Um COMMIT que falha (ex.: chave estrangeira adiada) deixa a transação
+            # aberta; sem o ROLLBACK, o próximo bloco viraria um savepoint nela
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def versao_dados(self):
+        """PRAGMA data_version de uma conexão que nunca grava
+
+        Muda a cada commit de qualquer conexão (do DAO, do escritor ou de outro
+        processo): basta comparar com o valor anterior para saber se vale a pena
+        consultar o banco de novo.
+        """
+        with self._lock_sentinela:
+            if self._sentinela is None:
+                self._sentinela = sqlite3.connect(self.caminho, check_same_thread=False,
+                                                  isolation_level=None)
+            return self._sentinela.execute('PRAGMA data_version').fetchone()[0]
+
+    def fechar_ociosas(self):
+        """Fecha as conexões sem dono (livres ou de threads encerradas) e a sentinela
+
+        As das threads vivas ficam com elas: uma leitura em andamento, mesmo em
+        autocommit, não pode perder a conexão no meio. Essas são fechadas quando
+        a thread e o gerenciador descartado deixam de referenciá-las.
+        """
+        with self._lock:
+            self._recolher_threads_encerradas()
+            for conn in self._livres:
+                conn.close()
+            self._livres.clear()
+        with self._lock_sentinela:
+            if self._sentinela is not None:
+                self._sentinela.close()
+                self._sentinela = None
+
+    def fechar(self):
+        """Fecha todas as conexões abertas por este gerenciador"""
+        with self._lock:
+            for conn in [*self._conexoes.values(), *self._livres]:
+                conn.close()
+            self._conexoes.clear()
+            self._livres.clear()
+            self._local = threading.local()
+        with self._lock_sentinela:
+            if self._sentinela is not None:
+                self._sentinela.close()
+                self._sentinela = None
+
+
+_gerenciadores = OrderedDict()  # LRU: caminho -> gerenciador
+_banco_atual = ContextVar('banco_atual', default=CAMINHO_PADRAO)
+_lock_gerenciadores = threading.Lock()
+
+
+def banco_atual():
+    """Caminho do banco usado pelo DAO no contexto atual"""
+    return _banco_atual.get()
+
+
+@contextmanager
+def usar_banco(caminho):
+    """Direciona o DAO, dentro do bloco, para outro arquivo de banco"""
+    token = _banco_atual.set(caminho)
+    try:
+        yield
+    finally:
+        _banco_atual.reset(token)
+
+
+def obter_gerenciador(caminho=None):
+    """Retorna o gerenciador (único no processo) do banco informado ou do atual"""
+    caminho = caminho or banco_atual()
+    with _lock_gerenciadores:
+        gerenciador = _gerenciadores.get(caminho)
+        if gerenciador is None:
+            gerenciador = _gerenciadores[caminho] = GerenciadorConexoes(caminho)
+            _descartar_excedentes()
+        else:
+            _gerenciadores.move_to_end(caminho)
+    return gerenciador
+
+
+def _descartar_excedentes():
+    """Descarta os bancos usados há mais tempo além do limite (chamar com o lock)"""
+    while len(_gerenciadores) > MAXIMO_BANCOS_ABERTOS:
+        # Só as conexões ociosas fecham já; as em uso continuam válidas para quem as tem
+        _gerenciadores.popitem(last=False)[1].fechar_ociosas()
+
+
+def obter_conexao():
+    """Conexão reutilizável da thread atual com o banco da agenda"""
+    return obter_gerenciador().conexao()
+
+
+def transacao():
+    """Atalho para a transação de escrita no banco da agenda"""
+    return obter_gerenciador().transacao()
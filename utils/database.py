@@ -1,161 +1,296 @@
-import sqlite3
-import streamlit as st
-from datetime import datetime
+import re
+from datetime import date, datetime, timedelta
+from heapq import merge
+from itertools import groupby
 
-def criar_conexao():
-    """Cria conexão com o banco SQLite"""
-    conn = sqlite3.connect('database/agenda.db', check_same_thread=False)
-    # Ativar chaves estrangeiras
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+from utils.alteracoes import com_faixa_de_alteracoes
+from utils.arquivo import ESQUEMA, anexar_arquivo, origem_tarefas
+from utils.cache import em_cache
+from utils.conexao import obter_conexao
+from utils.escritor import executar_escrita, publicar, submeter_escrita
+from utils.instrumentacao import medir
+from utils.migracoes import garantir_esquema
+from utils.modelos import fabrica_tarefa, tarefa_de_linha
+from utils.recorrencia import chave_ordem, gerar_ocorrencias, inicio_da_semana
 
+@medir
 def criar_tabelas():
-    """Cria todas as tabelas necessárias para SQLite"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    # Tabela de dias da semana - CORRIGIDA
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS dias_semana (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT UNIQUE NOT NULL,
-            ordem INTEGER NOT NULL
-        )
-    ''')
-    
-    # Tabela de tarefas - CORRIGIDA para SQLite
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tarefas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            dia_semana_id INTEGER NOT NULL,
-            titulo TEXT NOT NULL,
-            descricao TEXT,
-            horario TEXT,  -- Mudado para TEXT no SQLite
-            prioridade TEXT DEFAULT 'media',
-            concluida INTEGER DEFAULT 0,  -- INTEGER no lugar de BOOLEAN (0 = false, 1 = true)
-            data_criacao TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (dia_semana_id) REFERENCES dias_semana (id)
-        )
-    ''')
-    
-    conn.commit()
-    
-    # Inserir dias da semana padrão
-    inserir_dias_semana(cursor)
-    
-    conn.commit()
-    conn.close()
+    """Garante que o esquema do banco está na versão mais recente"""
+    garantir_esquema()
 
-def inserir_dias_semana(cursor):
-    """Insere os dias da semana na tabela"""
-    dias_semana = [
-        ('Segunda-feira', 1),
-        ('Terça-feira', 2),
-        ('Quarta-feira', 3),
-        ('Quinta-feira', 4),
-        ('Sexta-feira', 5),
-        ('Sábado', 6),
-        ('Domingo', 7)
-    ]
-    
-    cursor.executemany('''
-        INSERT OR IGNORE INTO dias_semana (nome, ordem) 
-        VALUES (?, ?)
-    ''', dias_semana)
+# Operações de escrita - executadas pelo escritor único (utils/escritor.py), dentro
+# da transação dele; o cache de leitura é invalidado pelo escritor após o COMMIT.
+# Os eventos publicados mantêm os índices de horários (utils/intervalos.py):
+# ('tarefa', id) para uma tarefa inserida, alterada ou excluída e ('recalcular',)
+# quando muitas mudaram de uma vez.
+def _executar_comando(conn, query, valores, eventos=()):
+    conn.execute(query, valores)
+    for evento in eventos:
+        publicar(evento)
+
+def _executar_lotes(conn, comandos, eventos=()):
+    for query, linhas in comandos:
+        conn.executemany(query, linhas)
+    for evento in eventos:
+        publicar(evento)
+
+_INSERIR_TAREFA = '''
+        INSERT INTO tarefas (dia_semana_id, titulo, descricao, horario, prioridade,
+                             recorrencia_dias, recorrencia_ate, recorrencia_vezes, data,
+                             duracao)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+def _inserir_tarefa(conn, valores):
+    cursor = conn.execute(_INSERIR_TAREFA, valores)
+    publicar(('tarefa', cursor.lastrowid))
+    return cursor.lastrowid
 
 # Operações CRUD para Tarefas - ATUALIZADAS
-def adicionar_tarefa(dia_semana_id, titulo, descricao=None, horario=None, prioridade='media'):
-    """Adiciona uma nova tarefa"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
+@medir
+def adicionar_tarefa(dia_semana_id, titulo, descricao=None, horario=None, prioridade='media',
+                     recorrencia_dias=None, recorrencia_ate=None, recorrencia_vezes=None,
+                     data=None, duracao=None):
+    """Adiciona uma nova tarefa
     
+    Com `data` (date) o dia da semana vem da data; sem ela, a tarefa fica no
+    dia_semana_id da semana atual. Com recorrencia_dias (ids de dias_semana) a
+    tarefa se repete toda semana nesses dias, a partir da sua data, até
+    recorrencia_ate (date) ou por recorrencia_vezes ocorrências. `duracao` em
+    minutos (None = duração padrão).
+    """
+    return executar_escrita(_inserir_tarefa, _valores_tarefa(
+        dia_semana_id, titulo, descricao, horario, prioridade,
+        recorrencia_dias, recorrencia_ate, recorrencia_vezes, data, duracao))
+
+def _valores_tarefa(dia_semana_id, titulo, descricao=None, horario=None, prioridade='media',
+                    recorrencia_dias=None, recorrencia_ate=None, recorrencia_vezes=None,
+                    data=None, duracao=None):
+    """Linha de _inserir_tarefa com os parâmetros de adicionar_tarefa já normalizados"""
     # Validar prioridade
     prioridades_validas = ['baixa', 'media', 'alta']
     if prioridade not in prioridades_validas:
         prioridade = 'media'
     
-    cursor.execute('''
-        INSERT INTO tarefas (dia_semana_id, titulo, descricao, horario, prioridade)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (dia_semana_id, titulo, descricao, horario, prioridade))
+    if recorrencia_dias:
+        recorrencia_dias = ','.join(str(dia) for dia in sorted(set(recorrencia_dias)))
+    else:
+        recorrencia_dias = recorrencia_ate = recorrencia_vezes = None
+    if recorrencia_ate:
+        recorrencia_ate = recorrencia_ate.isoformat()
+    if data:
+        dia_semana_id = _dia_da_data(data)
+    elif dia_semana_id is not None:
+        # A semana atual pelo relógio local; o trigger de migracoes.py usaria o UTC
+        # do SQLite e, perto da meia-noite de domingo, gravaria na semana errada
+        data = data_na_semana(dia_semana_id)
+    if data:
+        data = data.isoformat()
     
-    conn.commit()
-    conn.close()
-    return cursor.lastrowid
+    return (dia_semana_id, titulo, descricao, horario, prioridade,
+            recorrencia_dias, recorrencia_ate, recorrencia_vezes, data, duracao or None)
 
-def listar_tarefas_por_dia(dia_semana_id):
-    """Lista todas as tarefas de um dia específico"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
+@medir
+def listar_tarefas_por_dia(dia_semana_id, semana=None, incluir_arquivo=False):
+    """Lista todas as tarefas de um dia específico
     
-    cursor.execute('''
+    O dia é o da semana de `semana` (date; a semana atual se não informada),
+    incluindo as ocorrências das tarefas recorrentes.
+    """
+    return _listar_tarefas_por_dia(dia_semana_id, inicio_da_semana(semana), incluir_arquivo)
+
+@em_cache
+def _listar_tarefas_por_dia(dia_semana_id, inicio, incluir_arquivo=False):
+    data = _data_do_dia(inicio, dia_semana_id)
+    tarefas = listar_tarefas_por_data(data, data, incluir_arquivo)
+    ocorrencias = _ocorrencias_da_semana(inicio).get(dia_semana_id, [])
+    return list(merge(tarefas, ocorrencias, key=chave_ordem))
+
+@medir
+@em_cache
+def listar_tarefas_por_data(inicio, fim, incluir_arquivo=False):
+    """Lista as tarefas com data entre `inicio` e `fim` (dates, inclusive)
+    
+    Busca por intervalo no índice (data, chave_ordem): as linhas já saem na
+    ordem das listagens e o custo não cresce com o histórico. As séries de
+    tarefas recorrentes ficam de fora (ver _ocorrencias_da_semana). Com
+    incluir_arquivo, as tarefas arquivadas também entram.
+    """
+    cursor = obter_conexao().execute(f'''
         SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
-               t.prioridade, t.concluida, t.data_criacao, ds.nome as dia_nome 
-        FROM tarefas t 
+               t.prioridade, t.concluida, t.data_criacao, ds.nome as dia_nome, ds.ordem, t.data,
+               t.duracao
+        FROM {origem_tarefas(incluir_arquivo)} t 
+        JOIN dias_semana ds ON t.dia_semana_id = ds.id 
+        WHERE t.data BETWEEN ? AND ? AND t.recorrencia_dias IS NULL
+        ORDER BY t.data, t.chave_ordem
+    ''', (inicio.isoformat(), fim.isoformat()))
+    
+    cursor.row_factory = fabrica_tarefa
+    return cursor.fetchall()
+
+def _data_do_dia(inicio, dia_semana_id):
+    """Data do dia da semana (id de dias_semana) na semana que começa em `inicio`"""
+    ordem = {id: ordem for id, nome, ordem in listar_dias_semana()}[dia_semana_id]
+    return inicio + timedelta(days=ordem - 1)
+
+def data_na_semana(dia_semana_id, semana=None):
+    """Data do dia da semana (id de dias_semana) na semana de `semana` (a atual se não informada)"""
+    return _data_do_dia(inicio_da_semana(semana), dia_semana_id)
+
+def _dia_da_data(data):
+    """Id de dias_semana correspondente a uma data"""
+    return {ordem: id for id, nome, ordem in listar_dias_semana()}[data.isoweekday()]
+
+@medir
+@em_cache
+def listar_todas_tarefas(incluir_arquivo=False):
+    """Lista todas as tarefas de todos os dias (e do arquivo, com incluir_arquivo)"""
+    cursor = obter_conexao().execute(f'''
+        SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
+               t.prioridade, t.concluida, t.data_criacao, 
+               ds.nome as dia_nome, ds.ordem, t.data, t.duracao
+        FROM {origem_tarefas(incluir_arquivo)} t 
         JOIN dias_semana ds ON t.dia_semana_id = ds.id 
-        WHERE t.dia_semana_id = ? 
-        ORDER BY 
-            CASE 
-                WHEN t.horario IS NULL THEN 1
-                ELSE 0
-            END,
-            t.horario,
-            CASE t.prioridade
-                WHEN 'alta' THEN 1
-                WHEN 'media' THEN 2
-                WHEN 'baixa' THEN 3
-                ELSE 4
-            END
-    ''', (dia_semana_id,))
-    
-    tarefas = cursor.fetchall()
-    conn.close()
-    return tarefas
-
-def listar_todas_tarefas():
-    """Lista todas as tarefas de todos os dias"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+        ORDER BY ds.ordem, t.chave_ordem
+    ''')
+    
+    cursor.row_factory = fabrica_tarefa
+    return cursor.fetchall()
+
+def _filtros_tarefas(concluida=None, prioridade=None, dia_semana_id=None):
+    """Monta as condições WHERE dos filtros da listagem de tarefas"""
+    condicoes = []
+    valores = []
+    
+    if concluida is not None:
+        condicoes.append('t.concluida = ?')
+        valores.append(1 if concluida else 0)
+    if prioridade is not None:
+        condicoes.append('t.prioridade = ?')
+        valores.append(prioridade)
+    if dia_semana_id is not None:
+        condicoes.append('t.dia_semana_id = ?')
+        valores.append(dia_semana_id)
+    
+    return condicoes, valores
+
+@medir
+@em_cache
+def listar_tarefas_filtradas(concluida=None, prioridade=None, dia_semana_id=None,
+                             apos=None, limite=50):
+    """Lista uma página de tarefas filtradas, na mesma ordem de listar_todas_tarefas
+    
+    A paginação é por chave (keyset): `apos` é o cursor devolvido pela página
+    anterior. Retorna (tarefas, cursor da próxima página ou None).
+    """
+    condicoes, valores = _filtros_tarefas(concluida, prioridade, dia_semana_id)
+    
+    if apos is not None:
+        # Continua exatamente depois da última linha da página anterior
+        ordem, chave_ordem, tarefa_id = apos
+        condicoes.append('(ds.ordem > ? OR (ds.ordem = ? AND (t.chave_ordem, t.id) > (?, ?)))')
+        valores.extend([ordem, ordem, chave_ordem, tarefa_id])
+    
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    
+    # Uma linha a mais indica se existe próxima página. CROSS JOIN fixa dias_semana
+    # como laço externo: sem filtro por dia, o planejador preferia o índice das
+    # estatísticas e uma B-tree temporária para o ORDER BY
+    cursor = obter_conexao().execute(f'''
         SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
                t.prioridade, t.concluida, t.data_criacao, 
-               ds.nome as dia_nome, ds.ordem
+               ds.nome as dia_nome, ds.ordem, t.data, t.duracao, t.chave_ordem
+        FROM dias_semana ds 
+        CROSS JOIN tarefas t ON t.dia_semana_id = ds.id 
+        {where}
+        ORDER BY ds.ordem, t.chave_ordem, t.id
+        LIMIT ?
+    ''', valores + [limite + 1])
+    
+    linhas = cursor.fetchall()
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo = (ultima[9], ultima[12], ultima[0])
+    
+    return [tarefa_de_linha(linha[:12]) for linha in linhas], proximo
+
+@medir
+@em_cache
+def contar_tarefas_filtradas(concluida=None, prioridade=None, dia_semana_id=None):
+    """Conta as tarefas que atendem aos filtros"""
+    condicoes, valores = _filtros_tarefas(concluida, prioridade, dia_semana_id)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    
+    cursor = obter_conexao().execute(f'SELECT COUNT(*) FROM tarefas t {where}', valores)
+    return cursor.fetchone()[0]
+
+@medir
+def obter_semana(semana=None, incluir_arquivo=False):
+    """Lista os dias da semana de `semana` (date; a atual se não informada) com suas tarefas
+    
+    As tarefas recorrentes entram como ocorrências dessa semana.
+    """
+    return _obter_semana(inicio_da_semana(semana), incluir_arquivo)
+
+@em_cache
+def _obter_semana(inicio, incluir_arquivo=False):
+    # Uma busca por intervalo (segunda a domingo) no índice de datas
+    tarefas = listar_tarefas_por_data(inicio, inicio + timedelta(days=6), incluir_arquivo)
+    ocorrencias = _ocorrencias_da_semana(inicio)
+    
+    # Agrupa as linhas (já ordenadas por data) em uma única passada
+    por_dia = {id: list(grupo) for id, grupo in groupby(tarefas, key=lambda tarefa: tarefa.dia_semana_id)}
+    semana = []
+    for dia in listar_dias_semana():
+        dia_id = dia[0]
+        semana.append((dia, list(merge(por_dia.get(dia_id, []), ocorrencias.get(dia_id, []),
+                                       key=chave_ordem))))
+    
+    return semana
+
+def _ocorrencias_da_semana(inicio):
+    """Ocorrências das tarefas recorrentes na semana que começa em `inicio`, por dia"""
+    conn = obter_conexao()
+    cursor = conn.execute('''
+        SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
+               t.prioridade, t.concluida, t.data_criacao, ds.nome as dia_nome, ds.ordem, t.data,
+               t.duracao, t.recorrencia_dias, t.recorrencia_ate, t.recorrencia_vezes
         FROM tarefas t 
         JOIN dias_semana ds ON t.dia_semana_id = ds.id 
-        ORDER BY ds.ordem, 
-            CASE 
-                WHEN t.horario IS NULL THEN 1
-                ELSE 0
-            END,
-            t.horario,
-            CASE t.prioridade
-                WHEN 'alta' THEN 1
-                WHEN 'media' THEN 2
-                WHEN 'baixa' THEN 3
-                ELSE 4
-            END
+        WHERE t.recorrencia_dias IS NOT NULL
+        ORDER BY t.chave_ordem
     ''')
+    regras = [(tarefa_de_linha(linha[:12]), *linha[12:]) for linha in cursor]
+    if not regras:
+        return {}
     
-    tarefas = cursor.fetchall()
-    conn.close()
-    return tarefas
+    # Só as conclusões da semana pedida; ocorrências sem linha estão pendentes
+    fim = inicio + timedelta(days=6)
+    concluidas = {
+        (tarefa_id, data): concluida for tarefa_id, data, concluida in conn.execute(
+            'SELECT tarefa_id, data, concluida FROM ocorrencias WHERE data BETWEEN ? AND ?',
+            (inicio.isoformat(), fim.isoformat())
+        )
+    }
+    dias = {id: (nome, ordem) for id, nome, ordem in listar_dias_semana()}
+    
+    por_dia = {}
+    for ocorrencia in gerar_ocorrencias(regras, inicio, dias, concluidas):
+        por_dia.setdefault(ocorrencia.dia_semana_id, []).append(ocorrencia)
+    return por_dia
 
+@medir
+@em_cache
 def listar_dias_semana():
     """Lista todos os dias da semana"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id, nome, ordem FROM dias_semana ORDER BY ordem')
-    dias = cursor.fetchall()
-    conn.close()
-    return dias
+    cursor = obter_conexao().execute('SELECT id, nome, ordem FROM dias_semana ORDER BY ordem')
+    return cursor.fetchall()
 
-def atualizar_tarefa(tarefa_id, **kwargs):
-    """Atualiza uma tarefa existente"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
+def _montar_atualizacao(kwargs):
+    """Separa os campos válidos de uma atualização em (nomes, valores)"""
     campos = []
     valores = []
     
@@ -163,54 +298,248 @@ def atualizar_tarefa(tarefa_id, **kwargs):
         # Validação específica para prioridade
         if campo == 'prioridade' and valor not in ['baixa', 'media', 'alta']:
             continue
-        campos.append(f"{campo} = ?")
+        # Nova data: o dia da semana acompanha
+        if campo == 'data' and valor:
+            campos.append('dia_semana_id')
+            valores.append(_dia_da_data(valor))
+            valor = valor.isoformat()
+        campos.append(campo)
         valores.append(valor)
     
+    return tuple(campos), valores
+
+@medir
+def atualizar_tarefa(tarefa_id, **kwargs):
+    """Atualiza uma tarefa existente (nada muda se nenhum campo for válido)"""
+    campos, valores = _montar_atualizacao(kwargs)
+    if not campos:
+        return
     valores.append(tarefa_id)
     
-    query = f"UPDATE tarefas SET {', '.join(campos)} WHERE id = ?"
-    cursor.execute(query, valores)
-    
-    conn.commit()
-    conn.close()
+    atribuicoes = ', '.join(f"{campo} = ?" for campo in campos)
+    query = f"UPDATE tarefas SET {atribuicoes} WHERE id = ?"
+    executar_escrita(_executar_comando, query, valores, [('tarefa', tarefa_id)])
 
+@medir
 def excluir_tarefa(tarefa_id):
     """Exclui uma tarefa"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM tarefas WHERE id = ?', (tarefa_id,))
-    
-    conn.commit()
-    conn.close()
+    executar_escrita(_executar_comando, 'DELETE FROM tarefas WHERE id = ?', (tarefa_id,),
+                     [('tarefa', tarefa_id)])
 
+@medir
 def marcar_concluida(tarefa_id, concluida=True):
     """Marca uma tarefa como concluída ou não"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
-    
     # Converter boolean para integer (SQLite)
     concluida_int = 1 if concluida else 0
     
-    cursor.execute('UPDATE tarefas SET concluida = ? WHERE id = ?', (concluida_int, tarefa_id))
+    executar_escrita(_executar_comando, 'UPDATE tarefas SET concluida = ? WHERE id = ?',
+                     (concluida_int, tarefa_id), [('tarefa', tarefa_id)])
+
+# Conclusão por ocorrência: só as concluídas são gravadas, então o custo de
+# armazenamento e de escrita não depende do tamanho da série
+SQL_CONCLUIR_OCORRENCIA = '''
+    INSERT INTO ocorrencias (tarefa_id, data, concluida) VALUES (?, ?, 1)
+    ON CONFLICT (tarefa_id, data) DO UPDATE SET concluida = 1
+'''
+SQL_REABRIR_OCORRENCIA = 'DELETE FROM ocorrencias WHERE tarefa_id = ? AND data = ?'
+
+@medir
+def marcar_ocorrencia_concluida(tarefa_id, data, concluida=True):
+    """Marca uma ocorrência (tarefa recorrente + date) como concluída ou não"""
+    query = SQL_CONCLUIR_OCORRENCIA if concluida else SQL_REABRIR_OCORRENCIA
+    executar_escrita(_executar_comando, query, (tarefa_id, data.isoformat()))
+
+# Versões sem espera, para os cliques da interface (atualização otimista): devolvem
+# um Future com a faixa (seq antes, seq depois) do registro de alterações
+@medir
+def marcar_concluida_sem_espera(tarefa_id, concluida=True, data=None):
+    """Como marcar_concluida (ou marcar_ocorrencia_concluida, com `data`), sem esperar o commit"""
+    if data is not None:
+        query = SQL_CONCLUIR_OCORRENCIA if concluida else SQL_REABRIR_OCORRENCIA
+        return submeter_escrita(com_faixa_de_alteracoes, _executar_comando, query,
+                                (tarefa_id, data.isoformat()))
+    return submeter_escrita(com_faixa_de_alteracoes, _executar_comando,
+                            'UPDATE tarefas SET concluida = ? WHERE id = ?',
+                            (1 if concluida else 0, tarefa_id), [('tarefa', tarefa_id)])
+
+@medir
+def excluir_tarefa_sem_espera(tarefa_id):
+    """Como excluir_tarefa, sem esperar o commit"""
+    return submeter_escrita(com_faixa_de_alteracoes, _executar_comando,
+                            'DELETE FROM tarefas WHERE id = ?', (tarefa_id,), [('tarefa', tarefa_id)])
+
+# Operações em lote - uma única transação (e um único commit) para muitas linhas
+@medir
+def adicionar_tarefas(tarefas):
+    """Adiciona várias tarefas de uma vez
+    
+    Cada item é um dicionário com os mesmos parâmetros de adicionar_tarefa.
+    Retorna a quantidade de tarefas inseridas.
+    """
+    # Com `data`, o dia_semana_id é dispensável (vem da data)
+    linhas = [_valores_tarefa(**{'dia_semana_id': None, **tarefa}) for tarefa in tarefas]
     
-    conn.commit()
-    conn.close()
+    executar_escrita(_executar_lotes, [(_INSERIR_TAREFA, linhas)], [('recalcular',)])
+    return len(linhas)
 
+@medir
+def atualizar_tarefas(alteracoes):
+    """Atualiza várias tarefas; `alteracoes` é uma lista de (tarefa_id, {campo: valor})"""
+    # Alterações com o mesmo conjunto de campos compartilham um único UPDATE
+    grupos = {}
+    for tarefa_id, kwargs in alteracoes:
+        campos, valores = _montar_atualizacao(kwargs)
+        if campos:
+            grupos.setdefault(campos, []).append((*valores, tarefa_id))
+    
+    comandos = []
+    for campos, linhas in grupos.items():
+        atribuicoes = ', '.join(f"{campo} = ?" for campo in campos)
+        comandos.append((f"UPDATE tarefas SET {atribuicoes} WHERE id = ?", linhas))
+    executar_escrita(_executar_lotes, comandos,
+                     [('tarefa', tarefa_id) for tarefa_id, _ in alteracoes])
+
+@medir
+def excluir_tarefas(tarefa_ids):
+    """Exclui várias tarefas"""
+    tarefa_ids = list(tarefa_ids)
+    executar_escrita(_executar_lotes, [
+        ('DELETE FROM tarefas WHERE id = ?', [(id,) for id in tarefa_ids]),
+    ], [('tarefa', id) for id in tarefa_ids])
+
+@medir
+def marcar_concluidas(tarefa_ids, concluida=True):
+    """Marca várias tarefas como concluídas ou não"""
+    concluida_int = 1 if concluida else 0
+    tarefa_ids = list(tarefa_ids)
+    
+    executar_escrita(_executar_lotes, [
+        ('UPDATE tarefas SET concluida = ? WHERE id = ?', [(concluida_int, id) for id in tarefa_ids]),
+    ], [('tarefa', id) for id in tarefa_ids])
+
+@medir
+def aplicar_lote(concluir=(), reabrir=(), excluir=(), ocorrencias=()):
+    """Aplica conclusões, reaberturas e exclusões em uma única transação
+    
+    `ocorrencias` é uma lista de (tarefa_id, date, concluida) de tarefas recorrentes.
+    """
+    status = [(1, id) for id in concluir] + [(0, id) for id in reabrir]
+    
+    if not (status or excluir or ocorrencias):
+        return
+    
+    executar_escrita(_executar_lotes, [
+        ('UPDATE tarefas SET concluida = ? WHERE id = ?', status),
+        (SQL_CONCLUIR_OCORRENCIA, [(id, data.isoformat()) for id, data, c in ocorrencias if c]),
+        (SQL_REABRIR_OCORRENCIA, [(id, data.isoformat()) for id, data, c in ocorrencias if not c]),
+        ('DELETE FROM tarefas WHERE id = ?', [(id,) for id in excluir]),
+    ], [('tarefa', id) for id in [*concluir, *reabrir, *excluir]])
+
+def montar_consulta_busca(termo):
+    """Converte o texto digitado em uma consulta FTS5 de prefixos"""
+    # Cada palavra vira um prefixo entre aspas, o que neutraliza a sintaxe do FTS5
+    palavras = re.findall(r'\w+', termo)
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+@medir
+@em_cache
 def buscar_tarefas(termo):
-    """Busca tarefas por termo"""
-    conn = criar_conexao()
-    cursor = conn.cursor()
+    """Busca tarefas por termo, das mais relevantes para as menos relevantes"""
+    consulta = montar_consulta_busca(termo)
+    if not consulta:
+        return []
     
-    cursor.execute('''
+    # bm25 com peso maior para o título do que para a descrição
+    cursor = obter_conexao().execute('''
         SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
-               t.prioridade, t.concluida, t.data_criacao, ds.nome as dia_nome
+               t.prioridade, t.concluida, t.data_criacao, ds.nome as dia_nome, ds.ordem,
+               t.data, t.duracao
+        FROM tarefas_busca 
+        JOIN tarefas t ON t.id = tarefas_busca.rowid 
+        JOIN dias_semana ds ON t.dia_semana_id = ds.id 
+        WHERE tarefas_busca MATCH ?
+        ORDER BY bm25(tarefas_busca, 10.0, 1.0), ds.ordem, t.chave_ordem
+    ''', (consulta,))
+    
+    cursor.row_factory = fabrica_tarefa
+    return cursor.fetchall()
+
+@medir
+@em_cache
+def contar_estatisticas(incluir_arquivo=False):
+    """Conta estatísticas das tarefas com uma única consulta agregada"""
+    # No máximo 7 dias x 3 prioridades x 2 status linhas, qualquer que seja o total
+    query = '''
+        SELECT dia_semana_id, prioridade, concluida, COUNT(*)
+        FROM tarefas
+        GROUP BY dia_semana_id, prioridade, concluida
+    '''
+    if incluir_arquivo:
+        # Cada banco agrega pelo seu próprio índice; as somas se juntam abaixo
+        anexar_arquivo(obter_conexao())
+        query += f'''
+        UNION ALL
+        SELECT dia_semana_id, prioridade, concluida, COUNT(*)
+        FROM {ESQUEMA}.tarefas
+        GROUP BY dia_semana_id, prioridade, concluida
+        '''
+    cursor = obter_conexao().execute(query)
+    
+    total = 0
+    concluidas = 0
+    prioridades = {'alta': 0, 'media': 0, 'baixa': 0}
+    por_dia = {}
+    
+    for dia_semana_id, prioridade, concluida, quantidade in cursor:
+        total += quantidade
+        if concluida:
+            concluidas += quantidade
+        if prioridade in prioridades:
+            prioridades[prioridade] += quantidade
+        
+        dia = por_dia.setdefault(dia_semana_id, {'total': 0, 'concluidas': 0})
+        dia['total'] += quantidade
+        if concluida:
+            dia['concluidas'] += quantidade
+    
+    return {
+        'total': total,
+        'concluidas': concluidas,
+        'prioridades': prioridades,
+        'por_dia': por_dia
+    }
+
+@medir
+@em_cache
+def listar_tarefas_recentes(limite=5):
+    """Lista as últimas tarefas criadas, das mais novas para as mais antigas"""
+    # Percorre o fim do índice de data_criacao: o custo depende de `limite`, não do total
+    cursor = obter_conexao().execute('''
+        SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
+               t.prioridade, t.concluida, t.data_criacao, ds.nome as dia_nome, ds.ordem, t.data,
+               t.duracao
         FROM tarefas t 
         JOIN dias_semana ds ON t.dia_semana_id = ds.id 
-        WHERE t.titulo LIKE ? OR t.descricao LIKE ?
-        ORDER BY ds.ordem, t.horario
-    ''', (f'%{termo}%', f'%{termo}%'))
+        ORDER BY t.data_criacao DESC, t.id DESC
+        LIMIT ?
+    ''', (limite,))
+    
+    cursor.row_factory = fabrica_tarefa
+    return cursor.fetchall()
+
+@medir
+@em_cache
+def listar_resumo_diario(inicio=None, fim=None):
+    """Criadas e concluídas por dia e prioridade: [(dia, prioridade, criadas, concluidas)]
     
-    tarefas = cursor.fetchall()
-    conn.close()
-    return tarefas
\ No newline at end of file
+    Lê a tabela resumo_diario, mantida por triggers a cada escrita: no máximo
+    3 linhas por dia, qualquer que seja o total de tarefas. `inicio` e `fim`
+    (dates, inclusive) limitam o período.
+    """
+    cursor = obter_conexao().execute('''
+        SELECT dia, prioridade, criadas, concluidas
+        FROM resumo_diario
+        WHERE dia BETWEEN ? AND ?
+        ORDER BY dia, prioridade
+    ''', ((inicio or date.min).isoformat(), (fim or date.max).isoformat()))
+    return cursor.fetchall()
@@ -0,0 +1,223 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.cache import invalidar_cache
+from utils.conexao import banco_atual, obter_gerenciador, usar_banco
+
+logger = logging.getLogger('agenda.escritor')
+
+# Depois da primeira operação, espera até JANELA_MS por outras para o mesmo commit
+JANELA_MS = 2
+MAXIMO_LOTE = 256
+# Sem escritas por OCIOSO_S segundos, a thread termina (uma por banco de usuário)
+OCIOSO_S = 30
+
+# Funções chamadas (na thread do escritor) após cada COMMIT com (caminho, eventos)
+_ao_confirmar = []
+_local = threading.local()
+
+
+class EscritorUnico:
+    """Thread dona de todas as escritas de um banco, com commit em grupo
+
+    As operações enfileiradas numa janela curta são aplicadas em uma única
+    transação; cada uma roda em um savepoint, então a falha de uma não desfaz
+    as outras. O resultado chega a quem pediu por um Future, após o COMMIT.
+    """
+
+    def __init__(self, caminho, janela_ms=JANELA_MS, maximo_lote=MAXIMO_LOTE):
+        self.caminho = caminho
+        self.janela = janela_ms / 1000
+        self.maximo_lote = maximo_lote
+        self._fila = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        # Métricas
+        self.commits = 0
+        self.operacoes = 0
+        self.falhas = 0
+        self.maior_fila = 0
+        self.latencia_commit_total_ms = 0.0
+        self.latencia_commit_maxima_ms = 0.0
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._executar, name=f"escritor:{self.caminho}", daemon=True
+                )
+                self._thread.start()
+
+    def submeter(self, funcao, *args, fora_da_transacao=False):
+        """Enfileira funcao(conn, *args) e devolve um Future com o seu retorno
+
+        Com `fora_da_transacao`, a função roda na conexão do escritor antes do
+        BEGIN do lote (ATTACH, VACUUM), sem savepoint e sem eventos.
+        """
+        futuro = Future()
+        self._fila.put((futuro, funcao, args, fora_da_transacao))
+        self.maior_fila = max(self.maior_fila, self._fila.qsize())
+
+        # Depois do put: uma thread que esteja encerrando por ociosidade ainda vê a fila
+        if self._thread is None or not self._thread.is_alive():
+            self._iniciar()
+        return futuro
+
+    def executar(self, funcao, *args, fora_da_transacao=False):
+        """Enfileira a operação e espera o commit (propaga o erro da operação)"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("o escritor não pode esperar por si mesmo")
+        return self.submeter(funcao, *args, fora_da_transacao=fora_da_transacao).result()
+
+    def _coletar_lote(self):
+        """Espera a primeira operação e junta as que chegarem na janela (None se ocioso)"""
+        try:
+            lote = [self._fila.get(timeout=OCIOSO_S)]
+        except queue.Empty:
+            with self._lock:
+                if self._fila.empty():
+                    self._thread = None
+                    return None
+            lote = [self._fila.get()]
+        limite = time.perf_counter() + self.janela
+        while len(lote) < self.maximo_lote:
+            restante = limite - time.perf_counter()
+            try:
+                lote.append(self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _executar(self):
+        with usar_banco(self.caminho):
+            while (lote := self._coletar_lote()) is not None:
+                self._aplicar(lote)
+
+    def _preparar(self, conn, lote):
+        """Roda as operações fora_da_transacao do lote e devolve as demais"""
+        operacoes = []
+        for futuro, funcao, args, fora_da_transacao in lote:
+            if not fora_da_transacao:
+                operacoes.append((futuro, funcao, args))
+            elif futuro.set_running_or_notify_cancel():
+                try:
+                    futuro.set_result(funcao(conn, *args))
+                except Exception as e:
+                    futuro.set_exception(e)
+        return operacoes
+
+    def _aplicar(self, lote):
+        gerenciador = obter_gerenciador(self.caminho)
+        lote = self._preparar(gerenciador.conexao(), lote)
+        if not lote:
+            return
+        resultados = []
+        eventos = []  # publicados pelas operações que não falharam
+        inicio = time.perf_counter()
+
+        try:
+            with gerenciador.transacao() as conn:
+                for futuro, funcao, args in lote:
+                    if not futuro.set_running_or_notify_cancel():
+                        continue
+                    _local.eventos = []
+                    try:
+                        with gerenciador.transacao():  # savepoint da operação
+                            resultados.append((futuro, funcao(conn, *args), None))
+                        eventos.extend(_local.eventos)
+                    except Exception as e:
+                        resultados.append((futuro, None, e))
+        except Exception as e:
+            # BEGIN ou COMMIT falhou: nenhuma operação do lote foi gravada. A
+            # transação não pode sobrar aberta, ou o próximo lote viraria um
+            # savepoint dentro dela e nunca chegaria ao disco
+            conn = gerenciador.conexao()
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for futuro, _, _ in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            self.falhas += len(lote)
+            return
+
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+        self.commits += 1
+        self.operacoes += len(resultados)
+        self.latencia_commit_total_ms += latencia_ms
+        self.latencia_commit_maxima_ms = max(self.latencia_commit_maxima_ms, latencia_ms)
+        invalidar_cache()
+        # Depois da invalidação: quem reagir ao evento já lê os dados novos
+        for funcao in _ao_confirmar:
+            try:
+                funcao(self.caminho, eventos)
+            except Exception:
+                # Os dados já foram gravados: quem pediu a escrita recebe o resultado
+                logger.exception("Falha em %s após o commit", funcao.__name__)
+
+        for futuro, resultado, erro in resultados:
+            if erro is not None:
+                self.falhas += 1
+                futuro.set_exception(erro)
+            else:
+                futuro.set_result(resultado)
+
+    def metricas(self):
+        """Profundidade da fila, commits e latência de commit"""
+        return {
+            'fila': self._fila.qsize(),
+            'maior_fila': self.maior_fila,
+            'commits': self.commits,
+            'operacoes': self.operacoes,
+            'falhas': self.falhas,
+            'operacoes_por_commit': self.operacoes / self.commits if self.commits else 0.0,
+            'latencia_commit_media_ms': self.latencia_commit_total_ms / self.commits if self.commits else 0.0,
+            'latencia_commit_maxima_ms': self.latencia_commit_maxima_ms,
+        }
+
+
+def publicar(evento):
+    """Anuncia uma mudança feita pela operação em andamento (só na thread do escritor)
+
+    Os eventos chegam às funções de registrar_ao_confirmar depois do COMMIT;
+    os de uma operação que falhou são descartados junto com o seu savepoint.
+    """
+    eventos = getattr(_local, 'eventos', None)
+    if eventos is not None:
+        eventos.append(evento)
+
+
+def registrar_ao_confirmar(funcao):
+    """Registra funcao(caminho, eventos), chamada após cada COMMIT do escritor"""
+    _ao_confirmar.append(funcao)
+
+
+_escritores = {}
+_lock_escritores = threading.Lock()
+
+
+def obter_escritor(caminho=None):
+    """Escritor único (no processo) do banco informado ou do atual"""
+    caminho = caminho or banco_atual()
+    escritor = _escritores.get(caminho)
+    if escritor is None:
+        with _lock_escritores:
+            escritor = _escritores.setdefault(caminho, EscritorUnico(caminho))
+    return escritor
+
+
+def executar_escrita(funcao, *args):
+    """Aplica funcao(conn, *args) pelo escritor do banco atual e devolve o retorno"""
+    return obter_escritor().executar(funcao, *args)
+
+
+def submeter_escrita(funcao, *args):
+    """Como executar_escrita, sem esperar: devolve o Future resolvido após o COMMIT"""
+    return obter_escritor().submeter(funcao, *args)
+
+
+def preparar_conexao_escritor(funcao, *args):
+    """Roda funcao(conn, *args) na conexão do escritor, fora de transação, e devolve o retorno"""
+    return obter_escritor().executar(funcao, *args, fora_da_transacao=True)
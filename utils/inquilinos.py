@@ -0,0 +1,66 @@
+import glob
+import hashlib
+import os
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from utils.conexao import usar_banco
+from utils.database import contar_estatisticas, criar_tabelas
+
+# Um arquivo SQLite (shard) por usuário: cada agenda tem o próprio lock de escrita
+PASTA_USUARIOS = os.path.join('database', 'usuarios')
+
+# Shards consultados em paralelo nas estatísticas gerais
+MAXIMO_THREADS = 8
+
+
+def caminho_do_usuario(usuario):
+    """Arquivo do shard de um usuário: nome legível + hash para evitar colisões"""
+    identificador = usuario.strip().lower()
+    texto = unicodedata.normalize('NFKD', identificador).encode('ascii', 'ignore').decode()
+    nome = re.sub(r'[^a-z0-9]+', '-', texto).strip('-')[:40] or 'usuario'
+    resumo = hashlib.sha1(identificador.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(PASTA_USUARIOS, f'{nome}-{resumo}.db')
+
+
+@contextmanager
+def usar_usuario(usuario):
+    """Direciona o DAO, dentro do bloco, para a agenda do usuário (criada na 1ª vez)"""
+    with usar_banco(caminho_do_usuario(usuario)):
+        criar_tabelas()
+        yield
+
+
+def listar_shards():
+    """Caminhos dos bancos de usuários existentes"""
+    return sorted(glob.glob(os.path.join(PASTA_USUARIOS, '*.db')))
+
+
+def _estatisticas_do_shard(caminho):
+    with usar_banco(caminho):
+        criar_tabelas()
+        return caminho, contar_estatisticas()
+
+
+def estatisticas_gerais(maximo_threads=MAXIMO_THREADS):
+    """Soma as estatísticas de todas as agendas, consultando os shards em paralelo"""
+    geral = {'usuarios': 0, 'total': 0, 'concluidas': 0,
+             'prioridades': {'alta': 0, 'media': 0, 'baixa': 0}, 'por_usuario': {}}
+
+    shards = listar_shards()
+    if not shards:
+        return geral
+
+    with ThreadPoolExecutor(max_workers=min(maximo_threads, len(shards))) as executor:
+        for caminho, stats in executor.map(_estatisticas_do_shard, shards):
+            geral['usuarios'] += 1
+            geral['total'] += stats['total']
+            geral['concluidas'] += stats['concluidas']
+            for prioridade, quantidade in stats['prioridades'].items():
+                geral['prioridades'][prioridade] = geral['prioridades'].get(prioridade, 0) + quantidade
+            nome = os.path.splitext(os.path.basename(caminho))[0]
+            geral['por_usuario'][nome] = {'total': stats['total'], 'concluidas': stats['concluidas']}
+
+    return geral
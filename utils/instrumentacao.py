@@ -0,0 +1,150 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+logger = logging.getLogger('agenda.consultas')
+
+# Opt-in: AGENDA_INSTRUMENTACAO=1 liga a coleta; o limiar do log de consultas
+# lentas (em ms) pode ser ajustado com AGENDA_LIMIAR_LENTO_MS
+_config = {
+    'ativa': os.environ.get('AGENDA_INSTRUMENTACAO', '') not in ('', '0'),
+    'limiar_lento_ms': float(os.environ.get('AGENDA_LIMIAR_LENTO_MS', 100)),
+}
+
+# Passos da VM do SQLite entre chamadas do progress handler
+PASSOS_POR_AVISO = 1000
+
+_coletor_atual = ContextVar('coletor_atual', default=None)
+
+
+def configurar_instrumentacao(ativa=None, limiar_lento_ms=None):
+    """Liga/desliga a instrumentação e ajusta o limiar do log de consultas lentas"""
+    if ativa is not None:
+        _config['ativa'] = ativa
+    if limiar_lento_ms is not None:
+        _config['limiar_lento_ms'] = limiar_lento_ms
+
+
+def instrumentacao_ativa():
+    return _config['ativa']
+
+
+def limiar_lento_ms():
+    return _config['limiar_lento_ms']
+
+
+class Coletor:
+    """Acumula as chamadas ao DAO, comandos SQL e conexões de uma execução do script"""
+
+    def __init__(self):
+        self.chamadas = []
+        self.conexoes_abertas = 0
+        self._comandos = None  # comandos da chamada em andamento: [(sql, início)]
+        self._passos = 0
+
+    def registrar_comando(self, sql):
+        if self._comandos is None:
+            return
+        # Ignora comandos internos do SQLite (FTS5, "-- ...") e as repetições
+        # do mesmo comando disparadas por triggers
+        if sql.startswith('--') or (self._comandos and self._comandos[-1][0] == sql):
+            return
+        self._comandos.append((sql, time.perf_counter()))
+
+    def registrar_passos(self):
+        self._passos += PASSOS_POR_AVISO
+
+    @property
+    def total_comandos(self):
+        return sum(len(chamada['comandos']) for chamada in self.chamadas)
+
+    @property
+    def total_linhas(self):
+        return sum(chamada['linhas'] for chamada in self.chamadas)
+
+    @property
+    def total_ms(self):
+        return sum(chamada['duracao_ms'] for chamada in self.chamadas)
+
+
+def iniciar_coleta():
+    """Começa a coleta da execução atual (um rerun do Streamlit); None se desligada"""
+    coletor = Coletor() if instrumentacao_ativa() else None
+    _coletor_atual.set(coletor)
+    return coletor
+
+
+def _rastrear_comando(sql):
+    coletor = _coletor_atual.get()
+    if coletor is not None:
+        coletor.registrar_comando(sql)
+
+
+def _contar_passos():
+    coletor = _coletor_atual.get()
+    if coletor is not None:
+        coletor.registrar_passos()
+    return 0  # 0 = não interromper a consulta
+
+
+def ao_abrir_conexao(conn):
+    """Chamado pelo gerenciador a cada conexão física aberta"""
+    if not instrumentacao_ativa():
+        return
+    conn.set_trace_callback(_rastrear_comando)
+    conn.set_progress_handler(_contar_passos, PASSOS_POR_AVISO)
+    coletor = _coletor_atual.get()
+    if coletor is not None:
+        coletor.conexoes_abertas += 1
+
+
+def _contar_linhas(resultado):
+    """Quantidade de linhas devolvidas por uma função do DAO"""
+    if isinstance(resultado, list):
+        return len(resultado)
+    if isinstance(resultado, tuple) and resultado and isinstance(resultado[0], list):
+        return len(resultado[0])  # (página, cursor) de listar_tarefas_filtradas
+    return 1 if resultado is not None else 0
+
+
+def medir(funcao):
+    """Decorador que mede tempo, comandos SQL e linhas de uma função do DAO"""
+    @wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        if not instrumentacao_ativa():
+            return funcao(*args, **kwargs)
+
+        coletor = _coletor_atual.get()
+        if coletor is not None:
+            # Chamadas aninhadas registram seus comandos separadamente
+            externos, coletor._comandos = coletor._comandos, []
+            passos_antes = coletor._passos
+
+        resultado = None
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao(*args, **kwargs)
+            return resultado
+        finally:
+            fim = time.perf_counter()
+            duracao_ms = (fim - inicio) * 1000
+            if duracao_ms >= limiar_lento_ms():
+                logger.warning("Consulta lenta: %s%r levou %.1f ms", funcao.__name__, args, duracao_ms)
+
+            if coletor is not None:
+                comandos = coletor._comandos
+                # Tempo de cada comando ~ intervalo até o próximo (ou até o fim da chamada)
+                limites = [momento for _, momento in comandos[1:]] + [fim]
+                coletor.chamadas.append({
+                    'funcao': funcao.__name__,
+                    'duracao_ms': duracao_ms,
+                    'linhas': _contar_linhas(resultado),
+                    'passos_vm': coletor._passos - passos_antes,
+                    'comandos': [(sql, (limite - momento) * 1000)
+                                 for (sql, momento), limite in zip(comandos, limites)],
+                })
+                coletor._comandos = externos
+
+    return envoltorio
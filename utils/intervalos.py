@@ -0,0 +1,247 @@
+import threading
+import weakref
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from utils.conexao import MAXIMO_BANCOS_ABERTOS, banco_atual, obter_gerenciador
+from utils.database import listar_dias_semana, listar_tarefas_por_dia
+from utils.escritor import registrar_ao_confirmar
+from utils.instrumentacao import medir
+from utils.modelos import horario_em_minutos, tarefa_de_linha
+
+# Tarefas com horário e sem duração ocupam DURACAO_PADRAO minutos
+DURACAO_PADRAO = 30
+
+# Janela do dia em que os horários livres são procurados (minutos desde 00:00)
+INICIO_DIA = 8 * 60
+FIM_DIA = 22 * 60
+
+# Dias com índice em memória, por banco
+MAXIMO_DIAS = 512
+
+
+class IndiceIntervalos:
+    """Intervalos [início, fim) em minutos das tarefas de um dia, ordenados pelo início
+
+    Conflitos e horários livres saem por busca binária: só os intervalos que
+    começam perto da janela pedida são examinados, qualquer que seja o dia.
+    """
+
+    def __init__(self, tarefas=()):
+        self._itens = []  # (início, fim, id), ordenados
+        self._por_id = {}  # id -> (item, Tarefa)
+        self._maior_duracao = 0
+        for tarefa in tarefas:
+            item = self._registrar(tarefa)
+            if item is not None:
+                self._itens.append(item)
+        self._itens.sort()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def _registrar(self, tarefa):
+        inicio = tarefa.horario_minutos
+        if inicio is None:
+            return None
+        duracao = tarefa.duracao or DURACAO_PADRAO
+        item = (inicio, inicio + duracao, tarefa.id)
+        self._por_id[tarefa.id] = (item, tarefa)
+        # A maior duração só cresce: continua um limite válido depois das remoções
+        self._maior_duracao = max(self._maior_duracao, duracao)
+        return item
+
+    def inserir(self, tarefa):
+        """Acrescenta (ou substitui) uma tarefa; sem horário, ela não ocupa o dia"""
+        self.remover(tarefa.id)
+        item = self._registrar(tarefa)
+        if item is not None:
+            insort(self._itens, item)
+
+    def remover(self, tarefa_id):
+        registro = self._por_id.pop(tarefa_id, None)
+        if registro is not None:
+            del self._itens[bisect_left(self._itens, registro[0])]
+
+    def _primeiro_que_alcanca(self, minuto):
+        """Posição do primeiro intervalo que pode terminar depois de `minuto`"""
+        return bisect_left(self._itens, (minuto - self._maior_duracao + 1,))
+
+    def conflitos(self, inicio, fim, ignorar=None):
+        """Tarefas cujos intervalos se sobrepõem a [inicio, fim), por horário"""
+        tarefas = []
+        for posicao in range(self._primeiro_que_alcanca(inicio), len(self._itens)):
+            inicio_item, fim_item, tarefa_id = self._itens[posicao]
+            if inicio_item >= fim:
+                break
+            if fim_item > inicio and tarefa_id != ignorar:
+                tarefas.append(self._por_id[tarefa_id][1])
+        return tarefas
+
+    def proximo_livre(self, duracao, apos=INICIO_DIA, limite=FIM_DIA):
+        """Início do primeiro intervalo livre de `duracao` minutos entre `apos` e `limite`"""
+        cursor = apos
+        for posicao in range(self._primeiro_que_alcanca(apos), len(self._itens)):
+            inicio_item, fim_item, _ = self._itens[posicao]
+            if inicio_item >= cursor + duracao:
+                break
+            cursor = max(cursor, fim_item)
+        return cursor if cursor + duracao <= limite else None
+
+
+# =============================================
+# ÍNDICES POR DIA
+# =============================================
+
+class _EstadoBanco:
+    """Índices de um banco e as versões que dizem se ainda valem"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.versao = self._versao_sentinela()
+        self.versao_escritor = None
+        self.indices = OrderedDict()  # date -> IndiceIntervalos
+        # Muda a cada commit observado: índice montado antes disso não é registrado
+        self.geracao = 0
+
+    def _versao_sentinela(self):
+        # Muda a cada commit de qualquer conexão (utils/conexao.py); o gerenciador
+        # entra na comparação porque, recriado pelo LRU, recomeça a contagem
+        gerenciador = obter_gerenciador(self.caminho)
+        return weakref.ref(gerenciador), gerenciador.versao_dados()
+
+    def verificar_externas(self):
+        """Descarta os índices se outra conexão (fora do escritor) gravou no banco"""
+        referencia, versao = self._versao_sentinela()
+        if referencia() is not self.versao[0]() or versao != self.versao[1]:
+            self.versao = (referencia, versao)
+            self.indices.clear()
+            self.geracao += 1
+
+
+_estados = OrderedDict()  # caminho -> _EstadoBanco
+_lock = threading.Lock()
+
+
+def _estado(caminho):
+    estado = _estados.get(caminho)
+    if estado is None:
+        estado = _estados[caminho] = _EstadoBanco(caminho)
+        while len(_estados) > MAXIMO_BANCOS_ABERTOS:
+            _estados.popitem(last=False)
+    _estados.move_to_end(caminho)
+    return estado
+
+
+def indice_do_dia(data):
+    """Índice de horários do dia `data` no banco atual, montado na primeira consulta
+
+    Depois disso ele é mantido pelas escritas do DAO (eventos do escritor) e só
+    é remontado quando outra conexão grava no banco.
+    """
+    caminho = banco_atual()
+    with _lock:
+        estado = _estado(caminho)
+        estado.verificar_externas()
+        indice = estado.indices.get(data)
+        if indice is not None:
+            estado.indices.move_to_end(data)
+            return indice
+        geracao = estado.geracao
+
+    dia_semana_id = {ordem: id for id, nome, ordem in listar_dias_semana()}[data.isoweekday()]
+    indice = IndiceIntervalos(listar_tarefas_por_dia(dia_semana_id, data))
+
+    with _lock:
+        # Um commit durante a montagem pode ter ficado de fora: usa, mas não guarda
+        if estado.geracao == geracao:
+            estado.indices[data] = indice
+            while len(estado.indices) > MAXIMO_DIAS:
+                estado.indices.popitem(last=False)
+    return indice
+
+
+def _ao_confirmar(caminho, eventos):
+    """Aplica aos índices em memória as mudanças de um commit do escritor"""
+    with _lock:
+        estado = _estados.get(caminho)
+        if estado is None:
+            return
+        estado.geracao += 1
+
+        # data_version da conexão do escritor só muda com commits de outras
+        # conexões: se mudou desde o último lote, os índices podem estar velhos
+        gerenciador = obter_gerenciador(caminho)
+        conn = gerenciador.conexao()
+        versao_escritor = conn.execute('PRAGMA data_version').fetchone()[0]
+        anterior = estado.versao_escritor
+        if anterior is None or anterior[0]() is not gerenciador or anterior[1] != versao_escritor:
+            estado.indices.clear()
+        estado.versao_escritor = (weakref.ref(gerenciador), versao_escritor)
+        # O próprio commit mudou a versão vista pela sentinela
+        estado.versao = estado._versao_sentinela()
+
+        ids = {evento[1] for evento in eventos if evento[0] == 'tarefa'}
+        if any(evento[0] == 'recalcular' for evento in eventos):
+            estado.indices.clear()
+        if not (ids and estado.indices):
+            return
+
+        for indice in estado.indices.values():
+            for tarefa_id in ids:
+                indice.remover(tarefa_id)
+
+        # Mesmas colunas de listar_tarefas_por_data
+        marcadores = ', '.join('?' * len(ids))
+        for linha in conn.execute(f'''
+            SELECT t.id, t.dia_semana_id, t.titulo, t.descricao, t.horario, 
+                   t.prioridade, t.concluida, t.data_criacao, ds.nome as dia_nome, ds.ordem, t.data,
+                   t.duracao, t.recorrencia_dias
+            FROM tarefas t 
+            JOIN dias_semana ds ON t.dia_semana_id = ds.id 
+            WHERE t.id IN ({marcadores})
+        ''', list(ids)):
+            if linha[12] is not None:
+                # Uma série ocupa vários dias: remonta tudo sob demanda
+                estado.indices.clear()
+                return
+            tarefa = tarefa_de_linha(linha[:12])
+            indice = estado.indices.get(tarefa.data)
+            if indice is not None:
+                indice.inserir(tarefa)
+
+
+registrar_ao_confirmar(_ao_confirmar)
+
+# =============================================
+# CONSULTAS
+# =============================================
+
+def formatar_minutos(minutos):
+    """Minutos desde 00:00 -> 'HH:MM'"""
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+@medir
+def verificar_conflitos(data, horario, duracao=None, ignorar=None):
+    """Tarefas do dia `data` que se sobrepõem a `horario` ('HH:MM') por `duracao` minutos
+
+    `ignorar` é o id de uma tarefa que não conta (a que está sendo editada).
+    """
+    inicio = horario_em_minutos(horario)
+    if inicio is None:
+        return []
+
+    return indice_do_dia(data).conflitos(inicio, inicio + (duracao or DURACAO_PADRAO), ignorar)
+
+
+@medir
+def proximo_horario_livre(data, duracao=None, apos=None, inicio_dia=INICIO_DIA, fim_dia=FIM_DIA):
+    """Primeiro horário ('HH:MM') do dia `data` com `duracao` minutos livres, ou None
+
+    A busca começa em `apos` ('HH:MM'; o início do dia se não informado) e
+    termina em `fim_dia`.
+    """
+    inicio = max(inicio_dia, horario_em_minutos(apos) or 0)
+    minuto = indice_do_dia(data).proximo_livre(duracao or DURACAO_PADRAO, inicio, fim_dia)
+    return None if minuto is None else formatar_minutos(minuto)
@@ -0,0 +1,444 @@
+import threading
+
+from utils.conexao import banco_atual, obter_gerenciador
+
+def criar_tabelas_base(cursor):
+    """Cria as tabelas de dias da semana e tarefas"""
+    # Tabela de dias da semana - CORRIGIDA
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dias_semana (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT UNIQUE NOT NULL,
+            ordem INTEGER NOT NULL
+        )
+    ''')
+    
+    # Tabela de tarefas - CORRIGIDA para SQLite
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tarefas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dia_semana_id INTEGER NOT NULL,
+            titulo TEXT NOT NULL,
+            descricao TEXT,
+            horario TEXT,  -- Mudado para TEXT no SQLite
+            prioridade TEXT DEFAULT 'media',
+            concluida INTEGER DEFAULT 0,  -- INTEGER no lugar de BOOLEAN (0 = false, 1 = true)
+            data_criacao TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (dia_semana_id) REFERENCES dias_semana (id)
+        )
+    ''')
+    
+    # Inserir dias da semana padrão
+    inserir_dias_semana(cursor)
+
+def inserir_dias_semana(cursor):
+    """Insere os dias da semana na tabela"""
+    dias_semana = [
+        ('Segunda-feira', 1),
+        ('Terça-feira', 2),
+        ('Quarta-feira', 3),
+        ('Quinta-feira', 4),
+        ('Sexta-feira', 5),
+        ('Sábado', 6),
+        ('Domingo', 7)
+    ]
+    
+    cursor.executemany('''
+        INSERT OR IGNORE INTO dias_semana (nome, ordem) 
+        VALUES (?, ?)
+    ''', dias_semana)
+
+# Chave de ordenação das listagens: tarefas com horário primeiro, depois o
+# horário e por fim a prioridade (alta, media, baixa). O separador char(1)
+# é menor que qualquer caractere imprimível, então '09:00' < '09:00:30'.
+EXPR_CHAVE_ORDEM = '''
+    (CASE WHEN horario IS NULL THEN '1' ELSE '0' END)
+    || COALESCE(horario, '') || char(1)
+    || (CASE prioridade
+            WHEN 'alta' THEN 1
+            WHEN 'media' THEN 2
+            WHEN 'baixa' THEN 3
+            ELSE 4
+        END)
+'''
+
+def criar_chave_ordem(cursor):
+    """Cria a chave de ordenação mantida por triggers e os índices das listagens"""
+    cursor.execute('ALTER TABLE tarefas ADD COLUMN chave_ordem TEXT')
+    cursor.execute(f'UPDATE tarefas SET chave_ordem = {EXPR_CHAVE_ORDEM}')
+    
+    cursor.execute(f'''
+        CREATE TRIGGER tarefas_chave_ordem_insert AFTER INSERT ON tarefas
+        BEGIN
+            UPDATE tarefas SET chave_ordem = {EXPR_CHAVE_ORDEM} WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER tarefas_chave_ordem_update AFTER UPDATE OF horario, prioridade ON tarefas
+        BEGIN
+            UPDATE tarefas SET chave_ordem = {EXPR_CHAVE_ORDEM} WHERE id = NEW.id;
+        END
+    ''')
+    
+    # Linhas já saem ordenadas do índice, sem B-tree temporária; a ordem única
+    # dos dias permite que o JOIN de listar_todas_tarefas também seja ordenado
+    cursor.execute('CREATE INDEX idx_tarefas_dia_chave_ordem ON tarefas (dia_semana_id, chave_ordem)')
+    cursor.execute('CREATE UNIQUE INDEX idx_dias_semana_ordem ON dias_semana (ordem)')
+
+def criar_indice_busca(cursor):
+    """Cria o índice FTS5 de título e descrição, sincronizado por triggers"""
+    # remove_diacritics 2: "reuniao" encontra "Reunião"; unicode61 já ignora caixa
+    cursor.execute('''
+        CREATE VIRTUAL TABLE tarefas_busca USING fts5(
+            titulo, descricao,
+            content='tarefas', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TRIGGER tarefas_busca_insert AFTER INSERT ON tarefas
+        BEGIN
+            INSERT INTO tarefas_busca (rowid, titulo, descricao)
+            VALUES (NEW.id, NEW.titulo, NEW.descricao);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER tarefas_busca_delete AFTER DELETE ON tarefas
+        BEGIN
+            INSERT INTO tarefas_busca (tarefas_busca, rowid, titulo, descricao)
+            VALUES ('delete', OLD.id, OLD.titulo, OLD.descricao);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER tarefas_busca_update AFTER UPDATE OF titulo, descricao ON tarefas
+        BEGIN
+            INSERT INTO tarefas_busca (tarefas_busca, rowid, titulo, descricao)
+            VALUES ('delete', OLD.id, OLD.titulo, OLD.descricao);
+            INSERT INTO tarefas_busca (rowid, titulo, descricao)
+            VALUES (NEW.id, NEW.titulo, NEW.descricao);
+        END
+    ''')
+    
+    # Backfill das tarefas que já existiam no banco
+    cursor.execute("INSERT INTO tarefas_busca (tarefas_busca) VALUES ('rebuild')")
+
+def criar_indice_estatisticas(cursor):
+    """Índice que cobre a agregação de contar_estatisticas"""
+    cursor.execute('''
+        CREATE INDEX idx_tarefas_estatisticas
+        ON tarefas (dia_semana_id, prioridade, concluida)
+    ''')
+
+def criar_recorrencia(cursor):
+    """Regras de recorrência nas tarefas e conclusões por ocorrência"""
+    # recorrencia_dias: ids de dias_semana separados por vírgula ('1,2,3,4,5');
+    # NULL = tarefa comum. Fim opcional por data (recorrencia_ate) ou contagem.
+    cursor.execute('ALTER TABLE tarefas ADD COLUMN recorrencia_dias TEXT')
+    cursor.execute('ALTER TABLE tarefas ADD COLUMN recorrencia_ate TEXT')
+    cursor.execute('ALTER TABLE tarefas ADD COLUMN recorrencia_vezes INTEGER')
+    
+    # Índice parcial: só as tarefas recorrentes, já na ordem das listagens
+    cursor.execute('''
+        CREATE INDEX idx_tarefas_recorrentes ON tarefas (chave_ordem)
+        WHERE recorrencia_dias IS NOT NULL
+    ''')
+    
+    # Esparsa: só as ocorrências marcadas como concluídas têm linha
+    cursor.execute('''
+        CREATE TABLE ocorrencias (
+            tarefa_id INTEGER NOT NULL REFERENCES tarefas (id) ON DELETE CASCADE,
+            data TEXT NOT NULL,
+            concluida INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (tarefa_id, data)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_ocorrencias_data ON ocorrencias (data)')
+
+# Data (AAAA-MM-DD) do dia `dia` (id de dias_semana) na semana de `referencia`:
+# volta à segunda-feira dessa semana e avança (ordem - 1) dias
+def expr_data_na_semana(referencia, dia):
+    return f'''date({referencia}, '-6 days', 'weekday 1',
+                 '+' || ((SELECT ordem FROM dias_semana WHERE id = {dia}) - 1) || ' days')'''
+
+def criar_datas(cursor):
+    """Data de calendário das tarefas, índice por intervalo e triggers de consistência"""
+    cursor.execute('ALTER TABLE tarefas ADD COLUMN data TEXT')
+    
+    # Tarefas existentes: o dia da semana delas na semana atual. Antes das datas a
+    # agenda mostrava toda tarefa em qualquer semana; na semana da criação, as
+    # antigas sumiriam da visão semanal, que abre na semana atual
+    cursor.execute(f'''
+        UPDATE tarefas SET data = {expr_data_na_semana("'now', 'localtime'", "dia_semana_id")}
+    ''')
+    
+    # Inserções sem data (formulários antigos, lotes, importações) recebem a data
+    # do dia escolhido na semana da criação. data_criacao é gravada em UTC; a
+    # semana é a local, a mesma de inicio_da_semana() no Python
+    cursor.execute(f'''
+        CREATE TRIGGER tarefas_data_insert AFTER INSERT ON tarefas
+        WHEN NEW.data IS NULL
+        BEGIN
+            UPDATE tarefas
+            SET data = {expr_data_na_semana("COALESCE(NEW.data_criacao, 'now'), 'localtime'", "NEW.dia_semana_id")}
+            WHERE id = NEW.id;
+        END
+    ''')
+    # Trocar o dia da semana move a tarefa dentro da mesma semana
+    cursor.execute(f'''
+        CREATE TRIGGER tarefas_data_update AFTER UPDATE OF dia_semana_id ON tarefas
+        WHEN NEW.data IS NOT NULL
+        BEGIN
+            UPDATE tarefas SET data = {expr_data_na_semana("NEW.data", "NEW.dia_semana_id")}
+            WHERE id = NEW.id;
+        END
+    ''')
+    
+    # Intervalos de datas saem do índice já na ordem das listagens, sem B-tree
+    # temporária, e o custo depende do tamanho do intervalo, não do histórico
+    cursor.execute('CREATE INDEX idx_tarefas_data_chave_ordem ON tarefas (data, chave_ordem)')
+
+def criar_concluida_em(cursor):
+    """Momento da conclusão, usado para arquivar as tarefas concluídas há muito tempo"""
+    cursor.execute('ALTER TABLE tarefas ADD COLUMN concluida_em TEXT')
+    
+    # Sem histórico de quando foram concluídas: a criação é a melhor estimativa
+    cursor.execute('UPDATE tarefas SET concluida_em = data_criacao WHERE concluida = 1')
+    
+    cursor.execute('''
+        CREATE TRIGGER tarefas_concluida_em_insert AFTER INSERT ON tarefas
+        WHEN NEW.concluida = 1 AND NEW.concluida_em IS NULL
+        BEGIN
+            UPDATE tarefas SET concluida_em = COALESCE(NEW.data_criacao, CURRENT_TIMESTAMP)
+            WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER tarefas_concluida_em_update AFTER UPDATE OF concluida ON tarefas
+        WHEN NEW.concluida IS NOT OLD.concluida
+        BEGIN
+            UPDATE tarefas
+            SET concluida_em = CASE WHEN NEW.concluida = 1 THEN CURRENT_TIMESTAMP END
+            WHERE id = NEW.id;
+        END
+    ''')
+    
+    # Índice parcial: só as concluídas, na ordem em que ficam elegíveis ao arquivo
+    cursor.execute('''
+        CREATE INDEX idx_tarefas_concluida_em ON tarefas (concluida_em)
+        WHERE concluida = 1
+    ''')
+
+def criar_duracao(cursor):
+    """Duração das tarefas em minutos (NULL = duração padrão), para detectar conflitos"""
+    cursor.execute('ALTER TABLE tarefas ADD COLUMN duracao INTEGER')
+
+# Registro de alterações: quantas linhas manter e a cada quantas limpar
+HISTORICO_ALTERACOES = 10000
+LIMPEZA_ALTERACOES = 1000
+
+# Data afetada por uma linha de tarefas; NULL nas recorrentes (todos os dias)
+def expr_data_alterada(linha):
+    return f"CASE WHEN {linha}.recorrencia_dias IS NULL THEN {linha}.data END"
+
+def criar_alteracoes(cursor):
+    """Registro de alterações por tarefa e data, lido pelas sessões abertas (utils/alteracoes.py)"""
+    # AUTOINCREMENT: seq nunca é reutilizado, mesmo depois da limpeza
+    cursor.execute('''
+        CREATE TABLE alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tarefa_id INTEGER NOT NULL,
+            data TEXT
+        )
+    ''')
+    
+    # Sem data ainda (o trigger de datas a preenche em seguida e o UPDATE é registrado)
+    cursor.execute(f'''
+        CREATE TRIGGER alteracoes_tarefas_insert AFTER INSERT ON tarefas
+        WHEN NEW.data IS NOT NULL OR NEW.recorrencia_dias IS NOT NULL
+        BEGIN
+            INSERT INTO alteracoes (tarefa_id, data) VALUES (NEW.id, {expr_data_alterada('NEW')});
+        END
+    ''')
+    # Só as colunas exibidas: chave_ordem e concluida_em são mantidas por triggers
+    cursor.execute(f'''
+        CREATE TRIGGER alteracoes_tarefas_update AFTER UPDATE OF
+            dia_semana_id, titulo, descricao, horario, prioridade, concluida, data, duracao,
+            recorrencia_dias, recorrencia_ate, recorrencia_vezes
+        ON tarefas
+        BEGIN
+            INSERT INTO alteracoes (tarefa_id, data) VALUES (NEW.id, {expr_data_alterada('NEW')});
+            -- Mudou de dia: o dia antigo também precisa ser atualizado
+            INSERT INTO alteracoes (tarefa_id, data)
+            SELECT OLD.id, {expr_data_alterada('OLD')}
+            WHERE (OLD.data IS NOT NEW.data OR OLD.recorrencia_dias IS NOT NEW.recorrencia_dias)
+              AND (OLD.data IS NOT NULL OR OLD.recorrencia_dias IS NOT NULL);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER alteracoes_tarefas_delete AFTER DELETE ON tarefas
+        BEGIN
+            INSERT INTO alteracoes (tarefa_id, data) VALUES (OLD.id, {expr_data_alterada('OLD')});
+        END
+    ''')
+    
+    for evento, linha in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        cursor.execute(f'''
+            CREATE TRIGGER alteracoes_ocorrencias_{evento.lower()} AFTER {evento} ON ocorrencias
+            BEGIN
+                INSERT INTO alteracoes (tarefa_id, data) VALUES ({linha}.tarefa_id, {linha}.data);
+            END
+        ''')
+    
+    # Limpeza amortizada: a cada LIMPEZA_ALTERACOES registros, apaga os antigos
+    # pela chave primária; sessões mais atrasadas que isso recarregam tudo
+    cursor.execute(f'''
+        CREATE TRIGGER alteracoes_limpeza AFTER INSERT ON alteracoes
+        WHEN NEW.seq % {LIMPEZA_ALTERACOES} = 0
+        BEGIN
+            DELETE FROM alteracoes WHERE seq <= NEW.seq - {HISTORICO_ALTERACOES};
+        END
+    ''')
+
+# Soma `quantidade` em uma coluna de resumo_diario, criando a linha do dia se preciso
+def sql_somar_resumo(coluna, momento, prioridade, quantidade):
+    return (f"INSERT INTO resumo_diario (dia, prioridade, {coluna}) "
+            f"VALUES (date({momento}), {prioridade}, {quantidade}) "
+            f"ON CONFLICT (dia, prioridade) DO UPDATE SET {coluna} = {coluna} + {quantidade};")
+
+def criar_resumo_diario(cursor):
+    """Totais diários de tarefas criadas e concluídas por prioridade, mantidos por triggers"""
+    # Contagens de eventos, não do estado atual: exclusões e arquivamento não apagam
+    # o histórico; uma conclusão desfeita sai do dia em que tinha sido contada
+    cursor.execute('''
+        CREATE TABLE resumo_diario (
+            dia TEXT NOT NULL,
+            prioridade TEXT NOT NULL,
+            criadas INTEGER NOT NULL DEFAULT 0,
+            concluidas INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, prioridade)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Histórico das tarefas ainda em main (as já arquivadas ficam de fora)
+    cursor.execute('''
+        INSERT INTO resumo_diario (dia, prioridade, criadas)
+        SELECT date(data_criacao), prioridade, COUNT(*) FROM tarefas
+        WHERE data_criacao IS NOT NULL
+        GROUP BY 1, 2
+    ''')
+    cursor.execute('''
+        INSERT INTO resumo_diario (dia, prioridade, concluidas)
+        SELECT date(concluida_em), prioridade, COUNT(*) FROM tarefas
+        WHERE concluida = 1 AND concluida_em IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT (dia, prioridade) DO UPDATE SET concluidas = excluded.concluidas
+    ''')
+    
+    cursor.execute(f'''
+        CREATE TRIGGER resumo_diario_insert AFTER INSERT ON tarefas
+        BEGIN
+            {sql_somar_resumo('criadas', 'COALESCE(NEW.data_criacao, CURRENT_TIMESTAMP)', 'NEW.prioridade', 1)}
+        END
+    ''')
+    # concluida_em é preenchida e limpa pelos triggers de criar_concluida_em
+    cursor.execute(f'''
+        CREATE TRIGGER resumo_diario_conclusao AFTER UPDATE OF concluida_em ON tarefas
+        WHEN NEW.concluida_em IS NOT NULL AND OLD.concluida_em IS NOT NEW.concluida_em
+        BEGIN
+            {sql_somar_resumo('concluidas', 'NEW.concluida_em', 'NEW.prioridade', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER resumo_diario_reabertura AFTER UPDATE OF concluida_em ON tarefas
+        WHEN OLD.concluida_em IS NOT NULL AND OLD.concluida_em IS NOT NEW.concluida_em
+        BEGIN
+            {sql_somar_resumo('concluidas', 'OLD.concluida_em', 'OLD.prioridade', -1)}
+        END
+    ''')
+    # Mudou a prioridade: a criação (e a conclusão) passam para a nova
+    cursor.execute(f'''
+        CREATE TRIGGER resumo_diario_prioridade AFTER UPDATE OF prioridade ON tarefas
+        WHEN OLD.prioridade IS NOT NEW.prioridade AND OLD.data_criacao IS NOT NULL
+        BEGIN
+            {sql_somar_resumo('criadas', 'OLD.data_criacao', 'OLD.prioridade', -1)}
+            {sql_somar_resumo('criadas', 'OLD.data_criacao', 'NEW.prioridade', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER resumo_diario_prioridade_concluida AFTER UPDATE OF prioridade ON tarefas
+        WHEN OLD.prioridade IS NOT NEW.prioridade AND OLD.concluida_em IS NOT NULL
+        BEGIN
+            {sql_somar_resumo('concluidas', 'OLD.concluida_em', 'OLD.prioridade', -1)}
+            {sql_somar_resumo('concluidas', 'OLD.concluida_em', 'NEW.prioridade', 1)}
+        END
+    ''')
+    
+    # Tarefas recentes: as últimas criadas saem do fim do índice, sem ordenar a tabela
+    cursor.execute('CREATE INDEX idx_tarefas_data_criacao ON tarefas (data_criacao)')
+
+# Migrações numeradas e somente para frente: (versão, descrição, função).
+# A versão aplicada fica gravada em PRAGMA user_version; nunca altere uma
+# migração já publicada, acrescente uma nova no fim da lista.
+MIGRACOES = [
+    (1, 'Tabelas dias_semana e tarefas (layout de agenda.db)', criar_tabelas_base),
+    # 2 removida antes de publicada: criava em todo banco de tarefas a tabela
+    # usuarios de banco_agenda.db, que nenhum código usa
+    (3, 'Chave de ordenação e índices das listagens', criar_chave_ordem),
+    (4, 'Índice de busca textual FTS5', criar_indice_busca),
+    (5, 'Índice de cobertura das estatísticas', criar_indice_estatisticas),
+    (6, 'Tarefas recorrentes e conclusões por ocorrência', criar_recorrencia),
+    (7, 'Datas de calendário das tarefas', criar_datas),
+    (8, 'Momento da conclusão das tarefas (arquivamento)', criar_concluida_em),
+    (9, 'Duração das tarefas (conflitos de horário)', criar_duracao),
+    (10, 'Registro de alterações para atualização ao vivo', criar_alteracoes),
+    (11, 'Resumo diário de criadas e concluídas; índice de recentes', criar_resumo_diario),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+_bancos_migrados = set()
+_lock = threading.Lock()
+
+def versao_esquema(conn):
+    """Retorna a versão do esquema gravada no banco"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrar(conn):
+    """Aplica, em ordem, as migrações que ainda não rodaram neste banco"""
+    aplicadas = []
+    for versao, descricao, migracao in MIGRACOES:
+        if versao <= versao_esquema(conn):
+            continue
+        
+        # Cada migração roda em sua própria transação; leitores no modo WAL
+        # continuam atendidos enquanto ela é aplicada
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Outro processo pode ter aplicado a migração enquanto esperávamos o lock
+            if versao > versao_esquema(conn):
+                migracao(conn.cursor())
+                conn.execute(f'PRAGMA user_version = {versao}')
+                aplicadas.append((versao, descricao))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    
+    return aplicadas
+
+def garantir_esquema(caminho=None):
+    """Migra o banco uma única vez por processo, apenas se estiver desatualizado"""
+    caminho = caminho or banco_atual()
+    if caminho in _bancos_migrados:
+        return
+    
+    with _lock:
+        if caminho in _bancos_migrados:
+            return
+        
+        conn = obter_gerenciador(caminho).conexao()
+        if versao_esquema(conn) < VERSAO_ATUAL:
+            migrar(conn)
+        _bancos_migrados.add(caminho)
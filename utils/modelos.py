@@ -0,0 +1,58 @@
+import datetime
+from collections import namedtuple
+
+# Registro imutável e compacto (namedtuple usa __slots__ vazio) de uma tarefa.
+# horario_minutos e criada_em são calculados uma única vez, na leitura do banco.
+# data_ocorrencia só é preenchida nas ocorrências de tarefas recorrentes;
+# data (datetime.date) e duracao (minutos; None = padrão) só nas consultas por
+# data de calendário.
+Tarefa = namedtuple('Tarefa', [
+    'id', 'dia_semana_id', 'titulo', 'descricao', 'horario', 'prioridade',
+    'concluida', 'data_criacao', 'dia_nome', 'dia_ordem',
+    'horario_minutos', 'criada_em', 'data_ocorrencia', 'data', 'duracao'
+], defaults=(None, None, None))
+
+def horario_em_minutos(horario):
+    """Converte 'HH:MM' em minutos desde a meia-noite (None se vazio ou inválido)"""
+    if not horario:
+        return None
+    try:
+        horas, minutos = horario.split(':')
+        return int(horas) * 60 + int(minutos)
+    except ValueError:
+        return None
+
+def converter_data_criacao(data_criacao):
+    """Converte o texto de data_criacao do SQLite em datetime (None se inválido)"""
+    if not data_criacao:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(data_criacao)
+    except (TypeError, ValueError):
+        return None
+
+def converter_data(data):
+    """Converte o texto 'AAAA-MM-DD' da coluna data em date (None se inválido)"""
+    if not data:
+        return None
+    try:
+        return datetime.date.fromisoformat(data)
+    except (TypeError, ValueError):
+        return None
+
+def tarefa_de_linha(linha):
+    """Monta uma Tarefa a partir das colunas padrão das consultas do DAO
+
+    A linha tem 9 colunas (id ... dia_nome), 10, com a ordem do dia no fim,
+    11, com a data de calendário depois da ordem, ou 12, com a duração.
+    """
+    dia_ordem = linha[9] if len(linha) > 9 else None
+    data = converter_data(linha[10]) if len(linha) > 10 else None
+    duracao = linha[11] if len(linha) > 11 else None
+    return Tarefa(*linha[:9], dia_ordem,
+                  horario_em_minutos(linha[4]), converter_data_criacao(linha[7]), None, data,
+                  duracao)
+
+def fabrica_tarefa(cursor, linha):
+    """row_factory do sqlite3 que produz registros Tarefa"""
+    return tarefa_de_linha(linha)
@@ -0,0 +1,96 @@
+"""Atualização otimista: o clique muda a tela antes de o escritor gravar
+
+As funções recebem o estado da sessão (st.session_state ou um dict comum) e
+não dependem do Streamlit. Entradas do estado:
+
+- 'otimistas': chave -> {'acao', 'futuro', 'gravada'}, as sobreposições da tela;
+- 'pendentes': gravações ainda não conferidas, com o delta que aplicaram ao resumo;
+- 'resumo': contadores da sidebar ({'banco', 'seq', 'total', 'concluidas'}) ou None.
+
+A chave de uma tarefa é (banco, id) ou (banco, "id_data") para uma ocorrência.
+"""
+
+
+def registrar(estado, chave, acao, futuro, delta):
+    """Guarda o clique como sobreposição e ajusta o resumo na hora
+
+    `delta` é (total, concluidas) a somar ao resumo, ou None quando o efeito
+    não é conhecido antes da gravação (o resumo é relido depois).
+    """
+    estado.setdefault('otimistas', {})[chave] = {'acao': acao, 'futuro': futuro, 'gravada': False}
+    estado.setdefault('pendentes', []).append({'futuro': futuro, 'chave': chave, 'delta': delta})
+    resumo = estado.get('resumo')
+    if resumo is not None and resumo['banco'] == chave[0] and delta is not None:
+        resumo['total'] += delta[0]
+        resumo['concluidas'] += delta[1]
+
+
+def reconciliar(estado, rerun_completo=False):
+    """Confere as gravações terminadas e devolve os erros das que falharam
+
+    Uma gravação que falhou perde a sobreposição (a tela volta ao banco) e o
+    resumo é descartado. Só num rerun completo (listas relidas do banco) as já
+    gravadas deixam de ser sobrepostas: os reruns de fragmento ainda exibem as
+    tarefas lidas no último completo.
+    """
+    otimistas = estado.setdefault('otimistas', {})
+    restantes = []
+    erros = []
+    for pendente in estado.get('pendentes', []):
+        futuro, chave = pendente['futuro'], pendente['chave']
+        if not futuro.done():
+            restantes.append(pendente)
+            continue
+
+        entrada = otimistas.get(chave)
+        # Um clique mais novo na mesma tarefa substitui a entrada
+        propria = entrada is not None and entrada['futuro'] is futuro
+        resumo = estado.get('resumo')
+        erro = futuro.exception()
+        if erro is not None:
+            if propria:
+                del otimistas[chave]
+            estado['resumo'] = None
+            erros.append(erro)
+            continue
+
+        antes, depois = futuro.result()
+        if (resumo is not None and pendente['delta'] is not None and resumo['banco'] == chave[0]
+                and resumo['seq'] == antes < depois):
+            # Nenhuma outra alteração no meio: os contadores ajustados já estão certos
+            resumo['seq'] = depois
+        else:
+            estado['resumo'] = None
+        if propria:
+            entrada['gravada'] = True
+    estado['pendentes'] = restantes
+
+    if rerun_completo:
+        for chave in [chave for chave, entrada in otimistas.items() if entrada['gravada']]:
+            del otimistas[chave]
+    return erros
+
+
+def somar_pendentes(estado, resumo):
+    """Soma ao resumo recém-lido os cliques do mesmo banco ainda não gravados"""
+    for pendente in estado.get('pendentes', []):
+        if pendente['chave'][0] == resumo['banco'] and pendente['delta'] and not pendente['futuro'].done():
+            resumo['total'] += pendente['delta'][0]
+            resumo['concluidas'] += pendente['delta'][1]
+    return resumo
+
+
+def sobrepor(estado, tarefa, chave, chave_serie):
+    """A tarefa com a sobreposição desta sessão (None se foi excluída)
+
+    `chave_serie` é a chave da tarefa inteira: excluir uma ocorrência leva a série.
+    """
+    otimistas = estado.get('otimistas')
+    if not otimistas:
+        return tarefa
+    if otimistas.get(chave_serie, {}).get('acao') == 'excluir':
+        return None
+    entrada = otimistas.get(chave)
+    if entrada is None:
+        return tarefa
+    return tarefa._replace(concluida=entrada['acao'] == 'concluir')
@@ -0,0 +1,64 @@
+import datetime
+
+# Mesma ordem de EXPR_CHAVE_ORDEM (utils/migracoes.py)
+ORDEM_PRIORIDADES = {'alta': '1', 'media': '2', 'baixa': '3'}
+
+def inicio_da_semana(data=None):
+    """Segunda-feira da semana de `data` (hoje, se não informada)"""
+    data = data or datetime.date.today()
+    if isinstance(data, datetime.datetime):
+        data = data.date()
+    return data - datetime.timedelta(days=data.weekday())
+
+def chave_ordem(tarefa):
+    """Chave de ordenação das listagens calculada em Python (igual à coluna chave_ordem)"""
+    return (('1' if tarefa.horario is None else '0') + (tarefa.horario or '') + '\x01'
+            + ORDEM_PRIORIDADES.get(tarefa.prioridade, '4'))
+
+def ler_dias(recorrencia_dias):
+    """'1,3,5' -> {1, 3, 5}"""
+    return {int(dia) for dia in recorrencia_dias.split(',') if dia.strip()}
+
+def ocorrencias_antes(inicio, data, ordens):
+    """Quantas datas entre `inicio` (inclusive) e `data` (exclusive) caem nos dias `ordens`
+
+    Calculado em O(1) pelas semanas completas, sem percorrer a série.
+    """
+    semanas, resto = divmod((data - inicio).days, 7)
+    dia_inicial = inicio.isoweekday()
+    parcial = sum(1 for k in range(resto) if (dia_inicial - 1 + k) % 7 + 1 in ordens)
+    return semanas * len(ordens) + parcial
+
+def gerar_ocorrencias(regras, inicio, dias, concluidas):
+    """Gera, sob demanda, as ocorrências da semana que começa em `inicio`
+
+    regras: (Tarefa, recorrencia_dias, recorrencia_ate, recorrencia_vezes) já na
+    ordem de chave_ordem; dias: {dia_id: (nome, ordem)}; concluidas:
+    {(tarefa_id, 'AAAA-MM-DD'): concluida}. As ocorrências saem por dia e, dentro
+    do dia, na ordem das regras.
+    """
+    series = []
+    for tarefa, recorrencia_dias, recorrencia_ate, recorrencia_vezes in regras:
+        ids = ler_dias(recorrencia_dias)
+        ordens = {dias[dia_id][1] for dia_id in ids if dia_id in dias}
+        # A série começa na data da tarefa (ou, sem ela, no dia da criação)
+        primeira = tarefa.data or (tarefa.criada_em.date() if tarefa.criada_em else None)
+        ate = datetime.date.fromisoformat(recorrencia_ate) if recorrencia_ate else None
+        series.append((tarefa, ids, ordens, primeira, ate, recorrencia_vezes))
+
+    for dia_id, (nome, ordem) in sorted(dias.items(), key=lambda item: item[1][1]):
+        data = inicio + datetime.timedelta(days=ordem - 1)
+        texto = data.isoformat()
+        for tarefa, ids, ordens, primeira, ate, vezes in series:
+            if dia_id not in ids:
+                continue
+            if primeira and data < primeira:
+                continue
+            if ate and data > ate:
+                continue
+            if vezes is not None and primeira and ocorrencias_antes(primeira, data, ordens) >= vezes:
+                continue
+            yield tarefa._replace(
+                dia_semana_id=dia_id, dia_nome=nome, dia_ordem=ordem,
+                concluida=concluidas.get((tarefa.id, texto), 0), data_ocorrencia=data, data=data
+            )
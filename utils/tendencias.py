@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+# Períodos das tendências: rótulo -> regra de reamostragem do pandas
+PERIODOS = {'Semanas': 'W-MON', 'Meses': 'MS'}
+
+# Períodos na média móvel e no ajuste da reta de tendência
+JANELA_MEDIA = 4
+
+
+def serie_diaria(linhas):
+    """DataFrame diário (índice contínuo, dias sem eventos = 0) a partir de listar_resumo_diario
+
+    Colunas: criadas, concluidas e as mesmas por prioridade (criadas_alta, ...).
+    """
+    resumo = pd.DataFrame(linhas, columns=['dia', 'prioridade', 'criadas', 'concluidas'])
+    if resumo.empty:
+        return pd.DataFrame(columns=['criadas', 'concluidas'], dtype='int64')
+    resumo['dia'] = pd.to_datetime(resumo['dia'])
+
+    por_prioridade = resumo.pivot_table(index='dia', columns='prioridade',
+                                        values=['criadas', 'concluidas'], aggfunc='sum', fill_value=0)
+    por_prioridade.columns = [f"{medida}_{prioridade}" for medida, prioridade in por_prioridade.columns]
+    diaria = resumo.groupby('dia')[['criadas', 'concluidas']].sum().join(por_prioridade)
+
+    dias = pd.date_range(diaria.index.min(), diaria.index.max(), freq='D')
+    return diaria.reindex(dias, fill_value=0)
+
+
+def tendencias(diaria, regra='W-MON'):
+    """Totais por período com taxa de conclusão, média móvel e saldo acumulado
+
+    `regra` é a frequência do pandas ('W-MON' = semanas de segunda a domingo,
+    rotuladas pela segunda-feira; 'MS' = meses).
+    """
+    periodo = diaria.resample(regra, label='left', closed='left').sum()
+    criadas = periodo['criadas'].to_numpy(dtype=float)
+    concluidas = periodo['concluidas'].to_numpy(dtype=float)
+
+    # Sem tarefas criadas no período a taxa fica indefinida (NaN), não infinita
+    periodo['taxa_conclusao'] = np.divide(concluidas, criadas, out=np.full_like(criadas, np.nan),
+                                          where=criadas > 0) * 100
+    periodo['media_concluidas'] = periodo['concluidas'].rolling(JANELA_MEDIA, min_periods=1).mean()
+    # Pendências acumuladas: criadas menos concluídas desde o primeiro período
+    periodo['saldo'] = np.cumsum(criadas - concluidas)
+    return periodo
+
+
+def inclinacao(valores, janela=JANELA_MEDIA):
+    """Variação por período da reta ajustada (mínimos quadrados) aos últimos `janela` valores"""
+    ultimos = np.asarray(valores, dtype=float)[-janela:]
+    if len(ultimos) < 2:
+        return 0.0
+    return float(np.polyfit(np.arange(len(ultimos)), ultimos, 1)[0])
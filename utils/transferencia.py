@@ -0,0 +1,306 @@
+import argparse
+import csv
+import datetime
+import json
+import sys
+from contextlib import nullcontext
+from itertools import islice
+
+from utils.conexao import obter_conexao
+from utils.database import criar_tabelas, data_na_semana, listar_dias_semana
+from utils.escritor import executar_escrita, publicar
+
+CAMPOS = ('id', 'dia_semana_id', 'dia_nome', 'titulo', 'descricao', 'horario',
+          'prioridade', 'concluida', 'data_criacao', 'data', 'duracao',
+          'recorrencia_dias', 'recorrencia_ate', 'recorrencia_vezes')
+
+PRIORIDADES_VALIDAS = ('baixa', 'media', 'alta')
+
+TAMANHO_LOTE_EXPORTACAO = 1000
+TAMANHO_LOTE_IMPORTACAO = 5000
+
+# Quantos erros de validação guardar no relatório da importação
+MAXIMO_ERROS = 100
+
+# =============================================
+# EXPORTAÇÃO
+# =============================================
+
+def iterar_tarefas(tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+    """Percorre todas as tarefas em lotes com fetchmany, sem carregar a tabela inteira"""
+    cursor = obter_conexao().execute('''
+        SELECT t.id, t.dia_semana_id, ds.nome, t.titulo, t.descricao, t.horario,
+               t.prioridade, t.concluida, t.data_criacao, t.data, t.duracao,
+               t.recorrencia_dias, t.recorrencia_ate, t.recorrencia_vezes
+        FROM tarefas t
+        JOIN dias_semana ds ON t.dia_semana_id = ds.id
+        ORDER BY t.id
+    ''')
+
+    while True:
+        linhas = cursor.fetchmany(tamanho_lote)
+        if not linhas:
+            break
+        for linha in linhas:
+            yield dict(zip(CAMPOS, linha))
+
+def exportar_csv(arquivo, tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+    """Escreve as tarefas em CSV no arquivo de texto informado; retorna o total"""
+    escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS)
+    escritor.writeheader()
+
+    total = 0
+    for tarefa in iterar_tarefas(tamanho_lote):
+        escritor.writerow(tarefa)
+        total += 1
+    return total
+
+def exportar_json(arquivo, tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+    """Escreve as tarefas em JSON Lines (um objeto por linha); retorna o total"""
+    total = 0
+    for tarefa in iterar_tarefas(tamanho_lote):
+        arquivo.write(json.dumps(tarefa, ensure_ascii=False))
+        arquivo.write('\n')
+        total += 1
+    return total
+
+# =============================================
+# IMPORTAÇÃO
+# =============================================
+
+def _texto(valor, descricao):
+    """Texto do registro sem espaços nas pontas (None se vazio) ou ValueError
+
+    Números viram texto (um título 5 no JSON); listas, objetos e booleanos não.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, float)):
+        raise ValueError(f"{descricao} inválido: {valor!r}")
+    return str(valor).strip() or None
+
+def _inteiro_positivo(valor, descricao):
+    """Inteiro > 0 a partir do valor importado (None se vazio) ou ValueError"""
+    if valor in (None, ''):
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    numero = 0
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        numero = valor
+    elif isinstance(valor, str) and valor.strip().isdigit():
+        numero = int(valor)
+    if numero <= 0:
+        raise ValueError(f"{descricao} inválida: {valor!r}")
+    return numero
+
+def _validar_recorrencia(registro, dias_validos):
+    """(recorrencia_dias, recorrencia_ate, recorrencia_vezes) do registro ou ValueError"""
+    dias = registro.get('recorrencia_dias')
+    if dias in (None, '', []):
+        return None, None, None
+
+    # '1,3,5' no CSV (como exportado) ou [1, 3, 5] no JSON
+    partes = dias.split(',') if isinstance(dias, str) else dias if isinstance(dias, list) else []
+    try:
+        ids = {_inteiro_positivo(dia, "dia") for dia in partes if str(dia).strip()}
+    except ValueError:
+        ids = set()
+    if not ids or not ids <= dias_validos:
+        raise ValueError(f"dias de recorrência inválidos: {dias!r} (ids de dias_semana)")
+
+    ate = _texto(registro.get('recorrencia_ate'), "fim da recorrência")
+    if ate is not None:
+        try:
+            ate = datetime.date.fromisoformat(ate).isoformat()
+        except (TypeError, ValueError):
+            raise ValueError(f"fim da recorrência inválido: {ate!r} (use AAAA-MM-DD)")
+
+    vezes = _inteiro_positivo(registro.get('recorrencia_vezes'), "quantidade de ocorrências")
+    return ','.join(str(dia) for dia in sorted(ids)), ate, vezes
+
+def validar_tarefa(registro, dias_por_nome, dias_por_ordem=None):
+    """Converte um registro importado na tupla do INSERT ou lança ValueError
+
+    Só lança ValueError, qualquer que seja o conteúdo: um registro malformado é
+    rejeitado pela posição, sem interromper a importação.
+    """
+    if isinstance(registro, ValueError):
+        raise registro  # linha que o leitor não conseguiu decodificar
+    if not isinstance(registro, dict):
+        raise ValueError(f"o registro deve ser um objeto, não {type(registro).__name__}")
+
+    titulo = _texto(registro.get('titulo'), "título")
+    if not titulo:
+        raise ValueError("título é obrigatório")
+
+    # Data opcional (AAAA-MM-DD); sem ela, a tarefa vai para a semana da criação
+    # (a atual, se o registro não traz data_criacao)
+    data = _texto(registro.get('data'), "data")
+    if data is not None:
+        try:
+            data = datetime.date.fromisoformat(data)
+        except (TypeError, ValueError):
+            raise ValueError(f"data inválida: {data!r} (use AAAA-MM-DD)")
+
+    # O dia pode vir pela data, pelo id ou pelo nome
+    dia_semana_id = registro.get('dia_semana_id')
+    if data is not None and dias_por_ordem:
+        dia_semana_id = dias_por_ordem[data.isoweekday()]
+    elif dia_semana_id in (None, ''):
+        dia_semana_id = dias_por_nome.get(_texto(registro.get('dia_nome'), "dia"))
+    try:
+        dia_semana_id = _inteiro_positivo(dia_semana_id, "dia")
+    except ValueError:
+        raise ValueError(f"dia inválido: {registro.get('dia_semana_id') or registro.get('dia_nome')!r}")
+    if dia_semana_id not in dias_por_nome.values():
+        raise ValueError(f"dia inválido: {dia_semana_id!r}")
+
+    data_criacao = _texto(registro.get('data_criacao'), "data de criação")
+    if data_criacao is not None:
+        try:
+            datetime.datetime.fromisoformat(data_criacao)
+        except ValueError:
+            raise ValueError(f"data de criação inválida: {data_criacao!r}")
+    if data is None and data_criacao is None:
+        data = data_na_semana(dia_semana_id)
+
+    horario = _texto(registro.get('horario'), "horário")
+    if horario is not None:
+        try:
+            datetime.datetime.strptime(horario, '%H:%M')
+        except (TypeError, ValueError):
+            raise ValueError(f"horário inválido: {horario!r} (use HH:MM)")
+
+    prioridade = _texto(registro.get('prioridade'), "prioridade") or 'media'
+    if prioridade not in PRIORIDADES_VALIDAS:
+        raise ValueError(f"prioridade inválida: {prioridade!r}")
+
+    concluida = registro.get('concluida')
+    concluida = 1 if str(concluida).strip().lower() in ('1', 'true', 'sim') else 0
+
+    duracao = _inteiro_positivo(registro.get('duracao'), "duração (minutos)")
+    recorrencia = _validar_recorrencia(registro, set(dias_por_nome.values()))
+
+    return (dia_semana_id, titulo, _texto(registro.get('descricao'), "descrição"), horario,
+            prioridade, concluida, data_criacao,
+            data.isoformat() if data else None, duracao, *recorrencia)
+
+def _em_lotes(iteravel, tamanho):
+    """Agrupa um iterável em listas de até `tamanho` itens"""
+    iterador = iter(iteravel)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+def _inserir_lote(conn, lote):
+    conn.executemany('''
+        INSERT INTO tarefas (dia_semana_id, titulo, descricao, horario,
+                             prioridade, concluida, data_criacao, data, duracao,
+                             recorrencia_dias, recorrencia_ate, recorrencia_vezes)
+        VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?)
+    ''', lote)
+    publicar(('recalcular',))
+
+def importar_registros(registros, tamanho_lote=TAMANHO_LOTE_IMPORTACAO, progresso=None):
+    """Valida e insere registros em transações de `tamanho_lote` linhas
+
+    `progresso`, se informado, é chamado com (importadas, rejeitadas) após cada lote.
+    Retorna um relatório com os totais e os primeiros erros de validação.
+    """
+    dias = listar_dias_semana()
+    dias_por_nome = {nome: id for id, nome, ordem in dias}
+    dias_por_ordem = {ordem: id for id, nome, ordem in dias}
+    relatorio = {'importadas': 0, 'rejeitadas': 0, 'erros': []}
+
+    for bloco in _em_lotes(enumerate(registros, start=1), tamanho_lote):
+        lote = []
+        for numero, registro in bloco:
+            try:
+                lote.append(validar_tarefa(registro, dias_por_nome, dias_por_ordem))
+            except ValueError as e:
+                relatorio['rejeitadas'] += 1
+                if len(relatorio['erros']) < MAXIMO_ERROS:
+                    relatorio['erros'].append((numero, str(e)))
+
+        if lote:
+            executar_escrita(_inserir_lote, lote)
+            relatorio['importadas'] += len(lote)
+
+        if progresso:
+            progresso(relatorio['importadas'], relatorio['rejeitadas'])
+
+    return relatorio
+
+def ler_csv(arquivo):
+    """Registros de um arquivo CSV com cabeçalho (mesmas colunas da exportação)"""
+    return csv.DictReader(arquivo)
+
+def _decodificar_linha(linha):
+    """Objeto da linha JSON; uma linha inválida vira o erro, rejeitado por validar_tarefa"""
+    try:
+        return json.loads(linha)
+    except ValueError as e:
+        return ValueError(f"JSON inválido: {e}")
+
+def ler_json(arquivo):
+    """Registros de um arquivo JSON Lines ou de uma lista JSON"""
+    primeira = arquivo.readline()
+    if primeira.lstrip().startswith('['):
+        # Lista JSON: precisa ser lida inteira
+        yield from json.loads(primeira + arquivo.read())
+        return
+
+    if primeira.strip():
+        yield _decodificar_linha(primeira)
+    for linha in arquivo:
+        if linha.strip():
+            yield _decodificar_linha(linha)
+
+LEITORES = {'csv': ler_csv, 'json': ler_json}
+EXPORTADORES = {'csv': exportar_csv, 'json': exportar_json}
+
+# =============================================
+# LINHA DE COMANDO
+# =============================================
+
+def _abrir(caminho, modo):
+    """Abre o arquivo informado na linha de comando ('-' = stdin/stdout)"""
+    if caminho == '-':
+        return nullcontext(sys.stdout if modo == 'w' else sys.stdin)
+    # utf-8-sig aceita CSVs salvos pelo Excel com BOM
+    return open(caminho, modo, newline='', encoding='utf-8' if modo == 'w' else 'utf-8-sig')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m utils.transferencia',
+        description='Importa e exporta as tarefas da agenda em CSV ou JSON Lines'
+    )
+    parser.add_argument('operacao', choices=['importar', 'exportar'])
+    parser.add_argument('arquivo', help="caminho do arquivo ('-' para stdin/stdout)")
+    parser.add_argument('--formato', choices=sorted(LEITORES),
+                        help='padrão: deduzido da extensão do arquivo')
+    parser.add_argument('--lote', type=int, help='linhas por lote/transação')
+    args = parser.parse_args(argv)
+
+    formato = args.formato or ('csv' if args.arquivo.endswith('.csv') else 'json')
+    criar_tabelas()
+
+    if args.operacao == 'exportar':
+        with _abrir(args.arquivo, 'w') as arquivo:
+            total = EXPORTADORES[formato](arquivo, args.lote or TAMANHO_LOTE_EXPORTACAO)
+        print(f"{total} tarefa(s) exportada(s)", file=sys.stderr)
+        return 0
+
+    def progresso(importadas, rejeitadas):
+        print(f"\r{importadas} importada(s), {rejeitadas} rejeitada(s)", end='', file=sys.stderr)
+
+    with _abrir(args.arquivo, 'r') as arquivo:
+        relatorio = importar_registros(LEITORES[formato](arquivo),
+                                       args.lote or TAMANHO_LOTE_IMPORTACAO, progresso)
+    print(file=sys.stderr)
+    for numero, erro in relatorio['erros']:
+        print(f"registro {numero}: {erro}", file=sys.stderr)
+    return 1 if relatorio['rejeitadas'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())